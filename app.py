@@ -1,13 +1,34 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
-from datetime import datetime, timedelta
-import sqlite3
-from datetime import datetime
+from datetime import date
+import json
 import os
-import re
 
-from google.cloud import vision # Vision API
+import audit
+import bp_ingest
+import bp_stats
+import cache
+import changes
+import conditions
+import cursors
+import db
+import drugs
+import events
+import export
+import interactions
+import label_parser
+import metrics
+import mtm
+import ocr
+import panel
+import search
+import serialize
+import series
+import timestamps
+from db import get_db
+from snapshot import ACCESSES_SQL, load_patient_snapshot
+
 
 app = Flask(__name__)
 app.secret_key = "dev-secret" # demo
@@ -16,37 +37,151 @@ CORS(app,
      resources={r"/api/*": {
          "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
          "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         "allow_headers": ["Content-Type", "Authorization"],
+         "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+         "expose_headers": ["ETag"],
          "supports_credentials": True
      }}, 
      supports_credentials=True)
 
 
-DB_PATH = "carelink.db"
+db.init_app(app)
+metrics.init_app(app)  # CARELINK_METRICS=1: route/SQL timing + /metrics
+app.json = serialize.JSONProvider(app)  # orjson if installed
+drugs.get_index()  # data/drugs.csv -> prefix + trigram index, once per process
+interactions.get_table()  # data/interactions.csv -> (drug_id, drug_id) pair lookup
+
+# 약사 화면 raw readings 한 페이지 크기
+READINGS_PAGE = 10
+
+
+def _time_arg(name):
+    # ?start=2025-01-01 (ISO 8601, 현지 시간) -> epoch ms; 형식이 틀리면 무시
+    try:
+        return timestamps.encode(request.args.get(name) or None)
+    except ValueError:
+        return None
+
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def _series_args():
+    # ?start=2025-01-01&end=2025-07-01&points=300
+    start = _time_arg("start")
+    end = _time_arg("end")
+    points = request.args.get("points", default=series.DEFAULT_POINTS, type=int)
+    return start, end, max(3, min(points, series.MAX_POINTS))
 
-def extract_text_from_image_bytes(image_bytes):
-    client = vision.ImageAnnotatorClient()
-    image = vision.Image(content=image_bytes)
 
-    response = client.text_detection(image=image)
-    texts = response.text_annotations
+def _flag_arg(name):
+    # ?review_due=1 / ?review_due=0 / 없음 -> True / False / None
+    value = request.args.get(name)
+    if value in (None, ""):
+        return None
+    return value.lower() in ("1", "true", "yes", "on")
 
-    if response.error.message:
-        print("Vision error:", response.error.message)
-        return []
 
-    if not texts:
-        return []
+def _panel_args():
+    # ?consent=1&condition=HTN&condition=DM&review_due=1&mtm_level=High&interaction=major
+    #  &sort=mtm_score&order=desc&limit=50&cursor=...
+    return {
+        "consent": _flag_arg("consent"),
+        "conditions": [c for c in request.args.getlist("condition") if c],
+        "review_due": _flag_arg("review_due"),
+        "mtm_levels": [m for m in request.args.getlist("mtm_level") if m],
+        "interaction": request.args.get("interaction") or None,
+        "sort": request.args.get("sort", "name"),
+        "order": request.args.get("order", "asc"),
+        "limit": request.args.get("limit", default=panel.DEFAULT_LIMIT, type=int),
+        "cursor": request.args.get("cursor"),
+    }
 
-    full_text = texts[0].description # 전체 텍스트
-    lines = full_text.split("\n")
-    # 공백 제거하고 상위 10줄만 사용
-    return [line.strip() for line in lines if line.strip()][:10]
+
+def _columnar():
+    # ?format=columnar: 시계열을 {"ts": [...], "sys": [...], "dia": [...]} 형태로
+    return request.args.get("format") == "columnar"
+
+
+def _cached_json(etag, build):
+    # strong ETag: 304 if the client has this version, else the cached body (or build() it once)
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        body = cache.responses.get(etag)
+        if body is None:
+            body = serialize.dumps(build(), default=app.json.default, sort_keys=True)
+            cache.responses.put(etag, body)
+        resp = app.response_class(body, mimetype="application/json")
+    resp.set_etag(etag)
+    # 브라우저가 저장은 하되 매번 If-None-Match로 재검증
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+def _changes_since(conn, patient_id):
+    since = request.args.get("since")
+    if not since:
+        return jsonify({"error": "since is required"}), 400
+    conn.execute("BEGIN")
+    try:
+        return jsonify(changes.changes_since(conn, patient_id, since))
+    except changes.CursorExpired as e:
+        # 너무 오래된 cursor: 전체 다시 로드
+        return jsonify({"error": str(e)}), 410
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        conn.commit()
+
+
+def _event_stream(patient_id=None):
+    # SSE: "change" 이벤트는 힌트만 ({patient_id, entities, cursor}), 데이터는 /changes 로 가져감
+    broker = events.get_broker()
+    try:
+        sub = broker.subscribe(patient_id)
+    except events.TooManySubscribers as e:
+        return jsonify({"error": str(e)}), 503
+
+    # 재접속: Last-Event-ID 이후 놓친 변경부터
+    first = (None, None)
+    last_id = request.headers.get("Last-Event-ID")
+    if last_id:
+        try:
+            since = cursors.decode(last_id, 1)[0]
+            conn = get_db()
+            first = events.missed(conn, since, patient_id)
+            conn.commit()
+        except ValueError:
+            first = ("resync", None)
+    # the stream itself never touches the db: give the pooled connection back now,
+    # not when the client disconnects
+    db.pool.release()
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            kind, batch = first
+            while True:
+                if kind == "resync":
+                    yield events.format_sse("resync", "{}")
+                elif kind == "change":
+                    for e in batch:
+                        yield events.format_sse("change", json.dumps(e), e["cursor"])
+                kind, batch = sub.next_events(events.HEARTBEAT)
+                if kind is None:
+                    # heartbeat; also how a dropped connection gets noticed
+                    yield ": keepalive\n\n"
+        finally:
+            broker.unsubscribe(sub)
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _pharm_consented(conn, patient_id):
+    row = conn.execute("SELECT consent FROM patients WHERE patient_id = ?", (patient_id,)).fetchone()
+    if row is None:
+        return jsonify({"error": "Patient not found"}), 404
+    if not row["consent"]:
+        return jsonify({"error": "No consent", "message": "Patient has not given consent to share data"}), 403
+    return None
 
 @app.route("/")
 def home():
@@ -60,56 +195,19 @@ def home():
 
 @app.route("/patient/<patient_id>")
 def patient_dashboard(patient_id):
-    conn = get_db()
-    cur = conn.cursor()
-
-    # 환자 기본 정보
-    cur.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,))
-    patient = cur.fetchone()
-
-    # 최근 혈압 10개 (최신순)
-    cur.execute("""
-        SELECT * FROM bp_readings
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 10
-    """, (patient_id,))
-    readings = cur.fetchall()
-
-    # 약 리스트
-    cur.execute("""
-        SELECT * FROM medications
-        WHERE patient_id = ?
-    """, (patient_id,))
-    meds = cur.fetchall()
-
-    # 최근 증상 노트 (예: 3개 정도)
-    cur.execute("""
-        SELECT * FROM symptom_logs
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 3
-    """, (patient_id,))
-    symptoms = cur.fetchall()
-
-    # 최근 접근 기록 (audit trail, 예: 5개)
-    cur.execute("""
-        SELECT * FROM access_logs
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """, (patient_id,))
-    accesses = cur.fetchall()
-
-    conn.close()
+    # 환자 정보 + 최근 혈압 10개 / 증상 3개 / 접근 기록 5개
+    snap = load_patient_snapshot(get_db(), patient_id)
+    if snap is None:
+        return "Patient not found", 404
 
     return render_template(
         "patient_dashboard.html",
-        patient=patient,
-        readings=readings,
-        meds=meds,
-        symptoms=symptoms,
-        accesses=accesses,
+        patient=snap["patient"],
+        readings=snap["readings"],
+        meds=snap["medications"],
+        interactions=interactions.for_medications(snap["medications"]),
+        symptoms=snap["symptoms"],
+        accesses=snap["accesses"],
     )
 
 
@@ -121,13 +219,10 @@ def add_bp(patient_id):
     heart_rate = request.form.get("heart_rate") or None
 
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-    """, (patient_id, systolic, diastolic, heart_rate, datetime.now()))
+    bp_stats.add_readings(conn, patient_id, [(systolic, diastolic, heart_rate, None, None)])
+    mtm.refresh(conn, [patient_id])
     conn.commit()
-    conn.close()
+    events.notify()
 
     return redirect(url_for("patient_dashboard", patient_id=patient_id))
 
@@ -136,15 +231,19 @@ def add_med(patient_id):
     name = request.form["name"]
     dose = request.form["dose"]
     freq = request.form["frequency"]
+    # 사전에 있는 약이면 표준 이름 + drug_id로 저장
+    name, dose, drug_id = drugs.get_index().resolve(name, dose, request.form.get("drug_id"))
 
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
-        INSERT INTO medications (patient_id, name, dose, frequency)
-        VALUES (?, ?, ?, ?)
-    """, (patient_id, name, dose, freq))
+        INSERT INTO medications (patient_id, name, dose, frequency, drug_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, (patient_id, name, dose, freq, drug_id))
+    mtm.refresh(conn, [patient_id])
+    interactions.refresh(conn, [patient_id])
+    changes.record(conn, patient_id, "medication", cur.lastrowid)
     conn.commit()
-    conn.close()
 
     return redirect(url_for("patient_dashboard", patient_id=patient_id))
 
@@ -154,8 +253,8 @@ def update_consent(patient_id):
     conn = get_db()
     cur = conn.cursor()
     cur.execute("UPDATE patients SET consent = ? WHERE patient_id = ?", (consent, patient_id))
+    changes.record(conn, patient_id, "patient")
     conn.commit()
-    conn.close()
     return redirect(url_for("patient_dashboard", patient_id=patient_id))
 
 @app.route("/patient/<patient_id>/scan_med", methods=["POST"])
@@ -166,60 +265,40 @@ def scan_med(patient_id):
     image_file = request.files["image"]
     content = image_file.read()
 
-    client = vision.ImageAnnotatorClient()
-    image = vision.Image(content=content)
-
-    # 줄 단위로 잘 뽑히는 document_text_detection 사용
-    response = client.document_text_detection(image=image)
-
-    if response.error.message:
-        return jsonify({"error": response.error.message}), 500
-
-    full_text = response.full_text_annotation.text
-    lines = [line.strip() for line in full_text.split("\n") if line.strip()]
-
-    # ---- 1) 약 줄 후보만 필터링 (mg / tab / cap 등 포함한 줄) ----
-    MED_PATTERN = re.compile(r'\b(mg|mcg|g|ml|tablet|tab|tabl|caps?|capsule)\b', re.IGNORECASE)
-    med_lines = [line for line in lines if MED_PATTERN.search(line)]
-
-    # ---- 2) 복용 지시 줄 후보 (TAKE, BY MOUTH, ONCE DAILY 등) ----
-    FREQ_PATTERN = re.compile(r'\b(take|once daily|twice daily|every \d+ hours?|by mouth)\b',
-                              re.IGNORECASE)
-    freq_lines = [line for line in lines if FREQ_PATTERN.search(line)]
+    try:
+        lines = ocr.get_pipeline().scan(content)
+    except ocr.OcrBusy as e:
+        return jsonify({"error": str(e)}), 503
+    except ocr.OcrError as e:
+        return jsonify({"error": str(e)}), 500
 
-    suggested_name = None
-    suggested_dose = None
-    suggested_freq = freq_lines[0] if freq_lines else None
+    return jsonify(label_parser.parse_label(lines, drugs.get_index()))
 
-    # ---- 3) 가장 첫 번째 약 줄에서 name / dose 파싱 ----
-    if med_lines:
-        raw = med_lines[0] # 예: "120 METFORMIN HCL 500 MG TABL"
 
-        # 용량 패턴 (숫자 + 단위) 찾기
-        DOSE_PATTERN = re.compile(r'(\d+)\s*(mg|mcg|g|ml|units?)', re.IGNORECASE)
-        m = DOSE_PATTERN.search(raw)
-        if m:
-            suggested_dose = m.group(0).strip() # "500 MG"
-            before = raw[:m.start()].strip() # "120 METFORMIN HCL"
+# 비동기 스캔: 업로드 -> job_id (202), 이후 polling
+@app.route("/patient/<patient_id>/scan_med/jobs", methods=["POST"])
+def submit_scan_med(patient_id):
+    if "image" not in request.files:
+        return jsonify({"error": "No file"}), 400
 
-            # 맨 앞 수량(120 같은 숫자) 제거
-            parts = before.split()
-            if parts and parts[0].isdigit():
-                parts = parts[1:]
-            suggested_name = " ".join(parts) or raw.strip()
-        else:
-            # 용량 패턴이 없으면 그냥 전체 줄을 이름으로
-            suggested_name = raw.strip()
+    try:
+        job_id = ocr.get_pipeline().submit(request.files["image"].read())
+    except ocr.OcrBusy as e:
+        return jsonify({"error": str(e)}), 503
 
     return jsonify({
-        "lines": lines,                # 원본 전체 (원하면 계속 보여줄 수 있음)
-        "med_candidates": med_lines,   # 약처럼 보이는 줄만
-        "suggested": {
-            "name": suggested_name,
-            "dose": suggested_dose,
-            "frequency": suggested_freq,
-        }
-    })
+        "job_id": job_id,
+        "status_url": url_for("scan_med_job", patient_id=patient_id, job_id=job_id),
+    }), 202
+
+@app.route("/patient/<patient_id>/scan_med/jobs/<job_id>", methods=["GET"])
+def scan_med_job(patient_id, job_id):
+    job = ocr.get_pipeline().status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job["status"] == "done":
+        return jsonify({"status": "done", **label_parser.parse_label(job["lines"], drugs.get_index())})
+    return jsonify(job)
 
 
 
@@ -245,12 +324,25 @@ def pharm_dashboard():
         return redirect(url_for("pharm_login"))
 
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM patients")
-    patients = cur.fetchall()
-    conn.close()
+    mtm.ensure_fresh(conn)
+    try:
+        page = panel.query_panel(conn, **_panel_args())
+    except ValueError as e:
+        return str(e), 400
+
+    next_url = None
+    if page["next_cursor"]:
+        args = request.args.to_dict(flat=False)
+        args["cursor"] = page["next_cursor"]
+        next_url = url_for("pharm_dashboard", **args)
 
-    return render_template("pharm_dashboard.html", patients=patients)
+    return render_template(
+        "pharm_dashboard.html",
+        patients=page["patients"],
+        next_url=next_url,
+        filters=request.args,
+        condition_catalog=conditions.catalog(conn),
+    )
 
 @app.route("/pharm/patient/<patient_id>")
 def pharm_view_patient(patient_id):
@@ -258,132 +350,46 @@ def pharm_view_patient(patient_id):
         return redirect(url_for("pharm_login"))
 
     conn = get_db()
-    cur = conn.cursor()
 
-    cur.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,))
-    patient = cur.fetchone()
+    # 최근 혈압 10개 + 약 + 최근 symptom 3개 + 최근 access 5개
+    snap = load_patient_snapshot(conn, patient_id)
+    if snap is None:
+        return "Patient not found", 404
+    patient = snap["patient"]
 
     # consent 체크
     if not patient["consent"]:
-        conn.close()
         return render_template("pharm_no_consent.html", patient=patient)
 
-    # 혈압 데이터
-    cur.execute("""
-        SELECT * FROM bp_readings
-        WHERE patient_id = ?
-        ORDER BY timestamp ASC
-    """, (patient_id,))
-    readings = cur.fetchall()
-
-    # 약 리스트
-    cur.execute("""
-        SELECT * FROM medications
-        WHERE patient_id = ?
-    """, (patient_id,))
-    meds = cur.fetchall()
+    # Access log 기록 (audit trail) - consent 있는 환자만, 백그라운드에서 batch insert
+    audit.record(patient_id, "pharm01", "pharmacist")
 
-    # 최근 symptom logs (3개 정도)
-    cur.execute("""
-        SELECT * FROM symptom_logs
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 3
-    """, (patient_id,))
-    symptoms = cur.fetchall()
+    readings = snap["readings"]
+    meds = snap["medications"]
+    symptoms = snap["symptoms"]
+    accesses = audit.merge_pending(patient_id, snap["accesses"], 5)
 
-    # Access log 기록 (audit trail)
-    cur.execute("""
-        INSERT INTO access_logs (patient_id, actor, role, timestamp)
-        VALUES (?, ?, ?, ?)
-    """, (patient_id, "pharm01", "pharmacist", datetime.now()))
-    conn.commit()
+    # 그래프용 데이터 (기간 필터 + LTTB downsampling)
+    start, end, points = _series_args()
+    chart = series.load_series(conn, patient_id, start, end, points)
 
-    # 최근 access 5개 (환자 화면에서 보여줄 때도 사용할 수 있음)
-    cur.execute("""
-        SELECT * FROM access_logs
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """, (patient_id,))
-    accesses = cur.fetchall()
-
-    conn.close()
-
-    # 그래프용 데이터
-    labels = [r["timestamp"] for r in readings]
-    systolic = [r["systolic"] for r in readings]
-    diastolic = [r["diastolic"] for r in readings]
-
-    # MTM risk + BP status 계산
-    med_count = len(meds)
-    avg_sys = sum(systolic) / len(systolic) if systolic else None
-
-    last_bp_time = None
-    if readings:
-        last_bp_time = datetime.fromisoformat(readings[-1]["timestamp"]) if isinstance(readings[-1]["timestamp"], str) else None
-
-    mtm_score = 0
-    mtm_level = "Low"
-
-    if med_count >= 5:
-        mtm_score += 2
-    if avg_sys and avg_sys > 140:
-        mtm_score += 2
-    if last_bp_time:
-        days_since_bp = (datetime.now() - last_bp_time).days
-        if days_since_bp >= 90:
-            mtm_score += 1
-
-    if mtm_score >= 4:
-        mtm_level = "High"
-    elif mtm_score >= 2:
-        mtm_level = "Moderate"
-
-    # BP control status
-    bp_status = None
-    bp_status_class = None
-    if avg_sys:
-        if avg_sys < 130:
-            bp_status = "At goal (<130 mmHg)"
-            bp_status_class = "success"
-        elif avg_sys <= 140:
-            bp_status = "Borderline control (130–140 mmHg)"
-            bp_status_class = "warning"
-        else:
-            bp_status = "Above target (>140 mmHg)"
-            bp_status_class = "danger"
-
-    # Medication review due 여부
-    review_due = False
-    last_med_review = patient["last_med_review"]
-    if med_count >= 5:
-        if not last_med_review:
-            review_due = True
-        else:
-            try:
-                last_review_dt = datetime.fromisoformat(last_med_review)
-                if (datetime.now() - last_review_dt).days >= 180:
-                    review_due = True
-            except Exception:
-                review_due = True
+    # MTM risk + BP status 계산 (mtm.py, bp_stats 집계만 사용)
+    mtm_metrics = mtm.score_patient(conn, patient_id)
+    bp = bp_stats.get_stats(conn, patient_id)
 
     return render_template(
         "pharm_patient.html",
         patient=patient,
         readings=readings,
         meds=meds,
-        labels=labels,
-        systolic=systolic,
-        diastolic=diastolic,
-        avg_sys=avg_sys,
-        mtm_score=mtm_score,
-        mtm_level=mtm_level,
-        bp_status=bp_status,
-        bp_status_class=bp_status_class,
-        review_due=review_due,
+        interactions=interactions.for_medications(meds),
+        labels=chart["labels"],
+        systolic=chart["systolic"],
+        diastolic=chart["diastolic"],
         symptoms=symptoms,
-        accesses=accesses
+        accesses=accesses,
+        bp=bp,
+        **mtm_metrics
     )
 
 @app.route("/pharm/patient/<patient_id>/mark_review", methods=["POST"])
@@ -396,9 +402,10 @@ def mark_med_review(patient_id):
         UPDATE patients
         SET last_med_review = ?
         WHERE patient_id = ?
-    """, (datetime.now().isoformat(), patient_id))
+    """, (timestamps.now_ms(), patient_id))
+    mtm.refresh(conn, [patient_id])
+    changes.record(conn, patient_id, "patient")
     conn.commit()
-    conn.close()
     return redirect(url_for("pharm_view_patient", patient_id=patient_id))
 
 @app.route("/pharm/patient/<patient_id>/care_plan", methods=["POST"])
@@ -409,8 +416,10 @@ def update_care_plan(patient_id):
     conn = get_db()
     cur = conn.cursor()
     cur.execute("UPDATE patients SET care_plan = ? WHERE patient_id = ?", (care_plan, patient_id))
+    if cur.rowcount:
+        search.index_care_plan(conn, patient_id, care_plan)
+    changes.record(conn, patient_id, "patient")
     conn.commit()
-    conn.close()
     return redirect(url_for("pharm_view_patient", patient_id=patient_id))
 
 @app.route("/patient/<patient_id>/add_symptom", methods=["POST"])
@@ -421,82 +430,71 @@ def add_symptom(patient_id):
 
     conn = get_db()
     cur = conn.cursor()
+    now = timestamps.now_ms()
     cur.execute("""
         INSERT INTO symptom_logs (patient_id, note, timestamp)
         VALUES (?, ?, ?)
-    """, (patient_id, note, datetime.now().isoformat()))
+    """, (patient_id, note, now))
+    search.index_symptom(conn, cur.lastrowid, patient_id, note, now)
+    changes.record(conn, patient_id, "symptom", cur.lastrowid)
     conn.commit()
-    conn.close()
+    events.notify()
     return redirect(url_for("patient_dashboard", patient_id=patient_id))
 
 @app.route("/patient/<patient_id>/conditions", methods=["POST"])
 def update_conditions(patient_id):
     # form에서 'conditions' 체크박스로 ['HTN', 'DM'] 같은 리스트를 받는다고 가정
     selected = request.form.getlist("conditions")
-    value = ",".join(selected)
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("UPDATE patients SET conditions = ? WHERE patient_id = ?", (value, patient_id))
+    try:
+        found = conditions.set_conditions(conn, patient_id, selected)
+    except ValueError as e:
+        conn.rollback()
+        return str(e), 400
+    if not found:
+        conn.rollback()
+        return "Patient not found", 404
+    changes.record(conn, patient_id, "patient")
     conn.commit()
-    conn.close()
     return redirect(url_for("patient_dashboard", patient_id=patient_id))
 
 @app.route("/api/patient/<patient_id>")
 def api_patient(patient_id):
+    # patient + 최근 혈압 10개 / 증상 3개 / 접근 로그 5개 (한 번의 read snapshot)
     conn = get_db()
-    cur = conn.cursor()
-
-    # 1) patient 기본 정보
-    cur.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,))
-    patient = cur.fetchone()
-
-    if not patient:
-        conn.close()
+    conn.execute("BEGIN")
+    try:
+        version = cache.patient_version(conn, patient_id)
+        if version is None:
+            return jsonify({"error": "Patient not found"}), 404
+        # queued access events are part of the body until the audit writer flushes them
+        pending = [e["event_id"] for e in audit.get_audit().pending(patient_id)]
+        etag = cache.make_etag(request.full_path, version["data_version"],
+                               version["access_version"], pending)
+        return _cached_json(etag, lambda: _patient_payload(conn, patient_id))
+    finally:
+        conn.commit()
+
+def _patient_payload(conn, patient_id):
+    snap = load_patient_snapshot(conn, patient_id, json_rows=True)
+    return dict(snap, interactions=interactions.for_medications(snap["medications"]),
+                cursor=changes.latest_cursor(conn, patient_id))
+
+@app.route("/api/patient/<patient_id>/events")
+def api_patient_events(patient_id):
+    conn = get_db()
+    if conn.execute("SELECT 1 FROM patients WHERE patient_id = ?", (patient_id,)).fetchone() is None:
         return jsonify({"error": "Patient not found"}), 404
+    conn.commit()
+    return _event_stream(patient_id)
 
-    # 2) 최근 혈압 10개
-    cur.execute("""
-        SELECT * FROM bp_readings
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 10
-    """, (patient_id,))
-    readings = cur.fetchall()
-
-    # 3) 약 리스트
-    cur.execute("""
-        SELECT * FROM medications
-        WHERE patient_id = ?
-    """, (patient_id,))
-    meds = cur.fetchall()
-
-    # 4) 증상 로그 최근 3개
-    cur.execute("""
-        SELECT * FROM symptom_logs
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 3
-    """, (patient_id,))
-    symptoms = cur.fetchall()
-
-    # 5) 접근 로그 최근 5개
-    cur.execute("""
-        SELECT * FROM access_logs
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """, (patient_id,))
-    accesses = cur.fetchall()
-
-    conn.close()
-
-    return jsonify({
-        "patient": dict(patient),
-        "readings": [dict(r) for r in readings],
-        "medications": [dict(m) for m in meds],
-        "symptoms": [dict(s) for s in symptoms],
-        "accesses": [dict(a) for a in accesses],
-    })
+# 마지막 sync 이후 바뀐 readings / meds / symptoms / accesses 만
+@app.route("/api/patient/<patient_id>/changes")
+def api_patient_changes(patient_id):
+    conn = get_db()
+    if conn.execute("SELECT 1 FROM patients WHERE patient_id = ?", (patient_id,)).fetchone() is None:
+        return jsonify({"error": "Patient not found"}), 404
+    return _changes_since(conn, patient_id)
 
 @app.route("/api/patient/<patient_id>/bp", methods=["POST"])
 def api_add_bp(patient_id):
@@ -506,16 +504,40 @@ def api_add_bp(patient_id):
     heart_rate = data.get("heart_rate")
 
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp)
-        VALUES (?, ?, ?, ?, datetime('now'))
-    """, (patient_id, systolic, diastolic, heart_rate))
+    # timestamp None -> timestamps.now_ms()
+    bp_stats.add_readings(conn, patient_id, [(systolic, diastolic, heart_rate, None, None)])
+    mtm.refresh(conn, [patient_id])
     conn.commit()
-    conn.close()
+    events.notify()
 
     return jsonify({"ok": True})
 
+# 가정용 혈압계 동기화: JSON 배열 또는 NDJSON, 한 트랜잭션으로 저장
+@app.route("/api/patient/<patient_id>/bp/batch", methods=["POST"])
+def api_add_bp_batch(patient_id):
+    try:
+        items = bp_ingest.parse_body(request.get_data(), request.content_type)
+        rows = bp_ingest.validate(items)
+    except bp_ingest.IngestError as e:
+        return jsonify({"error": str(e), "errors": e.errors}), 400
+
+    conn = get_db()
+    if conn.execute("SELECT 1 FROM patients WHERE patient_id = ?", (patient_id,)).fetchone() is None:
+        return jsonify({"error": "Patient not found"}), 404
+
+    inserted = bp_stats.add_readings(conn, patient_id, rows)
+    if inserted:
+        mtm.refresh(conn, [patient_id])
+    conn.commit()
+    events.notify()
+
+    return jsonify({
+        "ok": True,
+        "received": len(rows),
+        "inserted": inserted,
+        "duplicates": len(rows) - inserted,
+    })
+
 @app.route("/api/patient/<patient_id>/med", methods=["POST"])
 def api_add_med(patient_id):
     data = request.get_json()
@@ -524,17 +546,30 @@ def api_add_med(patient_id):
     name = data.get("name")
     dose = data.get("dose")
     freq = data.get("frequency")   # ★ 여기 key 이름 중요
+    # autocomplete에서 고른 drug_id가 있으면 그대로, 없으면 이름으로 사전 매칭
+    name, dose, drug_id = drugs.get_index().resolve(name, dose, data.get("drug_id"))
 
     conn = get_db()
     cur = conn.cursor()
     cur.execute("""
-        INSERT INTO medications (patient_id, name, dose, frequency)
-        VALUES (?, ?, ?, ?)
-    """, (patient_id, name, dose, freq))
+        INSERT INTO medications (patient_id, name, dose, frequency, drug_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, (patient_id, name, dose, freq, drug_id))
+    mtm.refresh(conn, [patient_id])
+    interactions.refresh(conn, [patient_id])
+    changes.record(conn, patient_id, "medication", cur.lastrowid)
     conn.commit()
-    conn.close()
 
-    return jsonify({"ok": True})
+    # 새 약 포함 상호작용 (MedicationList.tsx 경고)
+    meds = conn.execute("SELECT drug_id FROM medications WHERE patient_id = ?", (patient_id,))
+    return jsonify({"ok": True, "name": name, "dose": dose, "drug_id": drug_id,
+                    "interactions": interactions.for_medications(meds)})
+
+@app.route("/api/drugs/complete", methods=["GET"])
+def api_drug_complete():
+    # ?q=metf&limit=10 -> 약 이름 자동완성 (MedicationList.tsx)
+    limit = max(1, min(request.args.get("limit", default=10, type=int), 50))
+    return jsonify({"results": drugs.get_index().complete(request.args.get("q", ""), limit)})
 
 @app.route("/api/patient/<patient_id>/symptom", methods=["POST"])
 def api_add_symptom(patient_id):
@@ -543,12 +578,15 @@ def api_add_symptom(patient_id):
 
     conn = get_db()
     cur = conn.cursor()
+    now = timestamps.now_ms()
     cur.execute("""
         INSERT INTO symptom_logs (patient_id, note, timestamp)
-        VALUES (?, ?, datetime('now'))
-    """, (patient_id, note))
+        VALUES (?, ?, ?)
+    """, (patient_id, note, now))
+    search.index_symptom(conn, cur.lastrowid, patient_id, note, now)
+    changes.record(conn, patient_id, "symptom", cur.lastrowid)
     conn.commit()
-    conn.close()
+    events.notify()
 
     return jsonify({"ok": True})
 
@@ -556,17 +594,19 @@ def api_add_symptom(patient_id):
 def api_update_conditions(patient_id):
     data = request.get_json()
     selected = data.get("conditions", [])   # ["HTN","DM"]
-    value = ",".join(selected)
 
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE patients
-        SET conditions = ?
-        WHERE patient_id = ?
-    """, (value, patient_id))
+    try:
+        # 텍스트 + bitmask + junction 같이 갱신 (conditions.py)
+        found = conditions.set_conditions(conn, patient_id, selected)
+    except ValueError as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
+    if not found:
+        conn.rollback()
+        return jsonify({"error": "Patient not found"}), 404
+    changes.record(conn, patient_id, "patient")
     conn.commit()
-    conn.close()
 
     return jsonify({"ok": True})
 
@@ -582,8 +622,8 @@ def api_update_consent(patient_id):
     conn = get_db()
     cur = conn.cursor()
     cur.execute("UPDATE patients SET consent = ? WHERE patient_id = ?", (consent, patient_id))
+    changes.record(conn, patient_id, "patient")
     conn.commit()
-    conn.close()
 
     return jsonify({"ok": True})
 
@@ -645,14 +685,41 @@ def api_pharm_dashboard():
         return jsonify({"error": "Unauthorized"}), 401
 
     conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM patients")
-    patients = cur.fetchall()
-    conn.close()
+    mtm.ensure_fresh(conn)
+    try:
+        page = panel.query_panel(conn, **_panel_args(), as_json=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify({
-        "patients": [dict(p) for p in patients]
-    })
+    return jsonify(page)
+
+@app.route("/api/pharm/conditions", methods=["GET"])
+def api_pharm_conditions():
+    # 대시보드 condition 필터용 catalog (pharm_dashboard.html의 condition_catalog와 같음)
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    conn = get_db()
+    return jsonify({"conditions": conditions.catalog(conn)})
+
+@app.route("/api/pharm/search", methods=["GET"])
+def api_pharm_search():
+    # ?q=dizzy&kind=symptom|care_plan&limit=20&cursor=... 동의한 환자만, bm25 순
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    conn = get_db()
+    try:
+        page = search.search(conn, request.args.get("q", ""), request.args.get("kind"),
+                             request.args.get("limit", default=search.DEFAULT_LIMIT, type=int),
+                             request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # snippets show record content: one access entry per patient on the page
+    for patient_id in dict.fromkeys(r["patient_id"] for r in page["results"]):
+        audit.record(patient_id, "pharm01", "pharmacist", action="search")
+    return jsonify(page)
 
 @app.route("/api/pharm/patient/<patient_id>", methods=["GET"])
 def api_pharm_view_patient(patient_id):
@@ -660,128 +727,171 @@ def api_pharm_view_patient(patient_id):
         return jsonify({"error": "Unauthorized"}), 401
 
     conn = get_db()
-    cur = conn.cursor()
+    conn.execute("BEGIN")
+    try:
+        version = cache.patient_version(conn, patient_id)
+        if version is None:
+            return jsonify({"error": "Patient not found"}), 404
+
+        if not version["consent"]:
+            patient = timestamps.decode_row(conn.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,)).fetchone())
+            print(f"403: Patient {patient_id} has no consent (consent={patient['consent']})")
+            return jsonify({
+                "error": "No consent",
+                "message": "Patient has not given consent to share data",
+                "patient": patient
+            }), 403
+
+        # 304도 열람이므로 audit 기록
+        audit.record(patient_id, "pharm01", "pharmacist")
+
+        # MTM 90일 규칙이 날짜에 따라 바뀌므로 날짜도 ETag에 포함.
+        # access_version은 제외: 이 열람 자체가 flush되며 올리므로 캐시가 매번 깨짐
+        # (접근 로그는 /accesses 로 따로)
+        etag = cache.make_etag(request.full_path, version["data_version"],
+                               date.today().isoformat())
+        return _cached_json(etag, lambda: _pharm_patient_payload(conn, patient_id))
+    finally:
+        conn.commit()
+
+def _pharm_patient_payload(conn, patient_id):
+    # accesses는 /api/pharm/patient/<id>/accesses 에서 (ETag가 access_version을 안 봄)
+    snap = load_patient_snapshot(conn, patient_id, readings_limit=READINGS_PAGE,
+                                 accesses_limit=0, pending_accesses=False, json_rows=True)
+    readings = snap["readings"]
+
+    start, end, points = _series_args()
+    chart = series.load_series(conn, patient_id, start, end, points)
+
+    if _columnar():
+        chart_fields = {"series": {"ts": chart["labels"], "sys": chart["systolic"],
+                                   "dia": chart["diastolic"]}}
+    else:
+        chart_fields = {"labels": chart["labels"], "systolic": chart["systolic"],
+                        "diastolic": chart["diastolic"]}
+
+    mtm_metrics = mtm.score_patient(conn, patient_id)
+
+    return {
+        "patient": snap["patient"],
+        "readings": readings,
+        "next_cursor": series.encode_cursor(readings.last) if len(readings) == READINGS_PAGE else None,
+        "meds": snap["medications"],
+        "interactions": interactions.for_medications(snap["medications"]),
+        "symptoms": snap["symptoms"],
+        "series_total": chart["total"],
+        "downsampled": chart["downsampled"],
+        "cursor": changes.latest_cursor(conn, patient_id),
+        "bp_stats": bp_stats.get_stats(conn, patient_id),
+        **chart_fields,
+        **mtm_metrics,
+    }
+
+@app.route("/api/pharm/patient/<patient_id>/accesses", methods=["GET"])
+def api_pharm_patient_accesses(patient_id):
+    # 최근 접근 5개, audit 대기 중인 것 포함 (캐시 안 함: 열람할 때마다 바뀜)
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
 
-    cur.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,))
-    patient = cur.fetchone()
+    conn = get_db()
+    denied = _pharm_consented(conn, patient_id)
+    if denied:
+        conn.commit()
+        return denied
+    accesses = conn.execute(ACCESSES_SQL, (patient_id, 5)).fetchall()
+    conn.commit()
+    return jsonify({"accesses": audit.merge_pending(patient_id, timestamps.decode_rows(accesses), 5)})
 
-    if not patient["consent"]:
-        conn.close()
-        print(f"403: Patient {patient_id} has no consent (consent={patient['consent']})")
-        return jsonify({
-            "error": "No consent",
-            "message": "Patient has not given consent to share data",
-            "patient": dict(patient)
-        }), 403
+@app.route("/api/pharm/events", methods=["GET"])
+def api_pharm_panel_events():
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
+    return _event_stream()
 
-    cur.execute("""
-        SELECT * FROM bp_readings
-        WHERE patient_id = ?
-        ORDER BY timestamp ASC
-    """, (patient_id,))
-    readings = cur.fetchall()
+@app.route("/api/pharm/patient/<patient_id>/events", methods=["GET"])
+def api_pharm_patient_events(patient_id):
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
 
-    cur.execute("""
-        SELECT * FROM medications
-        WHERE patient_id = ?
-    """, (patient_id,))
-    meds = cur.fetchall()
+    conn = get_db()
+    denied = _pharm_consented(conn, patient_id)
+    conn.commit()
+    if denied:
+        return denied
+    return _event_stream(patient_id)
 
-    cur.execute("""
-        SELECT * FROM symptom_logs
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 3
-    """, (patient_id,))
-    symptoms = cur.fetchall()
+@app.route("/api/pharm/patient/<patient_id>/changes", methods=["GET"])
+def api_pharm_patient_changes(patient_id):
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
 
-    cur.execute("""
-        INSERT INTO access_logs (patient_id, actor, role, timestamp)
-        VALUES (?, ?, ?, ?)
-    """, (patient_id, "pharm01", "pharmacist", datetime.now()))
-    conn.commit()
+    conn = get_db()
+    denied = _pharm_consented(conn, patient_id)
+    if denied:
+        return denied
+    return _changes_since(conn, patient_id)
 
-    cur.execute("""
-        SELECT * FROM access_logs
-        WHERE patient_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """, (patient_id,))
-    accesses = cur.fetchall()
-
-    conn.close()
-
-    # Calculate metrics
-    labels = [r["timestamp"] for r in readings]
-    systolic = [r["systolic"] for r in readings]
-    diastolic = [r["diastolic"] for r in readings]
-
-    med_count = len(meds)
-    avg_sys = sum(systolic) / len(systolic) if systolic else None
-
-    last_bp_time = None
-    if readings:
-        last_bp_time = datetime.fromisoformat(readings[-1]["timestamp"]) if isinstance(readings[-1]["timestamp"], str) else None
-
-    mtm_score = 0
-    mtm_level = "Low"
-
-    if med_count >= 5:
-        mtm_score += 2
-    if avg_sys and avg_sys > 140:
-        mtm_score += 2
-    if last_bp_time:
-        days_since_bp = (datetime.now() - last_bp_time).days
-        if days_since_bp >= 90:
-            mtm_score += 1
-
-    if mtm_score >= 4:
-        mtm_level = "High"
-    elif mtm_score >= 2:
-        mtm_level = "Moderate"
-
-    bp_status = None
-    bp_status_class = None
-    if avg_sys:
-        if avg_sys < 130:
-            bp_status = "At goal (<130 mmHg)"
-            bp_status_class = "success"
-        elif avg_sys <= 140:
-            bp_status = "Borderline control (130–140 mmHg)"
-            bp_status_class = "warning"
-        else:
-            bp_status = "Above target (>140 mmHg)"
-            bp_status_class = "danger"
-
-    review_due = False
-    last_med_review = patient["last_med_review"]
-    if med_count >= 5:
-        if not last_med_review:
-            review_due = True
-        else:
-            try:
-                last_review_dt = datetime.fromisoformat(last_med_review)
-                if (datetime.now() - last_review_dt).days >= 180:
-                    review_due = True
-            except Exception:
-                review_due = True
+@app.route("/api/pharm/patient/<patient_id>/series", methods=["GET"])
+def api_pharm_bp_series(patient_id):
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
 
-    return jsonify({
-        "patient": dict(patient),
-        "readings": [dict(r) for r in readings],
-        "meds": [dict(m) for m in meds],
-        "symptoms": [dict(s) for s in symptoms],
-        "accesses": [dict(a) for a in accesses],
-        "labels": labels,
-        "systolic": systolic,
-        "diastolic": diastolic,
-        "avg_sys": avg_sys,
-        "mtm_score": mtm_score,
-        "mtm_level": mtm_level,
-        "bp_status": bp_status,
-        "bp_status_class": bp_status_class,
-        "review_due": review_due,
-    })
+    conn = get_db()
+    denied = _pharm_consented(conn, patient_id)
+    if denied:
+        return denied
+
+    start, end, points = _series_args()
+    chart = series.load_series(conn, patient_id, start, end, points)
+    if _columnar():
+        chart = series.as_columnar(chart)
+    return jsonify(chart)
+
+@app.route("/api/pharm/patient/<patient_id>/readings", methods=["GET"])
+def api_pharm_bp_readings(patient_id):
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    conn = get_db()
+    denied = _pharm_consented(conn, patient_id)
+    if denied:
+        return denied
+
+    limit = request.args.get("limit", default=50, type=int)
+    try:
+        fields = serialize.parse_fields(request.args.get("fields"), series.READING_FIELDS)
+        page = series.page_readings(conn, patient_id, request.args.get("cursor"), limit,
+                                    fields=fields, columnar=_columnar())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+@app.route("/api/pharm/patient/<patient_id>/export", methods=["GET"])
+def api_pharm_export(patient_id):
+    # ?format=csv|ndjson&sections=readings,medications,symptoms; 전체 기록을 스트리밍으로
+    if not session.get("pharm_logged_in"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in export.FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(export.FORMATS)}"}), 400
+    try:
+        sections = serialize.parse_fields(request.args.get("sections"), export.SECTIONS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = get_db()
+    denied = _pharm_consented(conn, patient_id)
+    conn.commit()
+    if denied:
+        return denied
+
+    audit.record(patient_id, "pharm01", "pharmacist", action="export")
+    resp = Response(stream_with_context(export.stream(conn, patient_id, fmt, sections)),
+                    mimetype=export.FORMATS[fmt], headers={"Cache-Control": "no-store"})
+    # werkzeug quotes the filename parameter
+    resp.headers.set("Content-Disposition", "attachment", filename=export.filename(patient_id, fmt))
+    return resp
 
 @app.route("/api/pharm/patient/<patient_id>/mark_review", methods=["POST"])
 def api_mark_med_review(patient_id):
@@ -794,9 +904,10 @@ def api_mark_med_review(patient_id):
         UPDATE patients
         SET last_med_review = ?
         WHERE patient_id = ?
-    """, (datetime.now().isoformat(), patient_id))
+    """, (timestamps.now_ms(), patient_id))
+    mtm.refresh(conn, [patient_id])
+    changes.record(conn, patient_id, "patient")
     conn.commit()
-    conn.close()
 
     return jsonify({"ok": True})
 
@@ -814,8 +925,10 @@ def api_update_care_plan(patient_id):
     conn = get_db()
     cur = conn.cursor()
     cur.execute("UPDATE patients SET care_plan = ? WHERE patient_id = ?", (care_plan, patient_id))
+    if cur.rowcount:
+        search.index_care_plan(conn, patient_id, care_plan)
+    changes.record(conn, patient_id, "patient")
     conn.commit()
-    conn.close()
 
     return jsonify({"ok": True})
 
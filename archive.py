@@ -0,0 +1,248 @@
+# archive.py
+# Monthly partitions for the append-only tables (bp_readings, access_logs).
+#
+# The main database keeps the recent ("hot") months; older months are moved
+# into one SQLite file per month under <db>.archive/ (CARELINK_ARCHIVE_DIR),
+# compacted, and listed in the archive_partitions catalog. Recent-item lookups
+# (snapshot.py: last 10 readings, last 5 accesses) only ever read the hot
+# tables; history() runs a query over the hot tables plus every archived month
+# that overlaps the requested range and merges the ordered results.
+# Reading idempotency keys stay behind in bp_client_keys (migration 17), so a
+# cuff resyncing an archived or purged reading does not store it again.
+#
+#   python archive.py run [--keep-months 6] [--purge-months 84]
+#   python archive.py list
+import argparse
+import heapq
+import os
+import re
+import sqlite3
+from datetime import date
+
+import changes
+import db
+import timestamps
+
+TABLES = ("bp_readings", "access_logs")
+DEFAULT_KEEP_MONTHS = 6
+
+PARTITIONS_SQL = """
+    SELECT month, path, start_ts, end_ts FROM archive_partitions
+    WHERE end_ts > ? AND start_ts < ?
+    ORDER BY month
+"""
+
+
+def archive_dir(conn):
+    main = conn.execute("PRAGMA database_list").fetchone()["file"]
+    return os.environ.get("CARELINK_ARCHIVE_DIR") or main + ".archive"
+
+
+def month_bounds(month):
+    """"2025-03" -> epoch ms of local midnight on 2025-03-01 and on 2025-04-01."""
+    y, m = map(int, month.split("-"))
+    nxt = date(y + (m == 12), m % 12 + 1, 1)
+    return timestamps.encode(date(y, m, 1)), timestamps.encode(nxt)
+
+
+def _months_back(today, months):
+    y, m = divmod(today.year * 12 + today.month - 1 - months, 12)
+    return f"{y:04d}-{m + 1:02d}"
+
+
+def open_partition(conn, path):
+    arc = sqlite3.connect(f"file:{os.path.join(archive_dir(conn), path)}?mode=ro", uri=True)
+    arc.row_factory = sqlite3.Row
+    return arc
+
+
+def partitions(conn, start=None, end=None):
+    """Archived months overlapping [start, end) (epoch ms; None = open-ended)."""
+    return conn.execute(PARTITIONS_SQL, (0 if start is None else start,
+                                         timestamps.MAX_MS if end is None else end)).fetchall()
+
+
+def history(conn, sql, params, start=None, end=None, key=None, reverse=False, limit=None):
+    """Run `sql` on the hot tables and on each archived month overlapping [start, end).
+
+    Every source must return rows ordered by `key` (descending if `reverse`);
+    the results are merged in that order. With reverse + limit (newest-first
+    pages) older months are only opened while they can still contribute.
+    """
+    parts = partitions(conn, start, end)
+    hot = conn.execute(sql, params).fetchall()
+    if not parts:
+        return hot[:limit] if limit else hot
+
+    if reverse and limit:
+        rows = hot
+        for part in reversed(parts):
+            if len(rows) >= limit and key(rows[limit - 1]) >= (part["end_ts"],):
+                break
+            arc = open_partition(conn, part["path"])
+            try:
+                rows = list(heapq.merge(rows, arc.execute(sql, params).fetchall(),
+                                        key=key, reverse=True))[:limit]
+            finally:
+                arc.close()
+        return rows
+
+    sources = [hot]
+    for part in parts:
+        arc = open_partition(conn, part["path"])
+        try:
+            sources.append(arc.execute(sql, params).fetchall())
+        finally:
+            arc.close()
+    rows = list(heapq.merge(*sources, key=key, reverse=reverse))
+    return rows[:limit] if limit else rows
+
+
+def iter_history(conn, sql, params, start=None, end=None, key=None):
+    """Streaming history(): rows in ascending `key` order without loading them all.
+
+    Archived months cover disjoint ranges, so they are read one after another
+    (one file open at a time) and merged with the hot-table cursor.
+    """
+    parts = partitions(conn, start, end)
+
+    def archived():
+        for part in parts:
+            arc = open_partition(conn, part["path"])
+            try:
+                yield from arc.execute(sql, params)
+            finally:
+                arc.close()
+
+    return heapq.merge(conn.execute(sql, params), archived(), key=key)
+
+
+def count(conn, sql, params, start=None, end=None):
+    """Sum of a one-row COUNT(*) `sql` over the hot tables and each archived month overlapping [start, end)."""
+    total = conn.execute(sql, params).fetchone()[0]
+    for part in partitions(conn, start, end):
+        arc = open_partition(conn, part["path"])
+        try:
+            total += arc.execute(sql, params).fetchone()[0]
+        finally:
+            arc.close()
+    return total
+
+
+def _create_archive_table(conn, table):
+    # same definition as the hot table (columns, AUTOINCREMENT id) in arc.*
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                       (table,)).fetchone()[0]
+    sql = re.sub(r"^CREATE TABLE\s+(IF NOT EXISTS\s+)?\"?\w+\"?",
+                 f"CREATE TABLE IF NOT EXISTS arc.{table}", sql)
+    conn.execute(sql)
+    # months archived before a later ALTER TABLE ADD COLUMN get the new columns too
+    have = {r["name"] for r in conn.execute(f"PRAGMA arc.table_info({table})")}
+    for col in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+        if col["name"] not in have:
+            default = "" if col["dflt_value"] is None else f" DEFAULT {col['dflt_value']}"
+            conn.execute(f"ALTER TABLE arc.{table} ADD COLUMN {col['name']} {col['type']}{default}")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS arc.idx_{table}_patient_ts ON {table} (patient_id, timestamp)")
+
+
+def archive_month(conn, month):
+    """Move one month of bp_readings/access_logs into its archive file. Idempotent."""
+    start_ts, end_ts = month_bounds(month)
+    folder = archive_dir(conn)
+    os.makedirs(folder, exist_ok=True)
+    path = f"{month}.db"
+    full = os.path.join(folder, path)
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("ATTACH DATABASE ? AS arc", (full,))
+    try:
+        for table in TABLES:
+            _create_archive_table(conn, table)
+        conn.execute("BEGIN IMMEDIATE")
+        counts = {}
+        for table in TABLES:
+            cols = ", ".join(r["name"] for r in conn.execute(f"PRAGMA arc.table_info({table})"))
+            # copy-then-delete; OR IGNORE keeps a rerun after a crash harmless
+            conn.execute(f"""
+                INSERT OR IGNORE INTO arc.{table} ({cols})
+                SELECT {cols} FROM main.{table} WHERE timestamp >= ? AND timestamp < ?
+            """, (start_ts, end_ts))
+            conn.execute(f"DELETE FROM main.{table} WHERE timestamp >= ? AND timestamp < ?",
+                         (start_ts, end_ts))
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM arc.{table}").fetchone()[0]
+        conn.execute("""
+            INSERT OR REPLACE INTO archive_partitions
+                (month, path, start_ts, end_ts, bp_readings, access_logs, archived_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (month, path, start_ts, end_ts, counts["bp_readings"], counts["access_logs"],
+              timestamps.now_ms()))
+        conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE arc")
+
+    # compact: the file is written once per month, so VACUUM leaves it dense
+    arc = sqlite3.connect(full)
+    arc.execute("VACUUM")
+    arc.close()
+    return counts
+
+
+def cold_months(conn, keep_months=DEFAULT_KEEP_MONTHS, today=None):
+    """Months (YYYY-MM) with hot rows older than the last `keep_months` months."""
+    cutoff = month_bounds(_months_back(today or date.today(), keep_months - 1))[0]
+    months = set()
+    for table in TABLES:
+        months.update(r[0] for r in conn.execute(f"""
+            SELECT DISTINCT {timestamps.LOCAL_MONTH_SQL.format(col="timestamp")} FROM {table}
+            WHERE timestamp < ? AND typeof(timestamp) = 'integer'
+        """, (cutoff,)))
+    return sorted(m for m in months if re.fullmatch(r"\d{4}-\d{2}", m or ""))
+
+
+def run(conn, keep_months=DEFAULT_KEEP_MONTHS, today=None):
+    archived = {month: archive_month(conn, month) for month in cold_months(conn, keep_months, today)}
+    # delta-sync log entries for the same period go too (clients that far behind reload in full)
+    changes.prune(conn, month_bounds(_months_back(today or date.today(), keep_months - 1))[0])
+    conn.commit()
+    return archived
+
+
+def purge(conn, keep_months, today=None):
+    """Retention: delete archived months older than `keep_months` months."""
+    cutoff = _months_back(today or date.today(), keep_months)
+    doomed = conn.execute("SELECT month, path FROM archive_partitions WHERE month < ?",
+                          (cutoff,)).fetchall()
+    for part in doomed:
+        conn.execute("DELETE FROM archive_partitions WHERE month = ?", (part["month"],))
+        conn.commit()
+        full = os.path.join(archive_dir(conn), part["path"])
+        if os.path.exists(full):
+            os.remove(full)
+    return [p["month"] for p in doomed]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old months of bp_readings / access_logs")
+    parser.add_argument("command", choices=["run", "list"])
+    parser.add_argument("--keep-months", type=int, default=DEFAULT_KEEP_MONTHS,
+                        help="months kept in the main database (current month included)")
+    parser.add_argument("--purge-months", type=int,
+                        help="also delete archives older than this many months")
+    args = parser.parse_args()
+
+    conn = db.connect()
+    if args.command == "run":
+        for month, counts in run(conn, args.keep_months).items():
+            print(f"{month}: {counts['bp_readings']} readings, {counts['access_logs']} accesses archived")
+        if args.purge_months:
+            for month in purge(conn, args.purge_months):
+                print(f"{month}: purged")
+    for part in conn.execute("SELECT * FROM archive_partitions ORDER BY month"):
+        print(f"{part['month']}  {part['path']}  readings={part['bp_readings']}  "
+              f"accesses={part['access_logs']}")
+    conn.close()
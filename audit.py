@@ -0,0 +1,222 @@
+# audit.py
+# Access-log (audit trail) writer that keeps chart views write-free:
+#   - record() appends the event to a local spool file and queues it; no
+#     SQLite write happens on the request thread
+#   - a background thread inserts queued events in batches (one transaction
+#     per batch) on its own connection
+#   - the spool (one NDJSON file per process) is rewritten after each batch,
+#     and spools left behind by a crashed process are replayed at startup;
+#     event_id is unique in access_logs, so a replay never double-logs
+#
+# Until their batch is committed, events are merged into the access lists
+# the views read (merge_pending), so "Who accessed my record?" never misses
+# or reorders a view that is still in the queue.
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+
+import changes
+import db
+import events
+import timestamps
+
+FLUSH_INTERVAL = float(os.environ.get("CARELINK_AUDIT_FLUSH_INTERVAL", "0.5"))
+BATCH_SIZE = 500
+
+INSERT_SQL = """
+    INSERT OR IGNORE INTO access_logs (event_id, patient_id, actor, role, action, timestamp)
+    VALUES (:event_id, :patient_id, :actor, :role, :action, :timestamp)
+"""
+BUMP_SQL = "UPDATE patients SET access_version = access_version + 1 WHERE patient_id = ?"
+
+log = logging.getLogger(__name__)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditLog:
+    def __init__(self, spool_dir, db_path=None, flush_interval=FLUSH_INTERVAL):
+        self.spool_dir = spool_dir
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        os.makedirs(spool_dir, exist_ok=True)
+        self._spool_path = os.path.join(spool_dir, f"spool-{os.getpid()}.ndjson")
+        self._lock = threading.Lock()          # pending list + spool file
+        self._flush_lock = threading.Lock()    # one batch in flight at a time
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._pending = []
+        self._by_patient = {}                  # patient_id -> queued events, oldest first
+        self._conn = None
+        self._spool = open(self._spool_path, "a", encoding="utf-8")
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, patient_id, actor, role, action="view"):
+        event = {
+            "event_id": uuid.uuid4().hex,
+            "patient_id": patient_id,
+            "actor": actor,
+            "role": role,
+            "action": action,
+            "timestamp": timestamps.now_ms(),
+        }
+        with self._lock:
+            self._spool.write(json.dumps(event) + "\n")
+            self._spool.flush()
+            self._pending.append(event)
+            self._by_patient.setdefault(patient_id, []).append(event)
+            if len(self._pending) >= BATCH_SIZE:
+                self._wakeup.set()
+        return event
+
+    def pending(self, patient_id):
+        with self._lock:
+            return list(self._by_patient.get(patient_id, ()))
+
+    def flush(self):
+        """Write everything queued so far; returns the number of events written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+            conn = self._connection()
+            with conn:
+                conn.executemany(INSERT_SQL, batch)
+                changes.record_accesses(conn, [e["event_id"] for e in batch])
+                # invalidates cached patient views (cache.py ETags)
+                conn.executemany(BUMP_SQL, [(pid,) for pid in {e["patient_id"] for e in batch}])
+            events.notify()
+            written = {e["event_id"] for e in batch}
+            with self._lock:
+                self._pending = [e for e in self._pending if e["event_id"] not in written]
+                self._index()
+                self._rewrite_spool()
+            return len(batch)
+
+    def close(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+        with self._lock:
+            self._spool.close()
+            if not self._pending:
+                os.remove(self._spool_path)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _connection(self):
+        # only ever used under _flush_lock (writer thread, or close() at exit)
+        if self._conn is None:
+            self._conn = db.connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def _index(self):
+        self._by_patient = {}
+        for e in self._pending:
+            self._by_patient.setdefault(e["patient_id"], []).append(e)
+
+    def _rewrite_spool(self):
+        # caller holds _lock: the spool holds exactly the events not yet committed
+        self._spool.close()
+        tmp = self._spool_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for e in self._pending:
+                f.write(json.dumps(e) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._spool_path)
+        self._spool = open(self._spool_path, "a", encoding="utf-8")
+
+    def _recover(self):
+        # spools of crashed processes (and our own pid, if it was reused)
+        orphans = []
+        for path in glob.glob(os.path.join(self.spool_dir, "spool-*.ndjson")):
+            try:
+                pid = int(os.path.basename(path)[len("spool-"):-len(".ndjson")])
+            except ValueError:
+                continue
+            if pid == os.getpid() or not _pid_alive(pid):
+                orphans.append(path)
+        for path in orphans:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from the crash
+                    event.setdefault("action", "view")  # spooled before access_logs.action
+                    # spooled before epoch-ms timestamps: ISO text
+                    event["timestamp"] = timestamps.encode(event["timestamp"])
+                    self._pending.append(event)
+        if not orphans:
+            return
+        self._pending.sort(key=lambda e: e["timestamp"])
+        with self._lock:
+            self._index()
+            self._rewrite_spool()
+        for path in orphans:
+            if path != self._spool_path:
+                os.remove(path)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # DB locked/unavailable: events stay queued and spooled, retry next tick
+                log.exception("audit flush failed")
+
+
+def merge_pending(patient_id, accesses, limit):
+    """Newest-first (decoded) access rows with this process's queued events folded in."""
+    pending = get_audit().pending(patient_id)
+    if not pending:
+        return accesses
+    seen = {a.get("event_id") for a in accesses}
+    merged = accesses + [timestamps.decode_row(e, ("timestamp",)) for e in pending
+                         if e["event_id"] not in seen]
+    # to_iso() text sorts in time order
+    merged.sort(key=lambda a: a["timestamp"] or "", reverse=True)
+    return merged[:limit]
+
+
+_audit = None
+_audit_lock = threading.Lock()
+
+
+def get_audit():
+    global _audit
+    # a forked worker gets its own writer thread and spool file
+    if _audit is None or _audit.pid != os.getpid():
+        with _audit_lock:
+            if _audit is None or _audit.pid != os.getpid():
+                spool_dir = os.environ.get("CARELINK_AUDIT_SPOOL", db.DB_PATH + ".audit")
+                _audit = AuditLog(spool_dir, db.DB_PATH)
+                atexit.register(_audit.close)
+    return _audit
+
+
+def record(patient_id, actor, role, action="view"):
+    return get_audit().record(patient_id, actor, role, action)
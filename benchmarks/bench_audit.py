@@ -0,0 +1,94 @@
+# benchmarks/bench_audit.py
+# Chart views under concurrent BP entry: the old synchronous access_logs
+# INSERT + commit inside every view versus audit.record() (spooled, written in
+# batches by the background writer).
+#
+#   python benchmarks/bench_audit.py --threads 8 --seconds 5 --write-ratio 0.2
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from seed import seed
+
+import audit
+import db
+import timestamps
+from snapshot import load_patient_snapshot
+
+SYNC_LOG_SQL = """
+    INSERT INTO access_logs (patient_id, actor, role, timestamp)
+    SELECT patient_id, ?, ?, ? FROM patients WHERE patient_id = ? AND consent
+"""
+WRITE_QUERY = """
+    INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def run(mode, ids, threads, seconds, write_ratio):
+    views = [[] for _ in range(threads)]
+    errors = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(idx):
+        rng = random.Random(idx)
+        while time.perf_counter() < stop:
+            pid = rng.choice(ids)
+            conn = db.get_db()
+            try:
+                if rng.random() < write_ratio:
+                    conn.execute(WRITE_QUERY, (pid, 130, 85, 70, timestamps.now_ms()))
+                    conn.commit()
+                    continue
+                t0 = time.perf_counter()
+                if mode == "sync":
+                    conn.execute(SYNC_LOG_SQL, ("pharm01", "pharmacist", timestamps.now_ms(), pid))
+                    conn.commit()
+                else:
+                    audit.record(pid, "pharm01", "pharmacist")
+                load_patient_snapshot(conn, pid)
+                views[idx].append(time.perf_counter() - t0)
+            except sqlite3.OperationalError:
+                errors[idx] += 1
+            finally:
+                db.pool.release()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    latencies = sorted(x for v in views for x in v)
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    return len(latencies) / seconds, p95, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--readings", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        ids = seed(path, patients=args.patients, readings=args.readings)
+        db.configure(path)
+        os.environ["CARELINK_AUDIT_SPOOL"] = os.path.join(tmp, "audit")
+        for mode in ("sync", "async"):
+            vps, p95, errors = run(mode, ids, args.threads, args.seconds, args.write_ratio)
+            print(f"{mode:>6}: {vps:10.1f} views/s  p95 {p95:6.2f} ms  ({errors} lock errors)")
+        written = audit.get_audit().flush()
+        print(f"async: {written} events still queued at the end, flushed")
+        audit.get_audit().close()
+        db.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_bp_ingest.py
+# Home-monitor upload load test: N readings posted one request at a time to
+# /api/patient/<id>/bp versus batched to /api/patient/<id>/bp/batch, then the
+# same batches re-sent (a device resync that should store nothing new).
+#
+#   python benchmarks/bench_bp_ingest.py --readings 20000 --batch 500
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from seed import seed
+
+import db
+
+
+def readings(n, start):
+    for i in range(n):
+        ts = start + timedelta(minutes=5 * i)
+        yield {
+            "systolic": 110 + i % 50,
+            "diastolic": 70 + i % 20,
+            "heart_rate": 60 + i % 30,
+            "timestamp": ts.isoformat(),
+            "id": f"cuff-{i}",
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=1_000)
+    parser.add_argument("--readings", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--single", type=int, default=2_000,
+                        help="readings posted one by one (the slow path)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        ids = seed(path, patients=args.patients, readings=10, meds=3, symptoms=0, accesses=0)
+        db.configure(path)
+        from app import app  # after configure: routes use the seeded file
+        client = app.test_client()
+        pid = ids[0]
+        start = datetime.now() - timedelta(days=365)
+
+        t0 = time.perf_counter()
+        for _ in range(args.single):
+            client.post(f"/api/patient/{pid}/bp",
+                        json={"systolic": 120, "diastolic": 80, "heart_rate": 70})
+        single = time.perf_counter() - t0
+        print(f"single:  {args.single / single:,.0f} readings/s ({args.single} requests)")
+
+        batch = list(readings(args.readings, start))
+        chunks = [batch[i:i + args.batch] for i in range(0, len(batch), args.batch)]
+        for label in ("batch", "resync"):
+            pid = ids[1]
+            inserted = 0
+            t0 = time.perf_counter()
+            for chunk in chunks:
+                r = client.post(f"/api/patient/{pid}/bp/batch", json=chunk)
+                assert r.status_code == 200, r.get_json()
+                inserted += r.get_json()["inserted"]
+            elapsed = time.perf_counter() - t0
+            print(f"{label}:  {args.readings / elapsed:,.0f} readings/s "
+                  f"({len(chunks)} requests of {args.batch}, {inserted} inserted)")
+        db.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/bench_conditions.py
+# Cohort filter "HTN AND DM AND review_due" over a large panel: the old
+# comma-string LIKE scan (and splitting the strings in Python) versus the
+# condition bitmask and the patient_conditions junction (conditions.py).
+# Reports the full cohort count and the first dashboard page (panel.py).
+#
+#   python benchmarks/bench_conditions.py --patients 100000
+import argparse
+import os
+import tempfile
+import time
+
+from seed import seed
+
+import db
+import mtm
+import panel
+import timestamps
+from conditions import condition_mask
+
+COHORT = ["HTN", "DM"]
+EMPTY_COHORT = ["HTN", "DLD"]   # seed.py never combines these: the page scans the whole panel
+
+LIKE_COUNT_SQL = """
+    SELECT COUNT(*) FROM patients p JOIN patient_risk r ON r.patient_id = p.patient_id
+    WHERE (',' || IFNULL(p.conditions, '') || ',') LIKE ?
+      AND (',' || IFNULL(p.conditions, '') || ',') LIKE ?
+      AND r.review_due = 1
+"""
+LIKE_PAGE_SQL = """
+    SELECT p.patient_id, p.name, p.conditions, r.mtm_score
+    FROM patients p CROSS JOIN patient_risk r ON r.patient_id = p.patient_id
+    WHERE (',' || IFNULL(p.conditions, '') || ',') LIKE ?
+      AND (',' || IFNULL(p.conditions, '') || ',') LIKE ?
+      AND r.review_due = 1
+    ORDER BY IFNULL(p.name, ''), p.patient_id
+    LIMIT 50
+"""
+MASK_COUNT_SQL = """
+    SELECT COUNT(*) FROM patients p INDEXED BY idx_patients_condition_mask
+    CROSS JOIN patient_risk r ON r.patient_id = p.patient_id
+    WHERE (p.condition_mask & :m) = :m AND r.review_due = 1
+"""
+JUNCTION_COUNT_SQL = """
+    SELECT COUNT(*) FROM (
+        SELECT patient_id FROM patient_conditions WHERE code = ?
+        INTERSECT
+        SELECT patient_id FROM patient_conditions WHERE code = ?
+    ) c JOIN patient_risk r ON r.patient_id = c.patient_id
+    WHERE r.review_due = 1
+"""
+
+
+def timed(label, fn, repeat):
+    fn()  # warm the page cache
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label:>24}: {(time.perf_counter() - t0) / repeat * 1000:9.2f} ms  -> {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        seed(path, patients=args.patients, readings=5, meds=5, symptoms=0, accesses=0)
+        conn = db.connect(path)
+        # half the panel had a recent review, so review_due actually filters
+        conn.execute("UPDATE patients SET last_med_review = ? WHERE rowid % 2 = 0", (timestamps.now_ms(),))
+        mtm.refresh(conn)
+        conn.commit()
+        print(f"seeded {args.patients} patients in {time.perf_counter() - t0:.1f}s")
+
+        likes = [f"%,{c},%" for c in COHORT]
+        mask = condition_mask(conn, COHORT)
+
+        def python_split():
+            rows = conn.execute("""
+                SELECT p.conditions FROM patients p JOIN patient_risk r ON r.patient_id = p.patient_id
+                WHERE r.review_due = 1
+            """)
+            return sum(1 for (value,) in rows if set(COHORT) <= set((value or "").split(",")))
+
+        print("-- cohort count")
+        timed("python split", python_split, args.repeat)
+        timed("LIKE", lambda: conn.execute(LIKE_COUNT_SQL, likes).fetchone()[0], args.repeat)
+        timed("bitmask", lambda: conn.execute(MASK_COUNT_SQL, {"m": mask}).fetchone()[0], args.repeat)
+        timed("junction", lambda: conn.execute(JUNCTION_COUNT_SQL, COHORT).fetchone()[0], args.repeat)
+
+        print("-- first dashboard page (by name)")
+        timed("LIKE", lambda: len(conn.execute(LIKE_PAGE_SQL, likes).fetchall()), args.repeat)
+        timed("bitmask (panel.py)", lambda: len(panel.query_panel(
+            conn, conditions=COHORT, review_due=True)["patients"]), args.repeat)
+        print("-- empty cohort page (worst case)")
+        timed("LIKE", lambda: len(conn.execute(LIKE_PAGE_SQL, [f"%,{c},%" for c in EMPTY_COHORT]).fetchall()),
+              args.repeat)
+        timed("bitmask (panel.py)", lambda: len(panel.query_panel(
+            conn, conditions=EMPTY_COHORT, review_due=True)["patients"]), args.repeat)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
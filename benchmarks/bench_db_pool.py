@@ -0,0 +1,108 @@
+# benchmarks/bench_db_pool.py
+# Mixed read/write throughput: per-request sqlite3.connect() (the old get_db)
+# versus the pooled WAL connections from db.py.
+#
+#   python benchmarks/bench_db_pool.py --threads 8 --seconds 5 --write-ratio 0.2
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from seed import seed
+
+import db
+import timestamps
+
+READ_QUERIES = (
+    "SELECT * FROM patients WHERE patient_id = ?",
+    "SELECT * FROM bp_readings WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 10",
+    "SELECT * FROM medications WHERE patient_id = ?",
+    "SELECT * FROM symptom_logs WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 3",
+    "SELECT * FROM access_logs WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 5",
+)
+WRITE_QUERY = """
+    INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def legacy_conn(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def handle(conn, pid, write):
+    cur = conn.cursor()
+    if write:
+        cur.execute(WRITE_QUERY, (pid, 130, 85, 70, timestamps.now_ms()))
+        conn.commit()
+    else:
+        for sql in READ_QUERIES:
+            cur.execute(sql, (pid,))
+            cur.fetchall()
+
+
+def run(mode, path, ids, threads, seconds, write_ratio):
+    done = [0] * threads
+    errors = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(idx):
+        rng = random.Random(idx)
+        while time.perf_counter() < stop:
+            pid = rng.choice(ids)
+            write = rng.random() < write_ratio
+            try:
+                if mode == "legacy":
+                    conn = legacy_conn(path)
+                    handle(conn, pid, write)
+                    conn.close()
+                else:
+                    conn = db.get_db()
+                    handle(conn, pid, write)
+                    db.pool.release()
+                done[idx] += 1
+            except sqlite3.OperationalError:
+                errors[idx] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(done) / seconds, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--readings", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pooled_path = os.path.join(tmp, "pooled.db")
+        ids = seed(legacy_path, patients=args.patients, readings=args.readings)
+        seed(pooled_path, patients=args.patients, readings=args.readings)
+        # seed() goes through db.connect(), which switches the file to WAL;
+        # put the legacy copy back on the default rollback journal.
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+        db.configure(pooled_path)
+        for mode, path in (("legacy", legacy_path), ("pooled", pooled_path)):
+            rps, errors = run(mode, path, ids, args.threads, args.seconds, args.write_ratio)
+            print(f"{mode:>7}: {rps:10.1f} req/s  ({errors} lock errors)")
+        db.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_drugs.py
+# Drug-name lookup latency (drugs.py): best match for OCR'd label lines with
+# typos and digit/letter confusions, and autocomplete of typed prefixes, on
+# the shipped dictionary and on a synthetic one padded to --synthetic names.
+# Baselines are what a route would do without the index: difflib over every
+# alias for matching, a startswith scan for completion.
+#
+#   python benchmarks/bench_drugs.py --lookups 20000 --synthetic 20000
+import argparse
+import csv
+import difflib
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import drugs  # noqa: E402
+
+OCR_SWAPS = {"o": "0", "l": "1", "s": "5", "i": "l", "b": "8"}
+FORMS = ["TAB", "TABL", "TABLET", "CAP", "ER TAB", ""]
+# synthetic names from consonant-vowel(-consonant) syllables, about as varied as real ones
+SYLLABLES = [c + v + e for c in "bcdfghklmnprstvxz" for v in "aeiouy" for e in ("", "", "l", "n", "r", "x")]
+
+
+def load_rows(path, pad, rng):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    seen = {r["drug_id"] for r in rows}
+    while len(rows) < pad:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 4)))
+        if name in seen:
+            continue
+        seen.add(name)
+        rows.append({"drug_id": name, "name": name.capitalize(), "synonyms": "",
+                     "strengths": "10 mg|20 mg"})
+    return rows
+
+
+def garble(name, rng):
+    chars = list(name.upper())
+    for _ in range(rng.choice([0, 0, 1, 1, 2])):
+        i = rng.randrange(len(chars))
+        c = chars[i].lower()
+        if c in OCR_SWAPS and rng.random() < 0.6:
+            chars[i] = OCR_SWAPS[c].upper()
+        elif rng.random() < 0.5:
+            del chars[i]
+        else:
+            chars.insert(i, rng.choice("AEIOU"))
+    return "".join(chars)
+
+
+def ocr_lines(rows, n, rng):
+    lines = []
+    for _ in range(n):
+        row = rng.choice(rows)
+        name = rng.choice([row["name"], *filter(None, row["synonyms"].split("|"))])
+        lines.append((row["drug_id"], f"{rng.choice([30, 60, 90, 120])} {garble(name, rng)} "
+                                      f"{rng.choice([5, 10, 20, 500])} MG {rng.choice(FORMS)}".strip()))
+    return lines
+
+
+def prefixes(rows, n, rng):
+    out = []
+    for _ in range(n):
+        name = drugs.normalize(rng.choice(rows)["name"])
+        out.append(name[:rng.randint(2, min(6, len(name)))])
+    return out
+
+
+def timed(fn, items):
+    samples = []
+    results = []
+    for item in items:
+        t0 = time.perf_counter()
+        results.append(fn(item))
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return samples, results
+
+
+def report(label, samples):
+    p = lambda q: samples[min(int(len(samples) * q), len(samples) - 1)]  # noqa: E731
+    print(f"  {label:>28}: p50 {p(0.50):8.1f} us  p99 {p(0.99):8.1f} us  mean {statistics.fmean(samples):8.1f} us")
+
+
+def run(rows, n, rng, baseline):
+    t0 = time.perf_counter()
+    index = drugs.DrugIndex(rows)
+    print(f"-- {len(index)} drugs: index built in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    lines = ocr_lines(rows, n, rng)
+    samples, found = timed(index.match, [line for _, line in lines])
+    hits = sum(1 for (want, _), r in zip(lines, found) if r and r["drug_id"] == want)
+    accepted = [(want, r) for (want, _), r in zip(lines, found) if r and r["score"] >= drugs.AUTO_MATCH]
+    wrong = sum(1 for want, r in accepted if r["drug_id"] != want)
+    report("match OCR line (index)", samples)
+    print(f"  {'':>28}  best match correct {hits / n:.1%}; auto-accepted {len(accepted) / n:.1%}"
+          f" ({wrong} wrong)")
+
+    words = prefixes(rows, n, rng)
+    samples, _ = timed(lambda q: index.complete(q, 10), words)
+    report("complete prefix (index)", samples)
+
+    if baseline:
+        aliases = {}
+        for r in rows:
+            for a in [r["name"], *r["synonyms"].split("|")]:
+                if a:
+                    aliases.setdefault(drugs.normalize(a), r["drug_id"])
+        names = list(aliases)
+        k = max(n // 20, 50)
+        samples, _ = timed(lambda line: difflib.get_close_matches(drugs.normalize(line), names, 1, 0.5),
+                           [line for _, line in lines[:k]])
+        report("match OCR line (difflib)", samples)
+        samples, _ = timed(lambda q: sorted(a for a in names if a.startswith(q))[:10], words[:k])
+        report("complete prefix (scan)", samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--synthetic", type=int, default=20_000, help="pad the dictionary to this many drugs")
+    parser.add_argument("--no-baseline", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    shipped = load_rows(drugs.DRUGS_PATH, 0, rng)
+    run(shipped, args.lookups, rng, not args.no_baseline)
+    if args.synthetic > len(shipped):
+        run(load_rows(drugs.DRUGS_PATH, args.synthetic, rng), args.lookups, rng, not args.no_baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_etag.py
+# Repeated fetches of an unchanged pharmacist patient view: full rebuild
+# (cache cleared each time), body served from the response cache, and a
+# conditional GET answered with 304.
+#
+#   python benchmarks/bench_etag.py --readings 5000 --requests 500
+import argparse
+import os
+import tempfile
+import time
+
+from seed import seed
+
+import cache
+import db
+
+
+def timed(client, url, n, headers=None, clear=False):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        if clear:
+            cache.responses.clear()
+        r = client.get(url, headers=headers or {})
+        assert r.status_code in (200, 304), r.status_code
+    return n / (time.perf_counter() - t0), r.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--readings", type=int, default=5_000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        ids = seed(path, patients=args.patients, readings=args.readings, accesses=20)
+        db.configure(path)
+        os.environ["CARELINK_AUDIT_SPOOL"] = os.path.join(tmp, "audit")
+        # every view queues an access event; the audit writer flushes them as
+        # usual (the pharmacist ETag does not depend on access_version)
+        import audit
+        from app import app
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s["pharm_logged_in"] = True
+        conn = db.get_db()
+        conn.execute("UPDATE patients SET consent = 1 WHERE patient_id = ?", (ids[0],))
+        conn.commit()
+
+        url = f"/api/pharm/patient/{ids[0]}"
+        etag = client.get(url).headers["ETag"]
+        for label, kwargs in (
+            ("rebuild", {"clear": True}),
+            ("cached", {}),
+            ("304", {"headers": {"If-None-Match": etag}}),
+        ):
+            rps, status = timed(client, url, args.requests, **kwargs)
+            print(f"{label:>8}: {rps:8.0f} req/s  (status {status})")
+        audit.get_audit().close()
+        db.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
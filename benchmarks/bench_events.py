@@ -0,0 +1,81 @@
+# benchmarks/bench_events.py
+# SSE fan-out: one panel-wide writer, many live subscribers, some of which
+# never read (stalled browsers). Reports delivery latency for the readers
+# and the buffered hints per stalled subscriber, which must stay bounded.
+#
+#   python benchmarks/bench_events.py --subscribers 100 --stalled 20 --writes 2000
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from seed import seed
+
+import bp_stats
+import db
+import events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=1_000)
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--stalled", type=int, default=20)
+    parser.add_argument("--writes", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        ids = seed(path, patients=args.patients, readings=5, meds=1, symptoms=0, accesses=0)
+        broker = events.Broker(path, poll_interval=0.05, max_subscribers=args.subscribers)
+        subs = [broker.subscribe() for _ in range(args.subscribers)]
+        time.sleep(0.2)  # poller baseline
+
+        sent = {}
+        latencies = []
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def reader(sub):
+            while not stop.is_set():
+                kind, batch = sub.next_events(0.2)
+                now = time.perf_counter()
+                if kind == "change":
+                    with lock:
+                        latencies.extend(now - sent[e["patient_id"]] for e in batch if e["patient_id"] in sent)
+
+        readers = [threading.Thread(target=reader, args=(s,)) for s in subs[args.stalled:]]
+        for t in readers:
+            t.start()
+
+        conn = db.connect(path)
+        rng = random.Random(0)
+        t0 = time.perf_counter()
+        for _ in range(args.writes):
+            pid = rng.choice(ids)
+            bp_stats.add_readings(conn, pid, [(130, 85, 70, None, None)])
+            conn.commit()
+            sent[pid] = time.perf_counter()
+            broker.notify()
+        elapsed = time.perf_counter() - t0
+        time.sleep(0.5)
+        stop.set()
+        for t in readers:
+            t.join()
+
+        latencies.sort()
+        pct = lambda q: latencies[int(len(latencies) * q)] * 1000 if latencies else 0.0  # noqa: E731
+        print(f"writes: {args.writes / elapsed:,.0f}/s with {args.subscribers} subscribers")
+        print(f"delivery: p50 {pct(0.5):.1f} ms  p99 {pct(0.99):.1f} ms  ({len(latencies)} hints)")
+        stalled = [len(s._pending) for s in subs[:args.stalled]]
+        print(f"stalled subscribers: max {max(stalled, default=0)} buffered hints "
+              f"(cap {events.MAX_PENDING}), overflowed: {sum(s._overflow for s in subs[:args.stalled])}")
+        for s in subs:
+            broker.unsubscribe(s)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_export.py
+# Full-history export of one patient with most of the history archived:
+# rows/s and peak Python memory of the streamed export (export.stream) against
+# building the whole body first (fetchall + dict(row) + one json.dumps).
+#
+#   python benchmarks/bench_export.py --readings 200000
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from seed import seed
+
+import archive
+import db
+import export
+
+
+def measure(label, fn, rows):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:>18}: {rows / elapsed:10.0f} rows/s  {size / 2**20:7.1f} MiB out  "
+          f"peak {peak / 2**20:7.1f} MiB")
+
+
+def drain(chunks):
+    return sum(len(c) for c in chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readings", type=int, default=200_000)
+    parser.add_argument("--keep-months", type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        ids = seed(path, patients=1, readings=args.readings, symptoms=500)
+        conn = db.connect(path)
+        archive.run(conn, keep_months=args.keep_months)
+        print(f"{len(archive.partitions(conn))} archived months, "
+              f"{conn.execute('SELECT COUNT(*) FROM bp_readings').fetchone()[0]} hot readings")
+
+        def buffered():
+            body = {section: [dict(r) for r in export._rows(conn, ids[0], section)]
+                    for section in export.SECTIONS}
+            return len(json.dumps(body))
+
+        measure("buffered json", buffered, args.readings)
+        for fmt in export.FORMATS:
+            measure(f"stream {fmt}", lambda: drain(export.stream(conn, ids[0], fmt)), args.readings)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
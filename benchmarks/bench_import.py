@@ -0,0 +1,91 @@
+# benchmarks/bench_import.py
+# Onboarding-sized bulk import: writes a synthetic roster (patients, meds,
+# BP readings, symptom notes) as CSV/NDJSON and loads it with
+# import_patients.py into an empty database, with and without deferred
+# index builds. Reports rows/s for the load and the time of the final
+# index build + aggregate rebuild.
+#
+#   python benchmarks/bench_import.py                       # 50k patients, 10M readings
+#   python benchmarks/bench_import.py --readings 1000000 --compare
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from seed import MED_NAMES, NOTES, patient_ids
+
+import db
+import import_patients
+from migrations import migrate
+
+
+def write_files(folder, patients, readings, rng):
+    ids = patient_ids(patients)
+    files = {kind: os.path.join(folder, name) for kind, name in (
+        ("patients", "patients.csv"), ("medications", "medications.ndjson"),
+        ("readings", "readings.csv"), ("symptoms", "symptoms.ndjson"))}
+    with open(files["patients"], "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["patient_id", "name", "consent", "conditions"])
+        w.writerows((pid, f"Patient {pid}", 1, rng.choice(["HTN", "HTN,DM", "DM", ""])) for pid in ids)
+    with open(files["medications"], "w") as f:
+        for pid in ids:
+            for name in rng.sample(MED_NAMES, 3):
+                f.write(json.dumps({"patient_id": pid, "name": name, "dose": "10 mg",
+                                    "frequency": "once daily"}) + "\n")
+    start = datetime.now() - timedelta(days=3 * 365)
+    per_patient = readings // patients
+    step = timedelta(days=3 * 365) / max(per_patient, 1)
+    with open(files["readings"], "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["patient_id", "systolic", "diastolic", "heart_rate", "timestamp"])
+        for pid in ids:
+            ts = start
+            for _ in range(per_patient):
+                ts += step
+                w.writerow((pid, rng.randint(100, 170), rng.randint(60, 95), rng.randint(55, 95),
+                            ts.isoformat(sep=" ", timespec="seconds")))
+    with open(files["symptoms"], "w") as f:
+        for pid in ids:
+            f.write(json.dumps({"patient_id": pid, "note": rng.choice(NOTES),
+                                "timestamp": (start + timedelta(days=rng.randint(0, 1000))).isoformat()}) + "\n")
+    return {kind: [path] for kind, path in files.items()}, per_patient * patients
+
+
+def load(folder, files, rows, defer, chunk):
+    path = os.path.join(folder, f"import-{'deferred' if defer else 'inline'}.db")
+    conn = db.connect(path)
+    migrate(conn)
+    t0 = time.perf_counter()
+    totals = import_patients.run(conn, files, chunk=chunk, defer=defer, report=lambda msg: None)
+    total = time.perf_counter() - t0
+    load_s = sum(t["seconds"] for t in totals.values())
+    print(f"{'deferred' if defer else 'inline':>8} indexes: readings {rows / totals[files['readings'][0]]['seconds']:10,.0f} rows/s  "
+          f"load {load_s:6.1f}s  indexes+aggregates {total - load_s:6.1f}s  total {total:6.1f}s")
+    conn.close()
+    os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=50_000)
+    parser.add_argument("--readings", type=int, default=10_000_000)
+    parser.add_argument("--chunk", type=int, default=import_patients.CHUNK_ROWS)
+    parser.add_argument("--compare", action="store_true", help="also load with indexes kept during the load")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        files, rows = write_files(tmp, args.patients, args.readings, random.Random(42))
+        print(f"{args.patients:,} patients, {rows:,} readings written in {time.perf_counter() - t0:.1f}s")
+        load(tmp, files, rows, True, args.chunk)
+        if args.compare:
+            load(tmp, files, rows, False, args.chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_indexes.py
+# Query plans and latency of the dashboard queries before and after
+# migration 2 (patient_id/timestamp indexes).
+#
+#   python benchmarks/bench_indexes.py                       # 10M readings
+#   python benchmarks/bench_indexes.py --rows 200000 --patients 1000
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from seed import seed
+
+import db
+from migrations import migrate
+
+# (route, sql) pairs issued by patient_dashboard and api_pharm_view_patient
+QUERIES = {
+    "patient_dashboard": (
+        "SELECT * FROM bp_readings WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 10",
+        "SELECT * FROM medications WHERE patient_id = ?",
+        "SELECT * FROM symptom_logs WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 3",
+        "SELECT * FROM access_logs WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 5",
+    ),
+    "api_pharm_view_patient": (
+        "SELECT * FROM bp_readings WHERE patient_id = ? ORDER BY timestamp ASC",
+        "SELECT * FROM medications WHERE patient_id = ?",
+        "SELECT * FROM symptom_logs WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 3",
+        "SELECT * FROM access_logs WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 5",
+    ),
+}
+
+
+def report(conn, ids, label, samples):
+    print(f"== {label} ==")
+    rng = random.Random(7)
+    for route, queries in QUERIES.items():
+        for sql in queries:
+            plan = conn.execute("EXPLAIN QUERY PLAN " + sql, (ids[0],)).fetchall()
+            print(f"  {sql}")
+            for row in plan:
+                print(f"      plan: {row['detail']}")
+        timings = []
+        for _ in range(samples):
+            pid = rng.choice(ids)
+            t0 = time.perf_counter()
+            for sql in queries:
+                conn.execute(sql, (pid,)).fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+        print(f"  {route}: median {statistics.median(timings):.2f} ms, "
+              f"max {max(timings):.2f} ms over {samples} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        ids = seed(path, patients=args.patients, readings=args.rows // args.patients,
+                   schema_version=1)
+        print(f"seeded {args.rows} readings in {time.perf_counter() - t0:.1f}s")
+
+        conn = db.connect(path)
+        report(conn, ids, "schema v1 (no indexes)", args.samples)
+        t0 = time.perf_counter()
+        migrate(conn)
+        print(f"migrated in {time.perf_counter() - t0:.1f}s")
+        conn.execute("ANALYZE")
+        report(conn, ids, "latest schema", args.samples)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bench_interactions.py
+# Drug-drug interaction checks (interactions.py): one medication list as a
+# view or write checks it (pair lookups, cold and cached), against scanning
+# every rule of data/interactions.csv for each list; then the whole-panel
+# sweep into patient_interactions and the dashboard's interaction filter.
+#
+#   python benchmarks/bench_interactions.py --patients 100000 --meds 8
+import argparse
+import csv
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from seed import seed
+
+import db
+import drugs
+import interactions
+import panel
+
+# common chronic-care drugs, so lists hit the table about as often as a real panel
+COMMON = ["lisinopril", "losartan", "amlodipine", "metformin", "atorvastatin", "simvastatin",
+          "hydrochlorothiazide", "metoprolol_succinate", "aspirin", "omeprazole", "levothyroxine",
+          "gabapentin", "sertraline", "furosemide", "glipizide", "clopidogrel", "warfarin",
+          "apixaban", "spironolactone", "tramadol", "ibuprofen", "prednisone", "allopurinol"]
+
+
+def med_lists(n, k, rng, all_ids):
+    # 80% of picks from COMMON, the rest anywhere in the dictionary
+    out = []
+    for _ in range(n):
+        size = max(1, int(rng.gauss(k, 3)))
+        out.append(list({rng.choice(COMMON) if rng.random() < 0.8 else rng.choice(all_ids)
+                         for _ in range(size)}))
+    return out
+
+
+def naive(rules, ids):
+    ids = set(ids)
+    found = []
+    for side_a, side_b, severity in rules:
+        for a in side_a & ids:
+            for b in side_b & ids:
+                if a != b:
+                    found.append((a, b, severity))
+    return found
+
+
+def timed(fn, items):
+    samples = []
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return samples
+
+
+def report(label, samples):
+    p = lambda q: samples[min(int(len(samples) * q), len(samples) - 1)]  # noqa: E731
+    print(f"  {label:>24}: p50 {p(0.50):8.1f} us  p99 {p(0.99):8.1f} us  mean {statistics.fmean(samples):8.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--meds", type=int, default=8, help="mean medications per patient")
+    parser.add_argument("--checks", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=20, help="runs per dashboard query")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    all_ids = [e["drug_id"] for e in drugs.get_index().entries]
+    t0 = time.perf_counter()
+    table = interactions.InteractionTable.from_csv()
+    print(f"{len(table)} interacting pairs loaded in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    with open(interactions.INTERACTIONS_PATH, newline="", encoding="utf-8") as f:
+        rules = [(set(r["drugs_a"].split("|")), set(r["drugs_b"].split("|")), r["severity"])
+                 for r in csv.DictReader(f)]
+
+    lists = med_lists(args.checks, args.meds, rng, all_ids)
+    print(f"-- one medication list ({args.meds} drugs on average)")
+    report("rule scan", timed(lambda ids: naive(rules, ids), lists))
+    report("pair lookup (cold)", timed(table.pairs, lists))
+    report("check (cache miss)", timed(table.check, lists))
+    # repeat views of the last MAX_CACHED lists (all still in the LRU)
+    report("check (cache hit)", timed(table.check, lists[-interactions.MAX_CACHED:]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        ids = seed(path, patients=args.patients, readings=1, meds=0, symptoms=0, accesses=0)
+        conn = db.connect(path)
+        conn.executemany(
+            "INSERT INTO medications (patient_id, name, dose, frequency, drug_id) VALUES (?, ?, '', 'daily', ?)",
+            [(pid, d, d) for pid, meds in zip(ids, med_lists(len(ids), args.meds, rng, all_ids)) for d in meds])
+        conn.commit()
+
+        t0 = time.perf_counter()
+        pairs = interactions.sweep(conn, table)
+        conn.commit()
+        seconds = time.perf_counter() - t0
+        flagged = conn.execute("""
+            SELECT COUNT(DISTINCT patient_id) FROM patient_interactions WHERE severity >= ?
+        """, (interactions.HIGH_RISK,)).fetchone()[0]
+        print(f"-- panel sweep: {args.patients:,} patients in {seconds:.2f}s, {pairs:,} pairs, "
+              f"{flagged:,} patients major or worse")
+
+        conn.execute("ANALYZE")
+        for label, kwargs in [("no filter", {}),
+                              ("interaction=major", {"interaction": "major"}),
+                              ("interaction=contraindicated", {"interaction": "contraindicated"}),
+                              ("major, by MTM score", {"interaction": "major", "sort": "mtm_score",
+                                                       "order": "desc"})]:
+            panel.query_panel(conn, **kwargs)
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                page = panel.query_panel(conn, **kwargs)
+            ms = (time.perf_counter() - t0) / args.repeat * 1000
+            print(f"  {label:>28}: {ms:7.2f} ms per page ({len(page['patients'])} rows)")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
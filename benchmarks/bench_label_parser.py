@@ -0,0 +1,87 @@
+# benchmarks/bench_label_parser.py
+# Label parsing throughput over a synthetic corpus of OCR'd label texts:
+# the old scan_med logic (patterns rebuilt per request, first medication
+# only) versus label_parser.parse_labels().
+#
+#   python benchmarks/bench_label_parser.py --labels 50000
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import label_parser  # noqa: E402
+
+DRUGS = ["METFORMIN HCL", "LISINOPRIL", "AMLODIPINE BESYLATE", "ATORVASTATIN CALCIUM",
+         "LOSARTAN POTASSIUM", "METOPROLOL SUCCINATE ER", "HYDROCHLOROTHIAZIDE", "GLIPIZIDE"]
+UNITS = ["MG", "mg", "MCG", "ML"]
+FORMS = ["TAB", "TABL", "TABLET", "CAP", "CAPSULE"]
+DIRECTIONS = ["TAKE 1 TABLET BY MOUTH ONCE DAILY", "TAKE 1 TABLET BY MOUTH TWICE DAILY",
+              "TAKE 2 CAPSULES EVERY 12 HOURS", "TAKE ONE BY MOUTH AT BEDTIME"]
+NOISE = ["CVS PHARMACY #1234", "RX# 0049213-01", "DR. KIM", "QTY: 30  REFILLS: 2",
+         "DISCARD AFTER 11/2026", "CAUTION: FEDERAL LAW PROHIBITS TRANSFER"]
+
+
+def corpus(n, seed=3):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        lines = rng.sample(NOISE, 3)
+        for _ in range(rng.choice([1, 1, 1, 2, 3])):
+            lines.append(f"{rng.choice([30, 60, 90, 120])} {rng.choice(DRUGS)} "
+                         f"{rng.choice([5, 10, 20, 25, 50, 500])} {rng.choice(UNITS)} {rng.choice(FORMS)}")
+            lines.append(rng.choice(DIRECTIONS))
+        texts.append("\n".join(lines))
+    return texts
+
+
+def legacy_parse(full_text):
+    # scan_med before label_parser.py, minus the Vision call
+    lines = [line.strip() for line in full_text.split("\n") if line.strip()]
+    MED_PATTERN = re.compile(r'\b(mg|mcg|g|ml|tablet|tab|tabl|caps?|capsule)\b', re.IGNORECASE)
+    med_lines = [line for line in lines if MED_PATTERN.search(line)]
+    FREQ_PATTERN = re.compile(r'\b(take|once daily|twice daily|every \d+ hours?|by mouth)\b',
+                              re.IGNORECASE)
+    freq_lines = [line for line in lines if FREQ_PATTERN.search(line)]
+    suggested_name = None
+    suggested_dose = None
+    if med_lines:
+        raw = med_lines[0]
+        DOSE_PATTERN = re.compile(r'(\d+)\s*(mg|mcg|g|ml|units?)', re.IGNORECASE)
+        m = DOSE_PATTERN.search(raw)
+        if m:
+            suggested_dose = m.group(0).strip()
+            parts = raw[:m.start()].strip().split()
+            if parts and parts[0].isdigit():
+                parts = parts[1:]
+            suggested_name = " ".join(parts) or raw.strip()
+        else:
+            suggested_name = raw.strip()
+    return suggested_name, suggested_dose, freq_lines[0] if freq_lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--labels", type=int, default=50_000)
+    args = parser.parse_args()
+    texts = corpus(args.labels)
+
+    t0 = time.perf_counter()
+    for t in texts:
+        legacy_parse(t)
+    legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results = label_parser.parse_labels(texts)
+    batch = time.perf_counter() - t0
+
+    meds = sum(len(r["medications"]) for r in results)
+    print(f"legacy (first med only): {args.labels / legacy:10,.0f} labels/s")
+    print(f"parse_labels:            {args.labels / batch:10,.0f} labels/s  ({meds} medications found)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_metrics.py
+# Cost of the SQL instrumentation (metrics.py): the dashboard's point queries
+# on a plain connection vs. a ProfiledConnection. With CARELINK_METRICS unset
+# db.connect() hands out plain connections, so "plain" is the disabled cost.
+# For whole requests compare two run_suite.py runs:
+#   python benchmarks/run_suite.py --json off.json
+#   CARELINK_METRICS=1 python benchmarks/run_suite.py --baseline off.json
+#
+#   python benchmarks/bench_metrics.py --queries 50000
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from seed import seed
+
+import db
+import metrics
+
+QUERIES = (
+    ("SELECT * FROM patients WHERE patient_id = ?", "one"),
+    ("SELECT * FROM bp_readings WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 10", "all"),
+    ("SELECT * FROM medications WHERE patient_id = ?", "iter"),
+)
+
+
+def run(conn, ids, n):
+    rng = random.Random(1)
+    t0 = time.perf_counter()
+    for i in range(n):
+        sql, how = QUERIES[i % len(QUERIES)]
+        cur = conn.execute(sql, (rng.choice(ids),))
+        if how == "one":
+            cur.fetchone()
+        elif how == "all":
+            cur.fetchall()
+        else:
+            for _ in cur:
+                pass
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=1_000)
+    parser.add_argument("--queries", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        ids = seed(path, patients=args.patients, readings=50)
+        metrics.SLOW_QUERY_MS = float("inf")
+        for label, factory in (("plain", sqlite3.Connection), ("profiled", metrics.ProfiledConnection)):
+            conn = db.connect(path, factory=factory)
+            run(conn, ids, 1000)  # warm the page cache
+            qps = run(conn, ids, args.queries)
+            print(f"{label:>9}: {qps:10.0f} queries/s  ({1e6 / qps:6.1f} us/query)")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_mtm.py
+# Whole-panel MTM scoring: one mtm.score_patients() pass versus scoring the
+# patients one at a time the way the per-patient views do.
+#
+#   python benchmarks/bench_mtm.py --patients 100000
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+from seed import seed
+
+import db
+import mtm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--readings", type=int, default=10)
+    parser.add_argument("--meds", type=int, default=5)
+    parser.add_argument("--loop-sample", type=int, default=5_000,
+                        help="patients scored one by one (extrapolated to the panel)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        ids = seed(path, patients=args.patients, readings=args.readings, meds=args.meds,
+                   symptoms=0, accesses=0)
+        print(f"seeded {args.patients} patients in {time.perf_counter() - t0:.1f}s")
+
+        conn = db.connect(path)
+        t0 = time.perf_counter()
+        scores = mtm.score_patients(conn)
+        batch = time.perf_counter() - t0
+        levels = Counter(s["mtm_level"] for s in scores)
+        print(f"batch:    {batch:.2f}s for {len(scores)} patients "
+              f"({len(scores) / batch:,.0f} patients/s)  levels={dict(levels)}")
+
+        sample = ids[:args.loop_sample]
+        t0 = time.perf_counter()
+        for pid in sample:
+            mtm.score_patient(conn, pid)
+        loop = (time.perf_counter() - t0) / len(sample) * len(ids)
+        print(f"per-patient: ~{loop:.2f}s extrapolated for {len(ids)} patients "
+              f"({len(ids) / loop:,.0f} patients/s)")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
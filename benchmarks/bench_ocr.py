@@ -0,0 +1,61 @@
+# benchmarks/bench_ocr.py
+# Burst of label uploads against the fake OCR backend (fixed per-call latency
+# standing in for the Vision round trip): direct backend calls per request,
+# as scan_med used to do, versus the cached OcrPipeline.
+#
+#   python benchmarks/bench_ocr.py --uploads 400 --distinct 50 --latency 0.05
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ocr  # noqa: E402
+
+
+def labels(distinct):
+    return [f"RX {i}\n{30 + i} LISINOPRIL {5 * (i % 8 + 1)} MG TAB\nTAKE 1 TABLET BY MOUTH ONCE DAILY".encode()
+            for i in range(distinct)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=400)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--flask-workers", type=int, default=8)
+    parser.add_argument("--ocr-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    corpus = labels(args.distinct)
+    uploads = [rng.choice(corpus) for _ in range(args.uploads)]
+
+    direct = ocr.FakeBackend(args.latency)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.flask_workers) as pool:
+        list(pool.map(direct.detect_text, uploads))
+    elapsed = time.perf_counter() - t0
+    print(f"direct:   {args.uploads / elapsed:8.1f} scans/s  backend calls={direct.calls}")
+
+    backend = ocr.FakeBackend(args.latency)
+    pipeline = ocr.OcrPipeline(backend, workers=args.ocr_workers, max_pending=args.uploads)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.flask_workers) as pool:
+        list(pool.map(pipeline.scan, uploads))
+    elapsed = time.perf_counter() - t0
+    print(f"pipeline: {args.uploads / elapsed:8.1f} scans/s  backend calls={backend.calls}")
+
+    t0 = time.perf_counter()
+    for content in corpus:
+        pipeline.scan(content)
+    per_hit = (time.perf_counter() - t0) / len(corpus) * 1e6
+    print(f"cache hit: {per_hit:.1f} us per re-scan")
+    pipeline.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/bench_search.py
+# Pharmacist search (search.py) over a million symptom notes: the FTS5 index
+# versus the LIKE '%term%' scan it replaces, both restricted to consented
+# patients. Reports the index build time (search.rebuild, as in migration 14)
+# and its size, then per-query latency for a common word, a rare word, two
+# words, a drug-name prefix, and the third ranked page (keyset cursor).
+#
+#   python benchmarks/bench_search.py --notes 1000000 --patients 20000
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from seed import seed
+
+import db
+import search
+import timestamps
+
+SYMPTOMS = ["dizzy", "dizziness", "headache", "nausea", "fatigue", "palpitations", "cough",
+            "swollen ankles", "blurred vision", "chest tightness", "insomnia",
+            "dry mouth", "muscle cramps", "shortness of breath", "lightheaded"]
+WHEN = ["in the morning", "after standing up", "after meals", "at night", "since yesterday",
+        "after the new dose", "while walking", "on and off", "all day"]
+DRUGS = ["amlodipine", "losartan", "metformin", "atorvastatin", "lisinopril", "hydrochlorothiazide",
+         "rosuvastatin", "glimepiride", "bisoprolol", "empagliflozin"]
+RARE = ["tinnitus", "angioedema", "gout flare", "hair loss"]   # ~0.2% of notes
+FILLER = ["felt", "very", "a bit", "mild", "strong", "again", "no", "better", "worse", "than usual",
+          "took", "missed", "dose", "checked", "BP", "high", "low", "called", "pharmacy"]
+
+# (label, search text, equivalent LIKE pattern)
+QUERIES = [
+    ("common word", "headache", "%headache%"),
+    ("rare word", "tinnitus", "%tinnitus%"),
+    ("two words", "dizzy morning", None),
+    ("drug prefix", "amlo*", "%amlo%"),
+]
+LIKE_SQL = """
+    SELECT s.id, s.patient_id, p.name, s.timestamp, s.note
+    FROM symptom_logs s JOIN patients p ON p.patient_id = s.patient_id AND p.consent = 1
+    WHERE s.note LIKE ?
+    ORDER BY s.timestamp DESC
+    LIMIT 20
+"""
+SIZE_SQL = "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name LIKE 'search_index%'"
+
+
+def note(rng):
+    words = [rng.choice(FILLER), rng.choice(SYMPTOMS), rng.choice(WHEN)]
+    if rng.random() < 0.002:
+        words[1] = rng.choice(RARE)
+    if rng.random() < 0.3:
+        words.append(f"since starting {rng.choice(DRUGS)}")
+    if rng.random() < 0.5:
+        words.insert(rng.randint(0, len(words)), rng.choice(FILLER))
+    return " ".join(words)
+
+
+def add_notes(conn, ids, n, rng, chunk=50_000):
+    start = datetime.now() - timedelta(days=730)
+    for lo in range(0, n, chunk):
+        conn.executemany(
+            "INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES (?, ?, ?)",
+            [(rng.choice(ids), note(rng), timestamps.encode(start + timedelta(minutes=rng.randint(0, 730 * 1440))))
+             for _ in range(min(chunk, n - lo))])
+        conn.commit()
+    conn.executemany("UPDATE patients SET care_plan = ? WHERE patient_id = ?",
+                     [(f"Continue {rng.choice(DRUGS)}; review {rng.choice(SYMPTOMS)} in 4 weeks", pid)
+                      for pid in ids])
+    conn.execute("UPDATE patients SET consent = 0 WHERE rowid % 10 = 0")
+    conn.commit()
+
+
+def timed(fn, repeat):
+    fn()  # warm
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - t0) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=20_000)
+    parser.add_argument("--notes", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20, help="runs per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        ids = seed(path, patients=args.patients, readings=1, symptoms=0)
+        conn = db.connect(path)
+        add_notes(conn, ids, args.notes, random.Random(3))
+        print(f"seeded {args.patients} patients, {args.notes} notes in {time.perf_counter() - t0:.1f}s")
+
+        t0 = time.perf_counter()
+        search.rebuild(conn)
+        conn.commit()
+        print(f"index build: {time.perf_counter() - t0:.1f}s, "
+              f"{conn.execute(SIZE_SQL).fetchone()[0] / 2**20:.1f} MiB")
+
+        for label, q, pattern in QUERIES:
+            fts_ms, page = timed(lambda: search.search(conn, q), args.repeat)
+            line = f"{label:>12} ({q}): FTS5 {fts_ms:8.2f} ms"
+            if pattern:
+                like_ms, _ = timed(lambda: conn.execute(LIKE_SQL, (pattern,)).fetchall(),
+                                   max(args.repeat // 5, 1))
+                line += f" | LIKE {like_ms:8.2f} ms (unranked)"
+            print(line + f" | {len(page['results'])} results")
+
+        def third_page():
+            cursor = None
+            for _ in range(3):
+                cursor = search.search(conn, "dizzy", cursor=cursor)["next_cursor"]
+            return cursor
+        ms, _ = timed(third_page, args.repeat)
+        print(f"{'3 pages':>12} (dizzy): FTS5 {ms:8.2f} ms for pages 1-3")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
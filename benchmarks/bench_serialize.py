@@ -0,0 +1,80 @@
+# benchmarks/bench_serialize.py
+# JSON encoding cost of the pharmacist patient view and of a full reading
+# history: the previous path (dict(row) per row with decoded timestamps +
+# stdlib json) against serialize.dumps (orjson when installed), rows rendered
+# by SQLite's json_object() (serialize.JsonRows, no dict per row), and the
+# columnar {"ts", "sys", "dia"} shape.
+#
+#   python benchmarks/bench_serialize.py --readings 20000 --points 5000
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from seed import seed
+
+import db
+import serialize
+import series
+import timestamps
+
+
+def timed(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        out = fn()
+    return (time.perf_counter() - t0) / n * 1000, len(out)
+
+
+def report(label, fn, n):
+    ms, size = timed(fn, n)
+    print(f"{label:>28}: {ms:8.2f} ms  {size / 1024:9.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--readings", type=int, default=20_000)
+    parser.add_argument("--points", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(f"orjson: {'yes' if serialize.orjson else 'no (stdlib json)'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        ids = seed(path, patients=args.patients, readings=args.readings, accesses=20)
+        db.configure(path)
+        os.environ["CARELINK_AUDIT_SPOOL"] = os.path.join(tmp, "audit")
+        import app as app_module
+        app = app_module.app
+        default = app.json.default
+
+        print(f"-- pharmacist view ({args.points} chart points)")
+        for fmt in ("", "columnar"):
+            with app.test_request_context(f"/?points={args.points}&format={fmt}"):
+                payload = app_module._pharm_patient_payload(db.get_db(), ids[0])
+            name = fmt or "default"
+            report(f"{name} serialize.dumps", lambda: serialize.dumps(
+                payload, default=default, sort_keys=True), args.repeat)
+
+        print(f"-- full reading history ({args.readings} rows)")
+        conn = db.get_db()
+        sql = "SELECT {} FROM bp_readings WHERE patient_id = ? ORDER BY timestamp"
+        params = (ids[0],)
+        rows_sql = sql.format("*")
+        json_sql = sql.format(serialize.json_object_sql(series.READING_FIELDS, iso=("timestamp",)))
+        report("dict(row) + stdlib json", lambda: json.dumps(
+            timestamps.decode_rows(conn.execute(rows_sql, params)), default=default,
+            sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode(), args.repeat)
+        report("dict(row) + serialize.dumps", lambda: serialize.dumps(
+            timestamps.decode_rows(conn.execute(rows_sql, params)), sort_keys=True), args.repeat)
+        report("json_object() JsonRows", lambda: serialize.dumps(serialize.JsonRows(
+            conn.execute(json_sql, params).fetchall()), sort_keys=True), args.repeat)
+        report("columnar", lambda: serialize.dumps(serialize.columnar(
+            conn.execute(rows_sql, params).fetchall())), args.repeat)
+        db.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
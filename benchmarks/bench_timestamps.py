@@ -0,0 +1,91 @@
+# benchmarks/bench_timestamps.py
+# TEXT timestamps (schema version 11) versus INTEGER epoch ms (migration 12,
+# timestamps.py) on the same readings: newest-first pages, 30-day range
+# queries, whole-history sorts and month scans (archive.py), plus the size of
+# the table and its timestamp indexes. Also reports how long migration 12
+# takes on the seeded data.
+#
+#   python benchmarks/bench_timestamps.py --patients 2000 --readings 500
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from seed import seed
+
+import db
+import timestamps
+from migrations import migrate
+
+QUERIES = {
+    "latest 10": ("SELECT * FROM bp_readings WHERE patient_id = ? ORDER BY timestamp DESC LIMIT 10", 0),
+    "30-day range": ("""
+        SELECT timestamp, systolic, diastolic FROM bp_readings
+        WHERE patient_id = ? AND timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp
+    """, 30),
+    "full history": ("SELECT timestamp, systolic FROM bp_readings WHERE patient_id = ? ORDER BY timestamp", 0),
+}
+MONTH_SQL = "SELECT COUNT(*), MAX(systolic) FROM bp_readings WHERE timestamp >= ? AND timestamp < ?"
+SIZE_SQL = "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = ?"
+SIZED = ("bp_readings", "idx_bp_readings_patient_ts", "idx_bp_readings_ts")
+
+
+def bounds(rng, days, encode):
+    start = datetime.now() - timedelta(days=rng.randint(days, 700))
+    return encode(start), encode(start + timedelta(days=days))
+
+
+def measure(conn, ids, repeat, encode):
+    # same patients and ranges on both sides; the bounds are encoded before timing
+    for label, (sql, days) in QUERIES.items():
+        rng = random.Random(7)
+        params = [(rng.choice(ids),) + (bounds(rng, days, encode) if days else ())
+                  for _ in range(repeat)]
+        t0 = time.perf_counter()
+        for p in params:
+            conn.execute(sql, p).fetchall()
+        print(f"  {label:>14}: {(time.perf_counter() - t0) / repeat * 1000:8.3f} ms/query")
+    rng = random.Random(7)
+    params = [bounds(rng, 30, encode) for _ in range(max(repeat // 50, 5))]
+    t0 = time.perf_counter()
+    for p in params:
+        conn.execute(MONTH_SQL, p).fetchone()
+    print(f"  {'month scan':>14}: {(time.perf_counter() - t0) / len(params) * 1000:8.3f} ms/query")
+    for name in SIZED:
+        size = conn.execute(SIZE_SQL, (name,)).fetchone()[0]
+        print(f"  {name:>28}: {size / 2**20:8.2f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=2_000)
+    parser.add_argument("--readings", type=int, default=500, help="BP readings per patient")
+    parser.add_argument("--repeat", type=int, default=2_000, help="queries per measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        ids = seed(path, patients=args.patients, readings=args.readings, schema_version=11)
+        print(f"seeded {args.patients} patients x {args.readings} readings in {time.perf_counter() - t0:.1f}s")
+        conn = db.connect(path)
+        conn.execute("VACUUM")   # sizes compare freshly built b-trees on both sides
+
+        print("-- TEXT timestamps (schema 11)")
+        measure(conn, ids, args.repeat, lambda ts: ts.isoformat(sep=" "))
+
+        t0 = time.perf_counter()
+        migrate(conn)
+        print(f"-- migration 12: {time.perf_counter() - t0:.1f}s")
+        conn.execute("VACUUM")
+
+        print("-- INTEGER epoch ms (schema 12)")
+        measure(conn, ids, args.repeat, timestamps.encode)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
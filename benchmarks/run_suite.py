@@ -0,0 +1,323 @@
+# benchmarks/run_suite.py
+# End-to-end load test of the Flask app on a seeded database.
+#
+# Scenarios hit the real routes: patient view, pharmacist patient view, BP
+# entry, pharmacist dashboard, and a weighted mix of the four. Each one runs
+#   - client: N threads, each with its own Flask test client (no network)
+#   - http:   the app behind a threaded HTTP server in a child process (or
+#             --url for one you started, e.g. gunicorn), driven by P load
+#             processes x C keep-alive connections
+# and reports throughput and p50/p95/p99 latency. --json writes the results
+# for regression tracking; --baseline compares against an earlier file and
+# exits 1 when a scenario got slower than --max-regression allows.
+#
+#   python benchmarks/run_suite.py --patients 1000 --readings 200 --seconds 5
+#   python benchmarks/run_suite.py --mode http --processes 4 --connections 4 --json after.json \
+#       --baseline before.json
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from seed import seed
+
+import db
+
+LOGIN = {"username": "pharm01", "password": "test123"}
+
+# name -> (method, path, JSON body); every client is logged in as the pharmacist
+SCENARIOS = {
+    "patient_view": ("GET", "/api/patient/{pid}", None),
+    "pharm_view": ("GET", "/api/pharm/patient/{pid}", None),
+    "bp_entry": ("POST", "/api/patient/{pid}/bp", "bp"),
+    "pharm_dashboard": ("GET", "/api/pharm/dashboard?limit=50", None),
+}
+# "mixed": a day at the pharmacy, roughly
+MIX = {"patient_view": 60, "pharm_view": 25, "bp_entry": 10, "pharm_dashboard": 5}
+
+
+def pick(scenario, rng):
+    if scenario == "mixed":
+        scenario = rng.choices(list(MIX), weights=list(MIX.values()))[0]
+    return scenario
+
+
+def request_args(scenario, ids, rng):
+    method, path, body = SCENARIOS[scenario]
+    path = path.format(pid=rng.choice(ids))
+    if body == "bp":
+        body = {"systolic": rng.randint(100, 170), "diastolic": rng.randint(60, 95),
+                "heart_rate": rng.randint(55, 95)}
+    return method, path, body
+
+
+def summarize(scenario, mode, latencies, errors, seconds):
+    latencies.sort()
+    if len(latencies) >= 2:
+        q = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = q[49], q[94], q[98]
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else 0.0
+    return {
+        "scenario": scenario,
+        "mode": mode,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(p50 * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "p99_ms": round(p99 * 1000, 3),
+    }
+
+
+# -- client mode -------------------------------------------------------------
+
+def run_client(app, scenario, ids, threads, seconds):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(n):
+        rng = random.Random(n)
+        client = app.test_client()
+        with client.session_transaction() as sess:  # what /api/pharm/login sets
+            sess["pharm_logged_in"] = True
+        mine, failed = [], 0
+        while time.perf_counter() < deadline:
+            method, path, body = request_args(pick(scenario, rng), ids, rng)
+            t0 = time.perf_counter()
+            r = client.open(path, method=method, json=body)
+            mine.append(time.perf_counter() - t0)
+            failed += r.status_code >= 400
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return summarize(scenario, "client", latencies, errors[0], time.perf_counter() - t0)
+
+
+# -- http mode ---------------------------------------------------------------
+
+def serve(db_path, spool, port, ready):
+    db.configure(db_path)
+    os.environ["CARELINK_AUDIT_SPOOL"] = spool
+    sys.stdout = open(os.devnull, "w")
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    from werkzeug.serving import make_server
+
+    from app import app
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    ready.set()
+    server.serve_forever()
+
+
+class Connection:
+    """Keep-alive HTTP connection that carries the session cookie."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.cookie = None
+
+    def request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        self.conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+        resp = self.conn.getresponse()
+        resp.read()
+        cookie = resp.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        return resp.status
+
+
+def load_process(url, scenario, ids, connections, deadline, seed_, out):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed_ * 1000 + n)
+        conn = Connection(url)
+        conn.request("POST", "/api/pharm/login", LOGIN)
+        mine, failed = [], 0
+        while time.time() < deadline:
+            method, path, body = request_args(pick(scenario, rng), ids, rng)
+            t0 = time.perf_counter()
+            try:
+                status = conn.request(method, path, body)
+            except (OSError, http.client.HTTPException):
+                status = 599
+                conn = Connection(url)
+                conn.request("POST", "/api/pharm/login", LOGIN)
+            mine.append(time.perf_counter() - t0)
+            failed += status >= 400
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(connections)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    out.put((latencies, errors[0]))
+
+
+def run_http(url, scenario, ids, processes, connections, seconds):
+    out = multiprocessing.Queue()
+    deadline = time.time() + seconds
+    t0 = time.perf_counter()
+    procs = [multiprocessing.Process(target=load_process,
+                                     args=(url, scenario, ids, connections, deadline, n, out))
+             for n in range(processes)]
+    for p in procs:
+        p.start()
+    latencies, errors = [], 0
+    for _ in procs:
+        lat, err = out.get()
+        latencies.extend(lat)
+        errors += err
+    for p in procs:
+        p.join()
+    return summarize(scenario, "http", latencies, errors, time.perf_counter() - t0)
+
+
+# -- reporting ---------------------------------------------------------------
+
+def print_result(r):
+    print(f"{r['scenario']:>16} {r['mode']:>6}: {r['rps']:9.1f} req/s  "
+          f"p50 {r['p50_ms']:7.2f}  p95 {r['p95_ms']:7.2f}  p99 {r['p99_ms']:7.2f} ms  "
+          f"({r['requests']} requests, {r['errors']} errors)")
+
+
+def compare(results, baseline_path, max_regression):
+    """Print deltas against a previous --json file; -> list of regressed scenarios."""
+    with open(baseline_path) as f:
+        before = {(r["scenario"], r["mode"]): r for r in json.load(f)["results"]}
+    regressed = []
+    print(f"-- vs. {baseline_path}")
+    for r in results:
+        old = before.get((r["scenario"], r["mode"]))
+        if old is None:
+            continue
+        d_rps = r["rps"] / old["rps"] - 1 if old["rps"] else 0.0
+        d_p95 = r["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        bad = d_rps < -max_regression or d_p95 > max_regression
+        print(f"{r['scenario']:>16} {r['mode']:>6}: rps {d_rps:+7.1%}  p95 {d_p95:+7.1%}"
+              f"{'  REGRESSION' if bad else ''}")
+        if bad:
+            regressed.append(f"{r['scenario']}/{r['mode']}")
+    return regressed
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of the Flask app")
+    parser.add_argument("--patients", type=int, default=1_000)
+    parser.add_argument("--readings", type=int, default=200, help="BP readings per patient")
+    parser.add_argument("--meds", type=int, default=3, help="medications per patient")
+    parser.add_argument("--mode", choices=["client", "http", "both"], default="client")
+    parser.add_argument("--scenarios", nargs="+", choices=[*SCENARIOS, "mixed"],
+                        default=[*SCENARIOS, "mixed"])
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each scenario")
+    parser.add_argument("--threads", type=int, default=8, help="client mode: concurrent test clients")
+    parser.add_argument("--processes", type=int, default=4, help="http mode: load processes")
+    parser.add_argument("--connections", type=int, default=4, help="http mode: connections per process")
+    parser.add_argument("--url", help="http mode: target an already running server instead")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with an earlier --json file")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed rps drop / p95 increase vs. the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        spool = os.path.join(tmp, "audit")
+        t0 = time.perf_counter()
+        ids = seed(path, patients=args.patients, readings=args.readings, meds=args.meds)
+        print(f"seeded {args.patients} patients x {args.readings} readings in {time.perf_counter() - t0:.1f}s")
+
+        if args.mode in ("client", "both"):
+            db.configure(path)
+            os.environ["CARELINK_AUDIT_SPOOL"] = spool
+            from app import app
+            for scenario in args.scenarios:
+                results.append(run_client(app, scenario, ids, args.threads, args.seconds))
+                print_result(results[-1])
+            import audit
+            audit.get_audit().close()
+            db.pool.close_all()
+
+        if args.mode in ("http", "both"):
+            server = None
+            url = args.url
+            if url is None:
+                ready = multiprocessing.Event()
+                server = multiprocessing.Process(target=serve, args=(path, spool, args.port, ready),
+                                                 daemon=True)
+                server.start()
+                if not ready.wait(30):
+                    raise SystemExit("server did not start")
+                url = f"http://127.0.0.1:{args.port}"
+            try:
+                for scenario in args.scenarios:
+                    results.append(run_http(url, scenario, ids, args.processes, args.connections,
+                                            args.seconds))
+                    print_result(results[-1])
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.join()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "config": vars(args),
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.json}")
+    if args.baseline:
+        regressed = compare(results, args.baseline, args.max_regression)
+        if regressed:
+            print(f"regressed: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/seed.py
+# Synthetic data shared by the benchmark scripts.
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bp_stats  # noqa: E402
+import conditions  # noqa: E402
+import db  # noqa: E402
+import drugs  # noqa: E402
+import interactions  # noqa: E402
+import mtm  # noqa: E402
+import search  # noqa: E402
+import timestamps  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+MED_NAMES = ["Lisinopril", "Metformin", "Amlodipine", "Atorvastatin", "Losartan",
+             "Hydrochlorothiazide", "Metoprolol", "Simvastatin", "Glipizide", "Aspirin"]
+NOTES = ["Felt dizzy in the morning", "Mild headache", "Ankle swelling",
+         "No complaints", "Dry cough at night", "Tired after lunch"]
+
+
+def patient_ids(n):
+    return [f"P{i:06d}" for i in range(1, n + 1)]
+
+
+def seed(path, patients=100, readings=100, meds=3, symptoms=5, accesses=5,
+         start=None, chunk=50_000, schema_version=None):
+    """Create (or extend) a database with `readings` BP rows per patient.
+
+    `schema_version` stops the migrations early, e.g. to measure a "before" state
+    (before version 12 timestamps are written as text, as they were then).
+    """
+    rng = random.Random(42)
+    start = start or datetime.now() - timedelta(days=365 * 2)
+    conn = db.connect(path)
+    version = migrate(conn, target=schema_version)
+    encode = timestamps.encode if version >= 12 else (lambda ts: ts.isoformat(sep=" "))
+
+    ids = patient_ids(patients)
+    conn.executemany(
+        "INSERT OR IGNORE INTO patients (patient_id, name, consent, conditions) VALUES (?, ?, ?, ?)",
+        [(pid, f"Patient {pid}", 1, rng.choice(["HTN", "HTN,DM", "DM", "DLD", ""])) for pid in ids],
+    )
+
+    def bp_rows():
+        step = timedelta(days=730) / max(readings, 1)
+        for pid in ids:
+            ts = start
+            for _ in range(readings):
+                ts += step
+                yield (pid, rng.randint(100, 170), rng.randint(60, 100), rng.randint(55, 95), encode(ts))
+
+    batch = []
+    for row in bp_rows():
+        batch.append(row)
+        if len(batch) >= chunk:
+            conn.executemany(
+                "INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp) VALUES (?, ?, ?, ?, ?)",
+                batch)
+            conn.commit()
+            batch = []
+    if batch:
+        conn.executemany(
+            "INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp) VALUES (?, ?, ?, ?, ?)",
+            batch)
+
+    conn.executemany(
+        "INSERT INTO medications (patient_id, name, dose, frequency) VALUES (?, ?, ?, ?)",
+        [(pid, rng.choice(MED_NAMES), f"{rng.choice([5, 10, 20, 500])} mg", "once daily")
+         for pid in ids for _ in range(meds)])
+    conn.executemany(
+        "INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES (?, ?, ?)",
+        [(pid, rng.choice(NOTES), encode(start + timedelta(days=rng.randint(0, 700))))
+         for pid in ids for _ in range(symptoms)])
+    conn.executemany(
+        "INSERT INTO access_logs (patient_id, actor, role, timestamp) VALUES (?, ?, ?, ?)",
+        [(pid, "pharm01", "pharmacist", encode(start + timedelta(days=rng.randint(0, 700))))
+         for pid in ids for _ in range(accesses)])
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'bp_stats'").fetchone():
+        bp_stats.rebuild(conn)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'patient_risk'").fetchone():
+        mtm.refresh(conn)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'patient_conditions'").fetchone():
+        conditions.rebuild(conn)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'search_index'").fetchone():
+        search.rebuild(conn)
+    if any(r[1] == "drug_id" for r in conn.execute("PRAGMA table_info(medications)")):
+        drugs.backfill(conn)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'patient_interactions'").fetchone():
+        interactions.sweep(conn)
+    conn.commit()
+    conn.close()
+    return ids
@@ -0,0 +1,118 @@
+# bp_ingest.py
+# Validation for batched home-monitor uploads (POST /api/patient/<id>/bp/batch).
+#
+# Each reading:
+#   {"systolic": 132, "diastolic": 84, "heart_rate": 71,
+#    "timestamp": "2025-03-01T07:45:00+09:00", "id": "cuff-serial-000123"}
+# "id" (or "idempotency_key") is optional; without one a key is derived from
+# the measurement itself (epoch ms + values, so the same reading gets the same
+# key whatever the server's time zone), and re-sending it is still a no-op.
+import hashlib
+import json
+from datetime import datetime
+
+import timestamps
+
+MAX_BATCH = 5000
+MAX_KEY_LENGTH = 128
+# cuffs with a slightly fast clock are fine; readings from the future are not
+CLOCK_SKEW_MS = 10 * 60 * 1000
+
+LIMITS = {
+    "systolic": (50, 300),
+    "diastolic": (20, 200),
+    "heart_rate": (20, 250),
+}
+
+
+class IngestError(ValueError):
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def parse_body(data, content_type):
+    """JSON array (or {"readings": [...]}) or NDJSON bytes -> list of objects."""
+    try:
+        if content_type and "ndjson" in content_type:
+            items = [json.loads(line) for line in data.splitlines() if line.strip()]
+        else:
+            items = json.loads(data or b"null")
+            if isinstance(items, dict):
+                items = items.get("readings")
+    except ValueError as e:
+        raise IngestError(f"Malformed body: {e}")
+    if not isinstance(items, list):
+        raise IngestError("Expected a JSON array of readings")
+    if len(items) > MAX_BATCH:
+        raise IngestError(f"Too many readings (max {MAX_BATCH} per request)")
+    return items
+
+
+def _int_field(item, name, required):
+    value = item.get(name)
+    if value is None:
+        if required:
+            raise ValueError(f"{name} is required")
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ValueError(f"{name} must be an integer")
+    low, high = LIMITS[name]
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return int(value)
+
+
+def parse_timestamp(value, now):
+    """ISO 8601 text -> epoch ms. An offset is used as given; text without one is local time."""
+    if not isinstance(value, str):
+        raise ValueError("timestamp is required (ISO 8601)")
+    try:
+        ms = timestamps.encode(value)
+    except ValueError:
+        raise ValueError("timestamp must be ISO 8601")
+    if ms > timestamps.encode(now) + CLOCK_SKEW_MS:
+        raise ValueError("timestamp is in the future")
+    return ms
+
+
+def validate_reading(item, now):
+    """One reading -> (systolic, diastolic, heart_rate, timestamp ms, client_key); ValueError if invalid."""
+    if not isinstance(item, dict):
+        raise ValueError("reading must be an object")
+    systolic = _int_field(item, "systolic", True)
+    diastolic = _int_field(item, "diastolic", True)
+    heart_rate = _int_field(item, "heart_rate", False)
+    if diastolic >= systolic:
+        raise ValueError("diastolic must be lower than systolic")
+    ts = parse_timestamp(item.get("timestamp"), now)
+    key = item.get("id", item.get("idempotency_key"))
+    if key is None:
+        key = auto_key(ts, systolic, diastolic, heart_rate)
+    elif not isinstance(key, str) or not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise ValueError(f"id must be a non-empty string of at most {MAX_KEY_LENGTH} characters")
+    return (systolic, diastolic, heart_rate, ts, key)
+
+
+def auto_key(ts, systolic, diastolic, heart_rate):
+    """client_key of a reading sent without an id (ts in epoch ms)."""
+    raw = f"{ts}|{systolic}|{diastolic}|{heart_rate}"
+    return "auto:" + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def validate(items, now=None):
+    """-> list of (systolic, diastolic, heart_rate, timestamp, client_key) rows for bp_stats.add_readings.
+
+    Raises IngestError listing every invalid reading (by index); nothing is
+    stored unless the whole batch is valid.
+    """
+    now = now or datetime.now()
+    rows, errors = [], []
+    for i, item in enumerate(items):
+        try:
+            rows.append(validate_reading(item, now))
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+    if errors:
+        raise IngestError("Invalid readings", errors)
+    return rows
@@ -0,0 +1,212 @@
+# bp_stats.py
+# Per-patient BP aggregates maintained on insert, so the pharmacist views never
+# rescan a patient's full reading history.
+#
+#   bp_stats  - lifetime count / sums / first+last timestamp per patient
+#   bp_daily  - one row per patient per day; rolling 30/90-day windows sum <= 90 rows
+#
+# Backfill / repair:  python bp_stats.py rebuild [--patient P001]
+import argparse
+from datetime import datetime, timedelta
+
+import archive
+import changes
+import db
+import timestamps
+
+# a reading whose (patient_id, client_key) was ever stored is a resync duplicate
+# and is skipped: bp_client_keys outlives archiving, OR IGNORE covers repeats
+# within one batch
+INSERT_READING_SQL = """
+    INSERT OR IGNORE INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp, client_key)
+    SELECT ?1, ?2, ?3, ?4, ?5, ?6
+    WHERE ?6 IS NULL OR NOT EXISTS (
+        SELECT 1 FROM bp_client_keys WHERE patient_id = ?1 AND client_key = ?6)
+"""
+INSERT_CLIENT_KEY_SQL = "INSERT OR IGNORE INTO bp_client_keys (patient_id, client_key) VALUES (?, ?)"
+# bp_daily.day: the reading's local calendar day
+DAY_SQL = timestamps.LOCAL_DATE_SQL.format(col="timestamp")
+
+# fold every reading of `patient_id` with id > watermark into the aggregates
+FOLD_DAILY_SQL = """
+    INSERT INTO bp_daily (patient_id, day, reading_count, sum_systolic, sum_diastolic)
+    SELECT patient_id, {day}, COUNT(*), TOTAL(systolic), TOTAL(diastolic)
+    FROM bp_readings
+    WHERE patient_id = ? AND id > ?
+    GROUP BY patient_id, {day}
+    ON CONFLICT (patient_id, day) DO UPDATE SET
+        reading_count = reading_count + excluded.reading_count,
+        sum_systolic = sum_systolic + excluded.sum_systolic,
+        sum_diastolic = sum_diastolic + excluded.sum_diastolic
+""".format(day=DAY_SQL)
+FOLD_STATS_SQL = """
+    INSERT INTO bp_stats (patient_id, reading_count, sum_systolic, sum_diastolic,
+                          first_timestamp, last_timestamp)
+    SELECT patient_id, COUNT(*), TOTAL(systolic), TOTAL(diastolic), MIN(timestamp), MAX(timestamp)
+    FROM bp_readings
+    WHERE patient_id = ? AND id > ?
+    GROUP BY patient_id
+    ON CONFLICT (patient_id) DO UPDATE SET
+        reading_count = reading_count + excluded.reading_count,
+        sum_systolic = sum_systolic + excluded.sum_systolic,
+        sum_diastolic = sum_diastolic + excluded.sum_diastolic,
+        first_timestamp = MIN(COALESCE(first_timestamp, excluded.first_timestamp), excluded.first_timestamp),
+        last_timestamp = MAX(COALESCE(last_timestamp, excluded.last_timestamp), excluded.last_timestamp)
+"""
+
+STATS_SQL = "SELECT * FROM bp_stats WHERE patient_id = ?"
+WINDOW_SQL = """
+    SELECT
+        SUM(CASE WHEN day >= :d30 THEN reading_count END) AS count_30d,
+        SUM(CASE WHEN day >= :d30 THEN sum_systolic END) AS sys_30d,
+        SUM(CASE WHEN day >= :d30 THEN sum_diastolic END) AS dia_30d,
+        SUM(reading_count) AS count_90d,
+        SUM(sum_systolic) AS sys_90d,
+        SUM(sum_diastolic) AS dia_90d
+    FROM bp_daily
+    WHERE patient_id = :pid AND day >= :d90
+"""
+
+
+def add_readings(conn, patient_id, readings):
+    """Insert (systolic, diastolic, heart_rate, timestamp, client_key) tuples and update the aggregates.
+
+    Timestamps are anything timestamps.encode() takes, None meaning "now"; a client_key of
+    None disables de-duplication for that reading. New rows are also logged for
+    delta sync (changes.py). Runs in the caller's transaction; the caller
+    commits. Returns the number of rows inserted.
+    """
+    if not conn.in_transaction:
+        # hold the write lock before reading the watermark so concurrent
+        # writers can't fold each other's rows twice
+        conn.execute("BEGIN IMMEDIATE")
+    watermark = conn.execute("SELECT COALESCE(MAX(id), 0) FROM bp_readings").fetchone()[0]
+    now = timestamps.now_ms()
+    rows = [(patient_id, systolic, diastolic, heart_rate,
+             now if ts is None else timestamps.encode(ts), key)
+            for systolic, diastolic, heart_rate, ts, key in readings]
+    inserted = conn.executemany(INSERT_READING_SQL, rows).rowcount
+    conn.executemany(INSERT_CLIENT_KEY_SQL, [(r[0], r[5]) for r in rows if r[5] is not None])
+    if inserted:
+        conn.execute(FOLD_DAILY_SQL, (patient_id, watermark))
+        conn.execute(FOLD_STATS_SQL, (patient_id, watermark))
+        changes.record_readings(conn, patient_id, watermark)
+    return inserted
+
+
+def _avg(total, count):
+    return total / count if count else None
+
+
+def get_stats(conn, patient_id, now=None):
+    now = now or datetime.now()
+    row = conn.execute(STATS_SQL, (patient_id,)).fetchone()
+    if row is None or not row["reading_count"]:
+        return {
+            "count": 0, "avg_sys": None, "avg_dia": None,
+            "first_timestamp": None, "last_timestamp": None,
+            "count_30d": 0, "avg_sys_30d": None, "avg_dia_30d": None,
+            "count_90d": 0, "avg_sys_90d": None, "avg_dia_90d": None,
+        }
+    win = conn.execute(WINDOW_SQL, {
+        "pid": patient_id,
+        "d30": (now - timedelta(days=30)).date().isoformat(),
+        "d90": (now - timedelta(days=90)).date().isoformat(),
+    }).fetchone()
+    count = row["reading_count"]
+    return {
+        "count": count,
+        "avg_sys": _avg(row["sum_systolic"], count),
+        "avg_dia": _avg(row["sum_diastolic"], count),
+        "first_timestamp": timestamps.to_iso(row["first_timestamp"]),
+        "last_timestamp": timestamps.to_iso(row["last_timestamp"]),
+        "count_30d": win["count_30d"] or 0,
+        "avg_sys_30d": _avg(win["sys_30d"], win["count_30d"]),
+        "avg_dia_30d": _avg(win["dia_30d"], win["count_30d"]),
+        "count_90d": win["count_90d"] or 0,
+        "avg_sys_90d": _avg(win["sys_90d"], win["count_90d"]),
+        "avg_dia_90d": _avg(win["dia_90d"], win["count_90d"]),
+    }
+
+
+REBUILD_DAILY_SQL = f"""
+    SELECT patient_id, {DAY_SQL}, COUNT(*), TOTAL(systolic), TOTAL(diastolic)
+    FROM bp_readings {{where}}
+    GROUP BY patient_id, {DAY_SQL}
+"""
+REBUILD_STATS_SQL = """
+    SELECT patient_id, COUNT(*), TOTAL(systolic), TOTAL(diastolic), MIN(timestamp), MAX(timestamp)
+    FROM bp_readings {where}
+    GROUP BY patient_id
+"""
+# same merge rules as the FOLD_* statements, for rows aggregated elsewhere
+UPSERT_DAILY_SQL = """
+    INSERT INTO bp_daily (patient_id, day, reading_count, sum_systolic, sum_diastolic)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (patient_id, day) DO UPDATE SET
+        reading_count = reading_count + excluded.reading_count,
+        sum_systolic = sum_systolic + excluded.sum_systolic,
+        sum_diastolic = sum_diastolic + excluded.sum_diastolic
+"""
+UPSERT_STATS_SQL = """
+    INSERT INTO bp_stats (patient_id, reading_count, sum_systolic, sum_diastolic,
+                          first_timestamp, last_timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (patient_id) DO UPDATE SET
+        reading_count = reading_count + excluded.reading_count,
+        sum_systolic = sum_systolic + excluded.sum_systolic,
+        sum_diastolic = sum_diastolic + excluded.sum_diastolic,
+        first_timestamp = MIN(COALESCE(first_timestamp, excluded.first_timestamp), excluded.first_timestamp),
+        last_timestamp = MAX(COALESCE(last_timestamp, excluded.last_timestamp), excluded.last_timestamp)
+"""
+
+
+def _archived_partitions(conn):
+    # archive_partitions only exists from schema version 7 on
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'archive_partitions'").fetchone():
+        return archive.partitions(conn)
+    return []
+
+
+def rebuild(conn, patient_id=None):
+    """Recompute bp_stats / bp_daily from bp_readings (all patients or one), archived months included."""
+    if patient_id is None:
+        where, params = "", ()
+        conn.execute("DELETE FROM bp_daily")
+        conn.execute("DELETE FROM bp_stats")
+    else:
+        where, params = "WHERE patient_id = ?", (patient_id,)
+        conn.execute("DELETE FROM bp_daily WHERE patient_id = ?", params)
+        conn.execute("DELETE FROM bp_stats WHERE patient_id = ?", params)
+    conn.execute(f"""
+        INSERT INTO bp_daily (patient_id, day, reading_count, sum_systolic, sum_diastolic)
+        {REBUILD_DAILY_SQL.format(where=where)}
+    """, params)
+    conn.execute(f"""
+        INSERT INTO bp_stats (patient_id, reading_count, sum_systolic, sum_diastolic,
+                              first_timestamp, last_timestamp)
+        {REBUILD_STATS_SQL.format(where=where)}
+    """, params)
+    # archived months are folded in on top of the hot rows
+    for part in _archived_partitions(conn):
+        arc = archive.open_partition(conn, part["path"])
+        try:
+            daily = arc.execute(REBUILD_DAILY_SQL.format(where=where), params).fetchall()
+            stats = arc.execute(REBUILD_STATS_SQL.format(where=where), params).fetchall()
+        finally:
+            arc.close()
+        conn.executemany(UPSERT_DAILY_SQL, daily)
+        conn.executemany(UPSERT_STATS_SQL, stats)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain BP aggregate tables")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--patient", help="only this patient_id")
+    args = parser.parse_args()
+
+    conn = db.connect()
+    rebuild(conn, args.patient)
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM bp_stats").fetchone()[0]
+    conn.close()
+    print(f"bp_stats rebuilt ({count} patients).")
@@ -0,0 +1,69 @@
+# cache.py
+# Conditional GET + response caching for the per-patient JSON views.
+#
+# Every write route calls touch_patient() in its transaction, bumping
+# patients.data_version; audit.py bumps patients.access_version when it writes
+# a batch of access events. A response's strong ETag is a hash of the route,
+# its query string and those versions, so:
+#   - If-None-Match with the current ETag -> 304, nothing is recomputed
+#   - otherwise the serialized body is looked up in an in-process LRU keyed by
+#     the ETag; a version bump changes the key, so stale bodies are never
+#     served and simply age out
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("CARELINK_RESPONSE_CACHE_SIZE", "1024"))
+
+VERSION_SQL = "SELECT consent, data_version, access_version FROM patients WHERE patient_id = ?"
+TOUCH_SQL = "UPDATE patients SET data_version = data_version + 1 WHERE patient_id = ?"
+
+
+def touch_patient(conn, patient_id):
+    """Mark the patient's data as changed (call inside the write's transaction)."""
+    conn.execute(TOUCH_SQL, (patient_id,))
+
+
+def patient_version(conn, patient_id):
+    """-> Row(consent, data_version, access_version), or None for an unknown patient."""
+    return conn.execute(VERSION_SQL, (patient_id,)).fetchone()
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class ResponseCache:
+    """Small thread-safe LRU of serialized response bodies keyed by ETag."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag):
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return body
+
+    def put(self, etag, body):
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+responses = ResponseCache()
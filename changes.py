@@ -0,0 +1,121 @@
+# changes.py
+# Per-patient change log behind the delta-sync API
+# (GET /api/patient/<id>/changes?since=<cursor>).
+#
+# Every write appends (patient_id, entity, row_id) rows to `changes`, whose
+# AUTOINCREMENT seq is the monotonic sync cursor. A client keeps the seq it
+# last saw and asks only for what changed after it; rows are re-read from the
+# entity tables, so a row changed twice is sent once, in its latest state.
+import json
+
+import cache
+import cursors
+import timestamps
+
+# entity -> (table, response key)
+ENTITIES = {
+    "reading": ("bp_readings", "readings"),
+    "medication": ("medications", "medications"),
+    "symptom": ("symptom_logs", "symptoms"),
+    "access": ("access_logs", "accesses"),
+}
+MAX_CHANGES = 1000
+
+RECORD_SQL = "INSERT INTO changes (patient_id, entity, row_id) VALUES (?, ?, ?)"
+# readings inserted by bp_stats.add_readings after `watermark`
+RECORD_READINGS_SQL = """
+    INSERT INTO changes (patient_id, entity, row_id)
+    SELECT patient_id, 'reading', id FROM bp_readings
+    WHERE patient_id = ? AND id > ?
+    ORDER BY id
+"""
+# access events written by one audit.py batch
+RECORD_ACCESSES_SQL = """
+    INSERT INTO changes (patient_id, entity, row_id)
+    SELECT patient_id, 'access', id FROM access_logs
+    WHERE event_id IN (SELECT value FROM json_each(?))
+    ORDER BY id
+"""
+SINCE_SQL = """
+    SELECT seq, entity, row_id FROM changes
+    WHERE patient_id = ? AND seq > ?
+    ORDER BY seq
+    LIMIT ?
+"""
+LATEST_SQL = "SELECT COALESCE(MAX(seq), 0) FROM changes WHERE patient_id = ?"
+OLDEST_SQL = """
+    SELECT COALESCE((SELECT MIN(seq) FROM changes),
+                    (SELECT seq + 1 FROM sqlite_sequence WHERE name = 'changes'), 1)
+"""
+
+
+class CursorExpired(ValueError):
+    """The changes after this cursor were pruned; the client must reload in full."""
+
+
+def record(conn, patient_id, entity, row_id=None):
+    """Log a change (entity "patient" for the patients row itself) and bump data_version."""
+    conn.execute(RECORD_SQL, (patient_id, entity, row_id))
+    cache.touch_patient(conn, patient_id)
+
+
+def record_readings(conn, patient_id, watermark):
+    conn.execute(RECORD_READINGS_SQL, (patient_id, watermark))
+    cache.touch_patient(conn, patient_id)
+
+
+def record_accesses(conn, event_ids):
+    conn.execute(RECORD_ACCESSES_SQL, (json.dumps(event_ids),))
+
+
+def latest_cursor(conn, patient_id):
+    return cursors.encode(conn.execute(LATEST_SQL, (patient_id,)).fetchone()[0])
+
+
+def changes_since(conn, patient_id, cursor, limit=MAX_CHANGES):
+    """-> {"patient", "readings", "medications", "symptoms", "accesses", "next_cursor", "has_more"}.
+
+    `patient` is the patients row if it changed, else None. Rows that have
+    since left the hot tables (archive.py) are not sent.
+    """
+    since = cursors.decode(cursor, 1)[0]
+    if not isinstance(since, int):
+        raise ValueError("invalid cursor")
+    if since + 1 < conn.execute(OLDEST_SQL).fetchone()[0]:
+        raise CursorExpired("cursor expired")
+
+    rows = conn.execute(SINCE_SQL, (patient_id, since, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    ids = {entity: {} for entity in ENTITIES}   # dict as an ordered set
+    patient_changed = False
+    for r in rows:
+        if r["entity"] == "patient":
+            patient_changed = True
+        else:
+            ids[r["entity"]][r["row_id"]] = None
+
+    delta = {
+        "patient": None,
+        "next_cursor": cursors.encode(rows[-1]["seq"] if rows else since),
+        "has_more": has_more,
+    }
+    if patient_changed:
+        delta["patient"] = timestamps.decode_row(conn.execute(
+            "SELECT * FROM patients WHERE patient_id = ?", (patient_id,)).fetchone())
+    for entity, (table, key) in ENTITIES.items():
+        if not ids[entity]:
+            delta[key] = []
+            continue
+        delta[key] = timestamps.decode_rows(conn.execute(f"""
+            SELECT * FROM {table}
+            WHERE id IN (SELECT value FROM json_each(?)) AND patient_id = ?
+            ORDER BY id
+        """, (json.dumps(list(ids[entity])), patient_id)))
+    return delta
+
+
+def prune(conn, before):
+    """Drop change rows logged before `before` (epoch ms; clients behind that must reload)."""
+    return conn.execute("DELETE FROM changes WHERE created_at < ?", (before,)).rowcount
@@ -0,0 +1,156 @@
+# conditions.py
+# Patient condition catalog (HTN, DM, DLD, ...) in three synced forms:
+#
+#   conditions          - the catalog: code, bit number, label
+#   patients.conditions - "HTN,DM" text, kept for the views / API / exports
+#   patients.condition_mask - one bit per catalog code; a cohort such as
+#                        "HTN AND DM" is (condition_mask & m) = m, no LIKE
+#   patient_conditions  - (patient_id, code) junction, indexed by code, for
+#                        per-condition lookups and counts
+#
+# Write routes go through set_conditions(); bulk paths (migration, import)
+# call rebuild().
+#
+#   python conditions.py list
+#   python conditions.py add CKD --label "Chronic kidney disease"
+#   python conditions.py rebuild
+import argparse
+import re
+
+import db
+
+# bits 0-62: the mask stays a positive SQLite INTEGER
+MAX_BITS = 63
+CODE_PATTERN = re.compile(r"[A-Z][A-Z0-9_]{0,15}")
+
+DEFAULTS = [
+    ("HTN", 0, "Hypertension"),
+    ("DM", 1, "Diabetes"),
+    ("DLD", 2, "Dyslipidemia"),
+]
+
+CATALOG_SQL = "SELECT code, bit, label FROM conditions ORDER BY bit"
+INSERT_LINK_SQL = "INSERT OR IGNORE INTO patient_conditions (patient_id, code) VALUES (?, ?)"
+COUNTS_SQL = """
+    SELECT c.code, c.bit, c.label,
+           (SELECT COUNT(*) FROM patient_conditions pc WHERE pc.code = c.code) AS patients
+    FROM conditions c
+    ORDER BY c.bit
+"""
+
+
+def parse(value):
+    """["HTN", "dm"] or "HTN, dm" -> ["HTN", "DM"] (upper-cased, de-duplicated, in order)."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    codes = []
+    for code in value:
+        if not isinstance(code, str):
+            raise ValueError("conditions must be strings")
+        code = code.strip().upper()
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+
+def load_catalog(conn):
+    """-> {code: bit}"""
+    return {r["code"]: r["bit"] for r in conn.execute(CATALOG_SQL)}
+
+
+def catalog(conn):
+    """[{"code", "bit", "label"}] in bit order, for pickers and filters."""
+    return [dict(r) for r in conn.execute(CATALOG_SQL)]
+
+
+def condition_mask(conn, codes, bits=None):
+    """Codes -> mask with their bits set; ValueError naming any code not in the catalog."""
+    bits = load_catalog(conn) if bits is None else bits
+    unknown = [c for c in codes if c not in bits]
+    if unknown:
+        raise ValueError(f"unknown condition(s): {', '.join(unknown)}")
+    mask = 0
+    for code in codes:
+        mask |= 1 << bits[code]
+    return mask
+
+
+def register(conn, code, label=None):
+    """Add `code` to the catalog with the next free bit; returns the bit. Caller commits."""
+    if not CODE_PATTERN.fullmatch(code):
+        raise ValueError(f"invalid condition code: {code!r}")
+    row = conn.execute("SELECT bit FROM conditions WHERE code = ?", (code,)).fetchone()
+    if row is not None:
+        return row["bit"]
+    bit = conn.execute("SELECT COALESCE(MAX(bit) + 1, 0) FROM conditions").fetchone()[0]
+    if bit >= MAX_BITS:
+        raise ValueError(f"condition catalog is full ({MAX_BITS} codes)")
+    conn.execute("INSERT INTO conditions (code, bit, label) VALUES (?, ?, ?)", (code, bit, label))
+    return bit
+
+
+def set_conditions(conn, patient_id, value):
+    """Replace a patient's conditions (list or "HTN,DM"); False if there is no such patient.
+
+    Every code must already be in the catalog (ValueError otherwise). The
+    text column, the mask and the junction rows change together, in the
+    caller's transaction; the caller records the change and commits.
+    """
+    bits = load_catalog(conn)
+    codes = sorted(parse(value), key=lambda c: bits.get(c, MAX_BITS))
+    mask = condition_mask(conn, codes, bits)
+    updated = conn.execute(
+        "UPDATE patients SET conditions = ?, condition_mask = ? WHERE patient_id = ?",
+        (",".join(codes), mask, patient_id)).rowcount
+    if not updated:
+        return False
+    conn.execute("DELETE FROM patient_conditions WHERE patient_id = ?", (patient_id,))
+    conn.executemany(INSERT_LINK_SQL, [(patient_id, c) for c in codes])
+    return True
+
+
+def rebuild(conn):
+    """Recompute condition_mask + patient_conditions from patients.conditions. Caller commits.
+
+    Well-formed codes missing from the catalog are registered; anything else
+    stays in the text column only.
+    """
+    bits = load_catalog(conn)
+    links, masks = [], []
+    for r in conn.execute("SELECT patient_id, conditions, condition_mask FROM patients").fetchall():
+        mask = 0
+        for code in parse(r["conditions"]):
+            if code not in bits:
+                if not CODE_PATTERN.fullmatch(code) or len(bits) >= MAX_BITS:
+                    continue
+                bits[code] = register(conn, code)
+            mask |= 1 << bits[code]
+            links.append((r["patient_id"], code))
+        if mask != r["condition_mask"]:
+            masks.append((mask, r["patient_id"]))
+    conn.execute("DELETE FROM patient_conditions")
+    conn.executemany(INSERT_LINK_SQL, links)
+    conn.executemany("UPDATE patients SET condition_mask = ? WHERE patient_id = ?", masks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the patient condition catalog")
+    parser.add_argument("command", choices=["list", "add", "rebuild"])
+    parser.add_argument("code", nargs="?", help="add: the new condition code")
+    parser.add_argument("--label", help="add: display name")
+    args = parser.parse_args()
+
+    conn = db.connect()
+    if args.command == "add":
+        if not args.code:
+            parser.error("add needs a code")
+        print(f"{args.code.upper()}: bit {register(conn, args.code.upper(), args.label)}")
+        conn.commit()
+    elif args.command == "rebuild":
+        rebuild(conn)
+        conn.commit()
+    for r in conn.execute(COUNTS_SQL):
+        print(f"{r['bit']:>2}  {r['code']:<8} {r['label'] or '':<24} {r['patients']} patients")
+    conn.close()
@@ -0,0 +1,19 @@
+# cursors.py
+# Opaque keyset-pagination cursors: the sort key values of the last row on a
+# page, JSON-encoded and made URL-safe.
+import base64
+import json
+
+
+def encode(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("invalid cursor")
+    return values
@@ -0,0 +1,141 @@
+# db.py
+# Data-access layer: a bounded pool of long-lived SQLite connections per worker
+# process, opened in WAL mode so readers never block on a writer's commit. A
+# request borrows one (get_db) and gives it back at teardown.
+import os
+import queue
+import sqlite3
+import threading
+
+import metrics
+
+DB_PATH = os.environ.get("CARELINK_DB", "carelink.db")
+
+# busy_timeout: how long a writer waits for the write lock before raising
+# "database is locked" (seconds for sqlite3.connect, ms for the pragma).
+BUSY_TIMEOUT = float(os.environ.get("CARELINK_DB_BUSY_TIMEOUT", "5.0"))
+STATEMENT_CACHE_SIZE = 256
+# most connections open at once per process; a request beyond that waits
+# up to POOL_TIMEOUT seconds for one to be released
+POOL_SIZE = int(os.environ.get("CARELINK_DB_POOL_SIZE", "16"))
+POOL_TIMEOUT = float(os.environ.get("CARELINK_DB_POOL_TIMEOUT", "30"))
+
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),      # WAL + NORMAL: durable at checkpoint, no fsync per commit
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -64 * 1024),     # negative = KiB -> 64 MiB page cache per connection
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", int(BUSY_TIMEOUT * 1000)),
+)
+
+
+def connect(path=None, **kwargs):
+    if metrics.ENABLED:
+        # per-statement timing / slow-query log (metrics.py)
+        kwargs.setdefault("factory", metrics.ProfiledConnection)
+    conn = sqlite3.connect(
+        path or DB_PATH,
+        timeout=BUSY_TIMEOUT,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        **kwargs,
+    )
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class ConnectionPool:
+    """At most `size` connections; get() lends one to the calling thread until release().
+
+    Idle connections are reused newest-first (warm page cache). Re-opens
+    everything after fork().
+    """
+
+    def __init__(self, path=None, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._reset()
+
+    def get(self):
+        if self._pid != os.getpid():
+            # forked worker (gunicorn etc.): never share the parent's handles
+            self._reset()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise sqlite3.OperationalError(
+                f"no free database connection after {POOL_TIMEOUT:g}s (pool size {self.size})")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                # lent to one thread at a time, but not always the thread that opened it
+                conn = connect(self.path, check_same_thread=False)
+            except BaseException:
+                self._slots.release()
+                raise
+            with self._lock:
+                self._conns.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def release(self):
+        # end of request: drop whatever the route left uncommitted, hand the connection back
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._lock:
+                self._conns.remove(conn)
+            conn.close()
+        else:
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def open_count(self):
+        with self._lock:
+            return len(self._conns)
+
+    def close_all(self):
+        with self._lock:
+            conns = self._conns
+        for conn in conns:
+            conn.close()
+        self._reset()
+
+    def _reset(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._conns = []
+        self._pid = os.getpid()
+
+
+pool = ConnectionPool()
+
+
+def configure(path):
+    """Point the pool at another database file (benchmarks, scripts)."""
+    global DB_PATH
+    pool.close_all()
+    DB_PATH = path
+    pool.path = path
+
+
+def get_db():
+    return pool.get()
+
+
+def init_app(app):
+    @app.teardown_appcontext
+    def _release_db(exc):
+        pool.release()
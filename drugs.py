@@ -0,0 +1,291 @@
+# drugs.py
+# Local drug dictionary (data/drugs.csv: drug_id, name, synonyms, strengths)
+# compiled once per process into two lookup structures:
+#
+#   prefix index  - every alias (name, brand, salt form) and every word start
+#                   inside it, normalized and sorted in one list; a prefix is
+#                   a bisect plus a short forward scan (the flat form of a
+#                   prefix trie: one sorted list, no per-node objects)
+#   trigram index - trigram -> alias ids, for misspelled typing and OCR'd
+#                   label lines ("METF0RMIN HCI 500 MG TABL")
+#
+# Medications store the canonical drug_id next to the free-text name, so one
+# drug keeps one id whatever spelling the label or the patient used.
+#
+#   python drugs.py "120 METFORMIN HCL 500 MG TABL"
+#   python drugs.py --complete metf
+#   python drugs.py backfill
+import argparse
+import csv
+import math
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+
+import db
+from label_parser import DOSE_PATTERN, parse_med_line
+
+DRUGS_PATH = os.environ.get("CARELINK_DRUGS",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "drugs.csv"))
+
+# trigram similarity (Jaccard over padded trigrams, as in pg_trgm)
+MIN_SIMILARITY = 0.3
+# a typed or scanned name this close is stored under the dictionary's drug_id
+# (0.75 keeps e.g. prednisolone from becoming prednisone)
+AUTO_MATCH = 0.75
+# longest forward scan of the prefix index for one autocomplete request
+MAX_PREFIX_SCAN = 400
+
+_WORD = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+# dosage-form / release words on labels that do not tell two entries apart
+FORM_WORDS = frozenset(["tab", "tabs", "tabl", "tablet", "tablets", "cap", "caps", "capsule",
+                        "capsules", "er", "xr", "xl", "sr", "cr", "dr", "ec", "odt", "oral", "hcl"])
+# OCR reads these digits inside words for letters ("METF0RMIN", "CLOPIDOGRE1")
+_OCR_DIGITS = str.maketrans("0158", "olsb")
+
+
+def normalize(text):
+    """'Metformin HCl, 500MG' -> 'metformin hcl 500mg' (lower case, words only)."""
+    return " ".join(_WORD.findall(text.lower())) if text else ""
+
+
+def normalize_strength(text):
+    """'500 MG' / '0.1mg' / '10 Units' -> '500 mg' / '0.1 mg' / '10 units'; other text is just lowered."""
+    if not text:
+        return None
+    m = DOSE_PATTERN.fullmatch(text.strip())
+    if not m:
+        return " ".join(text.lower().split())
+    unit = m.group(2).lower()
+    return f"{m.group(1)} {'units' if unit == 'unit' else unit}"
+
+
+def _ocr_fix(word):
+    if sum(c.isalpha() for c in word) >= 3 and any(c.isdigit() for c in word):
+        return word.translate(_OCR_DIGITS)
+    return word
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DrugIndex:
+    def __init__(self, rows):
+        """rows: dicts with drug_id, name, synonyms ("a|b"), strengths ("5 mg|10 mg")."""
+        self.entries = []
+        self._by_id = {}
+        self._exact = {}           # normalized alias -> entry number
+        aliases = []               # (normalized alias, entry number)
+        for row in rows:
+            drug_id = row["drug_id"].strip()
+            if not drug_id or drug_id in self._by_id:
+                continue
+            n = len(self.entries)
+            entry = {
+                "drug_id": drug_id,
+                "name": row["name"].strip(),
+                "strengths": [s.strip() for s in (row.get("strengths") or "").split("|") if s.strip()],
+            }
+            self.entries.append(entry)
+            self._by_id[drug_id] = n
+            for alias in [entry["name"], *(row.get("synonyms") or "").split("|")]:
+                alias = normalize(alias)
+                if alias and alias not in self._exact:
+                    self._exact[alias] = n
+                    aliases.append((alias, n))
+        self._strengths = [{normalize_strength(s): s for s in e["strengths"]} for e in self.entries]
+
+        # prefix index: names rank 0, brands / salt forms 1, word starts inside either 2
+        keys = []
+        for alias, n in aliases:
+            keys.append((alias, 0 if alias == normalize(self.entries[n]["name"]) else 1, n))
+            for m in re.finditer(r" ", alias):
+                keys.append((alias[m.end():], 2, n))
+        keys.sort()
+        self._keys = [k for k, _, _ in keys]
+        self._key_rank = array("B", (r for _, r, _ in keys))
+        self._key_entry = array("I", (n for _, _, n in keys))
+
+        # trigram index over the aliases
+        self._aliases = [a for a, _ in aliases]
+        self._alias_entry = array("I", (n for _, n in aliases))
+        self._alias_size = array("H")
+        postings = {}
+        for i, alias in enumerate(self._aliases):
+            grams = trigrams(alias)
+            self._alias_size.append(len(grams))
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self._postings = {g: array("I", ids) for g, ids in postings.items()}
+
+    @classmethod
+    def from_csv(cls, path=DRUGS_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls(csv.DictReader(f))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, drug_id):
+        n = self._by_id.get(drug_id)
+        return None if n is None else self.entries[n]
+
+    def _result(self, n, score, strength=None):
+        entry = self.entries[n]
+        return {
+            "drug_id": entry["drug_id"],
+            "name": entry["name"],
+            "strength": self._strengths[n].get(normalize_strength(strength)) if strength else None,
+            "strengths": entry["strengths"],
+            "score": round(score, 3),
+        }
+
+    def _fuzzy(self, text, limit):
+        """[(similarity, entry number)] best first, one per entry."""
+        grams = trigrams(text)
+        postings = self._postings
+        # Counter's C loop does the per-alias hit counts
+        hits = Counter(chain.from_iterable(postings[g] for g in grams if g in postings))
+        size = len(grams)
+        # Jaccard >= MIN_SIMILARITY needs at least this many shared trigrams
+        need = math.ceil(MIN_SIMILARITY * size)
+        best = {}
+        for i, shared in hits.items():
+            if shared < need:
+                continue
+            sim = shared / (size + self._alias_size[i] - shared)
+            n = self._alias_entry[i]
+            if sim >= MIN_SIMILARITY and sim > best.get(n, 0):
+                best[n] = sim
+        return sorted(((s, n) for n, s in best.items()), key=lambda x: (-x[0], x[1]))[:limit]
+
+    def match(self, text):
+        """Best dictionary entry for a typed name or an OCR'd label line, or None.
+
+        The dose ("500 MG") is split off first and returned as "strength" when
+        the drug comes in it; dosage-form words ("TABL", "ER") are dropped. An
+        exact name / brand scores 1.0, otherwise the trigram similarity of the
+        whole name, or of its best word scaled by the share of the name that
+        word covers ("amlodipine benazepril" is not just amlodipine).
+        """
+        name, dose = parse_med_line(text or "")
+        name = normalize(name)
+        if not name:
+            return None
+        n = self._exact.get(name)
+        if n is not None:
+            return self._result(n, 1.0, dose)
+        core = " ".join(_ocr_fix(w) for w in name.split() if w not in FORM_WORDS)
+        if not core:
+            return None
+        n = self._exact.get(core)
+        if n is not None:
+            return self._result(n, 1.0, dose)
+        best = self._fuzzy(core, 1)
+        best = best[0] if best else (0, None)
+        words = core.split()
+        if len(words) > 1:
+            for word in words:
+                if len(word) < 4 or word[0].isdigit():
+                    continue
+                n = self._exact.get(word)
+                found = [(1.0, n)] if n is not None else self._fuzzy(word, 1)
+                if found:
+                    score = found[0][0] * len(word) / len(core)
+                    if score > best[0]:
+                        best = (score, found[0][1])
+        if best[1] is None or best[0] < MIN_SIMILARITY:
+            return None
+        return self._result(best[1], best[0], dose)
+
+    def complete(self, text, limit=10):
+        """Autocomplete: entries whose name / brand / word starts with `text`, then close spellings."""
+        name, dose = parse_med_line(text or "")
+        prefix = normalize(name)
+        if not prefix:
+            return []
+        keys = self._keys
+        start = bisect_left(keys, prefix)
+        stop = min(start + MAX_PREFIX_SCAN, len(keys))
+        hits = []
+        for k in range(start, stop):
+            if not keys[k].startswith(prefix):
+                break
+            hits.append((self._key_rank[k], len(keys[k]), self._key_entry[k]))
+        hits.sort()
+        seen = {}
+        for _, _, n in hits:
+            if n not in seen:
+                seen[n] = 1.0
+                if len(seen) == limit:
+                    break
+        if len(seen) < limit and len(prefix) >= 3:
+            for sim, n in self._fuzzy(prefix, limit):
+                seen.setdefault(n, sim)
+        return [self._result(n, score, dose) for n, score in list(seen.items())[:limit]]
+
+    def resolve(self, name, dose=None, drug_id=None):
+        """(name, dose) as typed -> (name, dose, drug_id) to store.
+
+        A known drug_id (picked from autocomplete) or a close enough match
+        replaces the name with the dictionary's; an empty dose takes the
+        strength written in the name. Anything else is stored as typed.
+        """
+        entry = self.get(drug_id) if drug_id else None
+        if entry is not None:
+            return entry["name"], dose, entry["drug_id"]
+        found = self.match(name)
+        if found is None or found["score"] < AUTO_MATCH:
+            return name, dose, None
+        return found["name"], dose or found["strength"] or dose, found["drug_id"]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DrugIndex.from_csv()
+    return _index
+
+
+def backfill(conn, index=None):
+    """Set medications.drug_id for rows without one, matching each distinct name once. Caller commits."""
+    index = index or get_index()
+    names = [r[0] for r in conn.execute(
+        "SELECT DISTINCT name FROM medications WHERE drug_id IS NULL AND name IS NOT NULL")]
+    updates = []
+    for name in names:
+        found = index.match(name)
+        if found is not None and found["score"] >= AUTO_MATCH:
+            updates.append((found["drug_id"], name))
+    conn.executemany("UPDATE medications SET drug_id = ? WHERE name = ? AND drug_id IS NULL", updates)
+    return len(updates)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up names in the drug dictionary")
+    parser.add_argument("text", help='drug name / label line, or "backfill" to set medications.drug_id')
+    parser.add_argument("--complete", action="store_true", help="autocomplete instead of best match")
+    args = parser.parse_args()
+
+    if args.text == "backfill":
+        conn = db.connect()
+        print(f"{backfill(conn)} medication names matched.")
+        conn.commit()
+        conn.close()
+    elif args.complete:
+        for r in get_index().complete(args.text):
+            print(f"{r['drug_id']:<28} {r['name']:<32} {r['score']:.2f}  {', '.join(r['strengths'])}")
+    else:
+        print(get_index().match(args.text))
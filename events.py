@@ -0,0 +1,216 @@
+# events.py
+# Live "something changed" feed (Server-Sent Events) for the patient and
+# pharmacist views.
+#
+# The source of truth is the changes log (changes.py): one poller thread per
+# process reads new rows from it and fans them out to subscribers, so writes
+# made by any worker process are seen. Write paths call notify() after their
+# commit to wake the poller immediately instead of waiting for the next tick.
+#
+# Events are hints, not data: {"patient_id", "entities", "cursor"}; clients
+# fetch the rows through /changes?since=<cursor>. That keeps every subscriber
+# buffer small and bounded: pending hints are coalesced per patient, and a
+# subscriber that falls more than max_pending patients behind is reset and
+# sent a single "resync" event instead of growing without limit.
+#
+# Panel (pharmacist) subscribers only hear about patients who currently
+# consent to sharing, matching the dashboard and /changes.
+import logging
+import os
+import threading
+
+import cursors
+import db
+
+POLL_INTERVAL = float(os.environ.get("CARELINK_SSE_POLL_INTERVAL", "1.0"))
+MAX_SUBSCRIBERS = int(os.environ.get("CARELINK_SSE_MAX_SUBSCRIBERS", "100"))
+HEARTBEAT = 15.0
+MAX_PENDING = 256
+POLL_BATCH = 1000
+
+POLL_SQL = """
+    SELECT c.seq, c.patient_id, c.entity, COALESCE(p.consent, 0) AS consent
+    FROM changes c LEFT JOIN patients p ON p.patient_id = c.patient_id
+    WHERE c.seq > ? ORDER BY c.seq LIMIT ?
+"""
+CONSENTED_SQL = "AND patient_id IN (SELECT patient_id FROM patients WHERE consent = 1)"
+# catch-up for a reconnecting client (Last-Event-ID)
+MISSED_SQL = """
+    SELECT patient_id, group_concat(DISTINCT entity) AS entities, MAX(seq) AS seq
+    FROM changes WHERE seq > ? {where}
+    GROUP BY patient_id
+    ORDER BY MAX(seq)
+    LIMIT ?
+"""
+
+log = logging.getLogger(__name__)
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscriber:
+    """One stream. patient_id=None subscribes to the whole panel."""
+
+    def __init__(self, patient_id=None, max_pending=MAX_PENDING):
+        self.patient_id = patient_id
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._pending = {}        # patient_id -> [entities set, last seq]
+        self._overflow = False
+        self.closed = False
+
+    def offer(self, patient_id, entity, seq, consent=True):
+        # called by the poller; never blocks on a slow client
+        if self.patient_id is None:
+            if not consent:
+                return
+        elif patient_id != self.patient_id:
+            return
+        with self._cond:
+            if self._overflow:
+                return
+            entry = self._pending.get(patient_id)
+            if entry is None:
+                if len(self._pending) >= self.max_pending:
+                    self._pending.clear()
+                    self._overflow = True
+                    self._cond.notify()
+                    return
+                entry = self._pending[patient_id] = [set(), seq]
+            entry[0].add(entity)
+            entry[1] = seq
+            self._cond.notify()
+
+    def next_events(self, timeout):
+        """Wait up to `timeout` s; -> ("resync", None) / ("change", [events]) / (None, None)."""
+        with self._cond:
+            if not self._pending and not self._overflow and not self.closed:
+                self._cond.wait(timeout)
+            if self._overflow:
+                self._overflow = False
+                return "resync", None
+            if not self._pending:
+                return None, None
+            pending, self._pending = self._pending, {}
+        return "change", [
+            {"patient_id": pid, "entities": sorted(entities), "cursor": cursors.encode(seq)}
+            for pid, (entities, seq) in sorted(pending.items(), key=lambda kv: kv[1][1])
+        ]
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+
+class Broker:
+    def __init__(self, db_path=None, poll_interval=POLL_INTERVAL, max_subscribers=MAX_SUBSCRIBERS):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_seq = None
+        self.pid = os.getpid()
+
+    def subscribe(self, patient_id=None):
+        sub = Subscriber(patient_id)
+        with self._lock:
+            if len(self._subs) >= self.max_subscribers:
+                raise TooManySubscribers("too many live streams")
+            self._subs.add(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sse-poller", daemon=True)
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        sub.close()
+        with self._lock:
+            self._subs.discard(sub)
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _poll(self, conn):
+        if self._last_seq is None:
+            # start from "now": history is what /changes is for
+            self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            return
+        rows = conn.execute(POLL_SQL, (self._last_seq, POLL_BATCH)).fetchall()
+        conn.commit()
+        if not rows:
+            return
+        self._last_seq = rows[-1]["seq"]
+        with self._lock:
+            subs = list(self._subs)
+        for r in rows:
+            for sub in subs:
+                sub.offer(r["patient_id"], r["entity"], r["seq"], r["consent"])
+        if len(rows) == POLL_BATCH:
+            self._wakeup.set()
+
+    def _run(self):
+        conn = db.connect(self.db_path)
+        try:
+            self._poll(conn)
+            while True:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                with self._lock:
+                    if not self._subs:
+                        # nobody listening: stop; the next subscribe() restarts from "now"
+                        self._thread = None
+                        self._last_seq = None
+                        return
+                try:
+                    self._poll(conn)
+                except Exception:
+                    log.exception("sse poll failed")
+        finally:
+            conn.close()
+
+
+def missed(conn, since, patient_id=None, max_pending=MAX_PENDING):
+    """Changes after `since` as one ("change", [events]) batch, or ("resync", None) if too many."""
+    where, params = ("AND patient_id = ?", (since, patient_id)) if patient_id else (CONSENTED_SQL, (since,))
+    rows = conn.execute(MISSED_SQL.format(where=where), (*params, max_pending + 1)).fetchall()
+    if len(rows) > max_pending:
+        return "resync", None
+    return "change", [
+        {"patient_id": r["patient_id"], "entities": sorted(r["entities"].split(",")),
+         "cursor": cursors.encode(r["seq"])}
+        for r in rows
+    ]
+
+
+def format_sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None or _broker.pid != os.getpid():
+        with _broker_lock:
+            if _broker is None or _broker.pid != os.getpid():
+                _broker = Broker(db.DB_PATH)
+    return _broker
+
+
+def notify():
+    # cheap no-op until the first stream is opened
+    if _broker is not None:
+        _broker.notify()
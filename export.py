@@ -0,0 +1,137 @@
+# export.py
+# Full-history export of one patient (BP readings, medications, symptom notes)
+# as CSV or NDJSON, for a pharmacist review or a physician referral.
+#
+# stream() is a generator: rows go from the SQLite cursors (hot tables, then
+# the archived months through archive.iter_history) straight to the output in
+# chunks of CHUNK_ROWS, so memory stays flat however many years are exported.
+# Everything is read inside one read transaction, i.e. from one snapshot.
+import csv
+import io
+import re
+
+import archive
+import serialize
+import timestamps
+
+CHUNK_ROWS = 1000
+
+# section -> (record type, columns, SQL, archived?)
+SECTIONS = {
+    "readings": ("reading", ("id", "timestamp", "systolic", "diastolic", "heart_rate"), """
+        SELECT id, timestamp, systolic, diastolic, heart_rate FROM bp_readings
+        WHERE patient_id = ?
+        ORDER BY timestamp ASC, id ASC
+    """, True),
+    "medications": ("medication", ("id", "name", "dose", "frequency", "drug_id"), """
+        SELECT id, name, dose, frequency, drug_id FROM medications
+        WHERE patient_id = ?
+        ORDER BY id ASC
+    """, False),
+    "symptoms": ("symptom", ("id", "timestamp", "note"), """
+        SELECT id, timestamp, note FROM symptom_logs
+        WHERE patient_id = ?
+        ORDER BY timestamp ASC, id ASC
+    """, False),
+}
+PATIENT_COLUMNS = ("patient_id", "name", "conditions", "last_med_review", "care_plan")
+
+# one CSV for every section: record_type + the union of the section columns,
+# then the patient columns, filled only on the leading "patient" row
+CSV_COLUMNS = ("record_type", "id", "timestamp", "systolic", "diastolic", "heart_rate",
+               "name", "dose", "frequency", "drug_id", "note",
+               "patient_id", "conditions", "last_med_review", "care_plan", "exported_at")
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _key(row):
+    return (row["timestamp"], row["id"])
+
+
+def _rows(conn, patient_id, section):
+    _, _, sql, archived = SECTIONS[section]
+    if archived:
+        return archive.iter_history(conn, sql, (patient_id,), key=_key)
+    return conn.execute(sql, (patient_id,))
+
+
+def _chunks(rows, size=CHUNK_ROWS):
+    chunk = []
+    for r in rows:
+        chunk.append(r)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _patient_header(patient):
+    # first record of either format: who the export is for, and when
+    return {**{c: patient[c] for c in PATIENT_COLUMNS},
+            "last_med_review": timestamps.to_iso(patient["last_med_review"]),
+            "exported_at": timestamps.to_iso(timestamps.now_ms())}
+
+
+def _csv(conn, patient_id, sections, patient):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_COLUMNS)
+    header = _patient_header(patient)
+    writer.writerow(["patient"] + [header.get(c) for c in CSV_COLUMNS[1:]])
+    for section in sections:
+        kind, columns, _, _ = SECTIONS[section]
+        slots = [CSV_COLUMNS.index(c) for c in columns]
+        ts = columns.index("timestamp") if "timestamp" in columns else None
+        for chunk in _chunks(_rows(conn, patient_id, section)):
+            for r in chunk:
+                line = [kind] + [None] * (len(CSV_COLUMNS) - 1)
+                for slot, value in zip(slots, r):
+                    line[slot] = value
+                if ts is not None:
+                    line[slots[ts]] = timestamps.to_iso(r[ts])
+                writer.writerow(line)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _ndjson(conn, patient_id, sections, patient):
+    yield serialize.dumps({"type": "patient", **_patient_header(patient)}) + b"\n"
+    for section in sections:
+        kind, columns, _, _ = SECTIONS[section]
+        for chunk in _chunks(_rows(conn, patient_id, section)):
+            yield b"".join(serialize.dumps({"type": kind, **timestamps.decode_row(zip(columns, r))})
+                           + b"\n" for r in chunk)
+
+
+def stream(conn, patient_id, fmt="csv", sections=None):
+    """Yield the export of `patient_id` in `fmt` ("csv" / "ndjson") chunk by chunk.
+
+    `sections` picks from SECTIONS (all by default), in that order.
+    """
+    sections = sections or list(SECTIONS)
+    own_txn = not conn.in_transaction
+    if own_txn:
+        conn.execute("BEGIN")
+    try:
+        patient = conn.execute("SELECT * FROM patients WHERE patient_id = ?", (patient_id,)).fetchone()
+        if fmt == "csv":
+            yield from _csv(conn, patient_id, sections, patient)
+        else:
+            yield from _ndjson(conn, patient_id, sections, patient)
+    finally:
+        if own_txn:
+            conn.commit()
+
+
+def filename(patient_id, fmt):
+    # patient ids come from the URL: keep only filename-safe characters
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", patient_id)
+    day = timestamps.to_iso(timestamps.now_ms())[:10].replace("-", "")
+    return f"{safe}-history-{day}.{fmt}"
@@ -12,3 +12,66 @@ export default api
 
 
 
+
+// Delta sync: GET /api/.../changes?since=<cursor> returns only rows changed
+// after the cursor handed out with the full payload (or by the last delta).
+export interface Delta<T = any> {
+  patient: T | null
+  readings: T[]
+  medications: T[]
+  symptoms: T[]
+  accesses: T[]
+  next_cursor: string
+  has_more: boolean
+}
+
+// Follows has_more until caught up. Rejects on 410 (cursor too old) - reload in full then.
+export async function fetchChanges(path: string, since: string): Promise<Delta> {
+  const total: Delta = { patient: null, readings: [], medications: [], symptoms: [], accesses: [], next_cursor: since, has_more: true }
+  while (total.has_more) {
+    const { data } = await api.get<Delta>(path, { params: { since: total.next_cursor } })
+    total.patient = data.patient ?? total.patient
+    total.readings.push(...data.readings)
+    total.medications.push(...data.medications)
+    total.symptoms.push(...data.symptoms)
+    total.accesses.push(...data.accesses)
+    total.next_cursor = data.next_cursor
+    total.has_more = data.has_more
+  }
+  return total
+}
+
+export const newestFirst = (a: { timestamp: string }, b: { timestamp: string }) =>
+  a.timestamp < b.timestamp ? 1 : a.timestamp > b.timestamp ? -1 : 0
+
+// Replace rows with the same key, add new ones, keep `compare` order and at most `limit` rows
+export function mergeRows<T>(
+  rows: T[],
+  changed: T[],
+  key: (row: T) => unknown,
+  compare?: (a: T, b: T) => number,
+  limit?: number,
+): T[] {
+  if (changed.length === 0) return rows
+  const byKey = new Map(rows.map((r) => [key(r), r]))
+  for (const row of changed) byKey.set(key(row), row)
+  const merged = Array.from(byKey.values())
+  if (compare) merged.sort(compare)
+  return limit ? merged.slice(0, limit) : merged
+}
+
+// Live updates (Server-Sent Events). "change" events are hints - fetch the rows
+// with fetchChanges(); "resync" means the server dropped hints, reload in full.
+// Returns a function that closes the stream.
+export interface ChangeEvent {
+  patient_id: string
+  entities: string[]
+  cursor: string
+}
+
+export function subscribe(path: string, onChange: (event: ChangeEvent) => void, onResync: () => void): () => void {
+  const source = new EventSource(`/api${path}`, { withCredentials: true })
+  source.addEventListener('change', (e) => onChange(JSON.parse((e as MessageEvent).data)))
+  source.addEventListener('resync', () => onResync())
+  return () => source.close()
+}
@@ -1,8 +1,10 @@
 interface Access {
-  access_id: number
+  id?: number
+  event_id?: string | null  // set for events still queued by the audit writer
   timestamp: string
   actor: string
   role: string
+  action?: string  // 'view' / 'export' / 'search'
 }
 
 interface AccessLogProps {
@@ -17,8 +19,8 @@ function AccessLog({ accesses }: AccessLogProps) {
         {accesses.length > 0 ? (
           <ul className="small mb-0">
             {accesses.map((a) => (
-              <li key={a.access_id}>
-                {a.timestamp} – {a.actor} ({a.role})
+              <li key={a.event_id ?? a.id}>
+                {a.timestamp} – {a.actor} ({a.role}){a.action === 'export' && ' – exported your history'}{a.action === 'search' && ' – found your record in a search'}
               </li>
             ))}
           </ul>
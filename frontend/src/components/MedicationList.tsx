@@ -1,40 +1,97 @@
-import { useState } from 'react'
+import { useEffect, useState } from 'react'
 import api from '../api/client'
 
 interface Medication {
-  medication_id: number
+  id: number
   name: string
   dose: string
   frequency: string
+  drug_id?: string | null
+}
+
+// GET /api/drugs/complete?q= (drugs.py dictionary)
+interface DrugSuggestion {
+  drug_id: string
+  name: string
+  strength: string | null
+  strengths: string[]
+  score: number
+}
+
+// interactions.py: pairs in this medication list, worst first
+export interface Interaction {
+  drug_ids: [string, string]
+  names: [string, string]
+  severity: 'contraindicated' | 'major' | 'moderate' | 'minor'
+  level: number
+  description: string
 }
 
 interface MedicationListProps {
   patientId: string
   meds: Medication[]
+  interactions: Interaction[]
+  onInteractions: (interactions: Interaction[]) => void
   onUpdate: () => void
 }
 
-function MedicationList({ patientId, meds, onUpdate }: MedicationListProps) {
+const SCAN_POLL_MS = 500
+const COMPLETE_DEBOUNCE_MS = 150
+
+function MedicationList({ patientId, meds, interactions, onInteractions, onUpdate }: MedicationListProps) {
   const [name, setName] = useState('')
   const [dose, setDose] = useState('')
   const [frequency, setFrequency] = useState('')
+  const [drugId, setDrugId] = useState<string | null>(null)
+  const [suggestions, setSuggestions] = useState<DrugSuggestion[]>([])
   const [loading, setLoading] = useState(false)
   const [scanning, setScanning] = useState(false)
   const [scanResult, setScanResult] = useState<any>(null)
 
+  // Autocomplete from the drug dictionary while typing (skipped once a suggestion is picked)
+  useEffect(() => {
+    if (drugId) return
+    if (name.trim().length < 2) {
+      setSuggestions([])
+      return
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const { data } = await api.get<{ results: DrugSuggestion[] }>('/drugs/complete', { params: { q: name, limit: 8 } })
+        setSuggestions(data.results)
+      } catch (error) {
+        console.error('Error loading drug suggestions:', error)
+      }
+    }, COMPLETE_DEBOUNCE_MS)
+    return () => clearTimeout(timer)
+  }, [name, drugId])
+
+  const handleNameChange = (value: string) => {
+    setName(value)
+    const picked = suggestions.find((s) => s.name === value)
+    setDrugId(picked ? picked.drug_id : null)
+    if (picked && !dose && picked.strength) setDose(picked.strength)
+  }
+
+  const strengths = suggestions.find((s) => s.drug_id === drugId)?.strengths ?? []
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault()
     setLoading(true)
 
     try {
-      await api.post(`/patient/${patientId}/med`, {
+      const { data } = await api.post(`/patient/${patientId}/med`, {
         name,
         dose,
         frequency,
+        drug_id: drugId,
       })
+      // the response re-checks the whole list with the new medication
+      onInteractions(data.interactions || [])
       setName('')
       setDose('')
       setFrequency('')
+      setDrugId(null)
       onUpdate()
     } catch (error) {
       console.error('Error adding medication:', error)
@@ -55,14 +112,32 @@ function MedicationList({ patientId, meds, onUpdate }: MedicationListProps) {
     formData.append('image', file)
 
     try {
-      const response = await fetch(`/patient/${patientId}/scan_med`, {
+      // Submit the label as an OCR job, then poll until it finishes
+      const submit = await fetch(`/patient/${patientId}/scan_med/jobs`, {
         method: 'POST',
         body: formData,
         credentials: 'include',
       })
-      const data = await response.json()
+      let data = await submit.json()
+      if (!submit.ok) {
+        throw new Error(data.error || 'Scan failed')
+      }
+      while (data.status !== 'done' && data.status !== 'error') {
+        await new Promise((resolve) => setTimeout(resolve, SCAN_POLL_MS))
+        const poll = await fetch(data.status_url || `/patient/${patientId}/scan_med/jobs/${data.job_id}`, {
+          credentials: 'include',
+        })
+        data = { ...data, ...(await poll.json()) }
+        if (!poll.ok) {
+          throw new Error(data.error || 'Scan failed')
+        }
+      }
+      if (data.status === 'error') {
+        throw new Error(data.error || 'Scan failed')
+      }
       if (data.suggested) {
         if (data.suggested.name) setName(data.suggested.name)
+        setDrugId(data.suggested.drug_id ?? null)
         if (data.suggested.dose) setDose(data.suggested.dose)
         if (data.suggested.frequency) setFrequency(data.suggested.frequency)
       }
@@ -77,6 +152,7 @@ function MedicationList({ patientId, meds, onUpdate }: MedicationListProps) {
 
   const fillMedName = (text: string) => {
     setName(text)
+    setDrugId(null)
   }
 
   return (
@@ -85,11 +161,22 @@ function MedicationList({ patientId, meds, onUpdate }: MedicationListProps) {
         <h5>Your Medications</h5>
         <ul>
           {meds.map((m) => (
-            <li key={m.medication_id}>
+            <li key={m.id}>
               {m.name} – {m.dose} – {m.frequency}
+              {!m.drug_id && <span className="small text-muted"> (not in drug list)</span>}
             </li>
           ))}
         </ul>
+        {interactions
+          .filter((i) => i.level >= 1)
+          .map((i) => (
+            <div
+              key={i.drug_ids.join('+')}
+              className={`alert ${i.level >= 2 ? 'alert-danger' : 'alert-warning'} py-1 small`}
+            >
+              {i.names[0]} + {i.names[1]}: {i.description}. Ask your pharmacist.
+            </div>
+          ))}
 
         <form onSubmit={handleSubmit} className="row g-2">
           <div className="col-md-4">
@@ -97,9 +184,16 @@ function MedicationList({ patientId, meds, onUpdate }: MedicationListProps) {
               className="form-control"
               placeholder="Name"
               value={name}
-              onChange={(e) => setName(e.target.value)}
+              onChange={(e) => handleNameChange(e.target.value)}
+              list="drug-suggestions"
+              autoComplete="off"
               required
             />
+            <datalist id="drug-suggestions">
+              {suggestions.map((s) => (
+                <option key={s.drug_id} value={s.name} />
+              ))}
+            </datalist>
           </div>
           <div className="col-md-4">
             <input
@@ -107,7 +201,13 @@ function MedicationList({ patientId, meds, onUpdate }: MedicationListProps) {
               placeholder="Dose"
               value={dose}
               onChange={(e) => setDose(e.target.value)}
+              list="drug-strengths"
             />
+            <datalist id="drug-strengths">
+              {strengths.map((s) => (
+                <option key={s} value={s} />
+              ))}
+            </datalist>
           </div>
           <div className="col-md-4">
             <input
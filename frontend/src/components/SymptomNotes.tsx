@@ -2,7 +2,7 @@ import { useState } from 'react'
 import api from '../api/client'
 
 interface Symptom {
-  symptom_id: number
+  id: number
   note: string
   timestamp: string
 }
@@ -53,7 +53,7 @@ function SymptomNotes({ patientId, symptoms, onUpdate }: SymptomNotesProps) {
         {symptoms.length > 0 ? (
           <ul className="small mt-2 mb-0">
             {symptoms.map((s) => (
-              <li key={s.symptom_id}>
+              <li key={s.id}>
                 {s.timestamp} – {s.note}
               </li>
             ))}
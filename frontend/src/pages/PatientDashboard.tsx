@@ -1,8 +1,8 @@
 import { useState, useEffect } from 'react'
 import { useParams } from 'react-router-dom'
-import api from '../api/client'
+import api, { fetchChanges, mergeRows, newestFirst } from '../api/client'
 import BPForm from '../components/BPForm'
-import MedicationList from '../components/MedicationList'
+import MedicationList, { Interaction } from '../components/MedicationList'
 import SymptomNotes from '../components/SymptomNotes'
 import ConsentToggle from '../components/ConsentToggle'
 import ConditionsForm from '../components/ConditionsForm'
@@ -17,26 +17,28 @@ interface Patient {
 }
 
 interface Reading {
+  id: number
   systolic: number
   diastolic: number
   timestamp: string
 }
 
 interface Medication {
-  medication_id: number
+  id: number
   name: string
   dose: string
   frequency: string
 }
 
 interface Symptom {
-  symptom_id: number
+  id: number
   note: string
   timestamp: string
 }
 
 interface Access {
-  access_id: number
+  id?: number
+  event_id?: string | null
   timestamp: string
   actor: string
   role: string
@@ -47,9 +49,11 @@ function PatientDashboard() {
   const [patient, setPatient] = useState<Patient | null>(null)
   const [readings, setReadings] = useState<Reading[]>([])
   const [meds, setMeds] = useState<Medication[]>([])
+  const [interactions, setInteractions] = useState<Interaction[]>([])
   const [symptoms, setSymptoms] = useState<Symptom[]>([])
   const [accesses, setAccesses] = useState<Access[]>([])
   const [loading, setLoading] = useState(true)
+  const [cursor, setCursor] = useState<string | null>(null)
 
   useEffect(() => {
     fetchPatientData()
@@ -67,8 +71,10 @@ function PatientDashboard() {
       setPatient(data.patient)
       setReadings(data.readings || [])
       setMeds(data.medications || [])
+      setInteractions(data.interactions || [])
       setSymptoms(data.symptoms || [])
       setAccesses(data.accesses || [])
+      setCursor(data.cursor || null)
     } catch (error: any) {
       console.error('Error fetching patient data:', error)
       if (error.response) {
@@ -80,6 +86,23 @@ function PatientDashboard() {
     }
   }
 
+  // After a write: merge only what changed since the last load instead of refetching everything
+  const syncChanges = async () => {
+    if (!cursor) return fetchPatientData()
+    try {
+      const delta = await fetchChanges(`/patient/${patientId}/changes`, cursor)
+      if (delta.patient) setPatient(delta.patient)
+      setReadings((prev) => mergeRows(prev, delta.readings, (r) => r.id, newestFirst, 10))
+      setMeds((prev) => mergeRows(prev, delta.medications, (m) => m.id, (a, b) => a.id - b.id))
+      setSymptoms((prev) => mergeRows(prev, delta.symptoms, (s) => s.id, newestFirst, 3))
+      setAccesses((prev) => mergeRows(prev, delta.accesses, (a) => a.event_id ?? a.id, newestFirst, 5))
+      setCursor(delta.next_cursor)
+    } catch (error) {
+      // cursor expired (410) or network error: fall back to a full reload
+      fetchPatientData()
+    }
+  }
+
   if (loading) {
     return <div className="text-center">Loading...</div>
   }
@@ -95,22 +118,24 @@ function PatientDashboard() {
       <div className="row my-3">
         <div className="col-md-4">
           <LatestBP readings={readings} />
-          <ConsentToggle patient={patient} onUpdate={fetchPatientData} />
-          <ConditionsForm patient={patient} onUpdate={fetchPatientData} />
+          <ConsentToggle patient={patient} onUpdate={syncChanges} />
+          <ConditionsForm patient={patient} onUpdate={syncChanges} />
           <AccessLog accesses={accesses} />
         </div>
 
         <div className="col-md-8">
-          <BPForm patientId={patientId!} onSuccess={fetchPatientData} />
+          <BPForm patientId={patientId!} onSuccess={syncChanges} />
           <MedicationList 
             patientId={patientId!} 
             meds={meds} 
-            onUpdate={fetchPatientData} 
+            interactions={interactions}
+            onInteractions={setInteractions}
+            onUpdate={syncChanges} 
           />
           <SymptomNotes 
             patientId={patientId!} 
             symptoms={symptoms} 
-            onUpdate={fetchPatientData} 
+            onUpdate={syncChanges} 
           />
         </div>
       </div>
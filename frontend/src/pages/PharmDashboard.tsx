@@ -1,25 +1,98 @@
 import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
-import api from '../api/client'
+import api, { subscribe } from '../api/client'
 
 interface Patient {
   patient_id: string
   name: string
   consent: number
+  conditions: string | null
+  mtm_score: number
+  mtm_level: 'High' | 'Moderate' | 'Low'
+  review_due: boolean
+  interaction: 'contraindicated' | 'major' | 'moderate' | 'minor' | null
 }
 
+interface Condition {
+  code: string
+  bit: number
+  label: string | null
+}
+
+interface Filters {
+  mtm_level: string
+  condition: string
+  interaction: string
+  review_due: boolean
+  consent: boolean
+  sort: string
+  order: string
+}
+
+const DEFAULT_FILTERS: Filters = {
+  mtm_level: '',
+  condition: '',
+  interaction: '',
+  review_due: false,
+  consent: false,
+  sort: 'name',
+  order: 'asc',
+}
+
+const PAGE_SIZE = 50
+
 function PharmDashboard() {
   const [patients, setPatients] = useState<Patient[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [filters, setFilters] = useState<Filters>(DEFAULT_FILTERS)
+  const [catalog, setCatalog] = useState<Condition[]>([])
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
+  // patients with new readings / notes / accesses since this page was loaded
+  const [active, setActive] = useState<Set<string>>(new Set())
+
+  useEffect(() => {
+    fetchPatients(null)
+    setActive(new Set())
+  }, [filters])
 
   useEffect(() => {
-    fetchPatients()
+    api
+      .get('/pharm/conditions')
+      .then((response) => setCatalog(response.data.conditions || []))
+      .catch((error) => console.error('Error fetching conditions:', error))
   }, [])
 
-  const fetchPatients = async () => {
+  useEffect(
+    () =>
+      subscribe(
+        '/pharm/events',
+        (e) => setActive((prev) => new Set(prev).add(e.patient_id)),
+        () => setFilters((prev) => ({ ...prev })), // missed events: reload the list
+      ),
+    [],
+  )
+
+  // cursor === null -> first page (replace list), otherwise append next page
+  const fetchPatients = async (cursor: string | null) => {
+    const params: Record<string, string | number> = {
+      sort: filters.sort,
+      order: filters.order,
+      limit: PAGE_SIZE,
+    }
+    if (filters.mtm_level) params.mtm_level = filters.mtm_level
+    if (filters.condition) params.condition = filters.condition
+    if (filters.interaction) params.interaction = filters.interaction
+    if (filters.review_due) params.review_due = 1
+    if (filters.consent) params.consent = 1
+    if (cursor) params.cursor = cursor
+
+    if (cursor) setLoadingMore(true)
     try {
-      const response = await api.get('/pharm/dashboard')
-      setPatients(response.data.patients || [])
+      const response = await api.get('/pharm/dashboard', { params })
+      const page: Patient[] = response.data.patients || []
+      setPatients((prev) => (cursor ? [...prev, ...page] : page))
+      setNextCursor(response.data.next_cursor || null)
     } catch (error) {
       console.error('Error fetching patients:', error)
       if ((error as any).response?.status === 401) {
@@ -27,9 +100,14 @@ function PharmDashboard() {
       }
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
+  const updateFilter = <K extends keyof Filters>(key: K, value: Filters[K]) => {
+    setFilters((prev) => ({ ...prev, [key]: value }))
+  }
+
   if (loading) {
     return <div className="text-center">Loading...</div>
   }
@@ -43,20 +121,137 @@ function PharmDashboard() {
         </Link>
       </div>
 
+      <div className="row g-2 align-items-end mb-3">
+        <div className="col-auto">
+          <label className="form-label small mb-0">MTM risk</label>
+          <select
+            className="form-select form-select-sm"
+            value={filters.mtm_level}
+            onChange={(e) => updateFilter('mtm_level', e.target.value)}
+          >
+            <option value="">Any</option>
+            <option value="High">High</option>
+            <option value="Moderate">Moderate</option>
+            <option value="Low">Low</option>
+          </select>
+        </div>
+        <div className="col-auto">
+          <label className="form-label small mb-0">Condition</label>
+          <select
+            className="form-select form-select-sm"
+            value={filters.condition}
+            onChange={(e) => updateFilter('condition', e.target.value)}
+          >
+            <option value="">Any</option>
+            {catalog.map((c) => (
+              <option key={c.code} value={c.code}>
+                {c.label || c.code}
+              </option>
+            ))}
+          </select>
+        </div>
+        <div className="col-auto">
+          <label className="form-label small mb-0">Drug interactions</label>
+          <select
+            className="form-select form-select-sm"
+            value={filters.interaction}
+            onChange={(e) => updateFilter('interaction', e.target.value)}
+          >
+            <option value="">Any</option>
+            <option value="major">Major or worse</option>
+            <option value="moderate">Moderate or worse</option>
+            <option value="contraindicated">Contraindicated</option>
+          </select>
+        </div>
+        <div className="col-auto form-check ms-2">
+          <input
+            className="form-check-input"
+            type="checkbox"
+            id="review_due"
+            checked={filters.review_due}
+            onChange={(e) => updateFilter('review_due', e.target.checked)}
+          />
+          <label className="form-check-label small" htmlFor="review_due">
+            Review due
+          </label>
+        </div>
+        <div className="col-auto form-check ms-2">
+          <input
+            className="form-check-input"
+            type="checkbox"
+            id="consent"
+            checked={filters.consent}
+            onChange={(e) => updateFilter('consent', e.target.checked)}
+          />
+          <label className="form-check-label small" htmlFor="consent">
+            Consented only
+          </label>
+        </div>
+        <div className="col-auto">
+          <label className="form-label small mb-0">Sort</label>
+          <select
+            className="form-select form-select-sm"
+            value={filters.sort}
+            onChange={(e) => updateFilter('sort', e.target.value)}
+          >
+            <option value="name">Name</option>
+            <option value="mtm_score">MTM score</option>
+            <option value="patient_id">Patient ID</option>
+          </select>
+        </div>
+        <div className="col-auto">
+          <select
+            className="form-select form-select-sm"
+            value={filters.order}
+            onChange={(e) => updateFilter('order', e.target.value)}
+          >
+            <option value="asc">Ascending</option>
+            <option value="desc">Descending</option>
+          </select>
+        </div>
+      </div>
+
       <ul>
         {patients.map((patient) => (
           <li key={patient.patient_id}>
             <Link to={`/pharm/patient/${patient.patient_id}`}>
               {patient.name} ({patient.patient_id})
             </Link>
+            <span
+              className={`badge ms-1 ${
+                patient.mtm_level === 'High'
+                  ? 'bg-danger'
+                  : patient.mtm_level === 'Moderate'
+                  ? 'bg-warning text-dark'
+                  : 'bg-secondary'
+              }`}
+            >
+              MTM {patient.mtm_level}
+            </span>
+            {patient.review_due && <span className="badge bg-info text-dark ms-1">Review due</span>}
+            {(patient.interaction === 'major' || patient.interaction === 'contraindicated') && (
+              <span className="badge bg-danger ms-1">Interaction: {patient.interaction}</span>
+            )}
+            {patient.interaction === 'moderate' && (
+              <span className="badge bg-warning text-dark ms-1">Interaction: moderate</span>
+            )}
+            {active.has(patient.patient_id) && <span className="badge bg-success ms-1">New activity</span>}
           </li>
         ))}
+        {patients.length === 0 && <li className="text-muted">No patients match these filters.</li>}
       </ul>
+
+      {nextCursor && (
+        <button
+          className="btn btn-sm btn-outline-primary"
+          onClick={() => fetchPatients(nextCursor)}
+          disabled={loadingMore}
+        >
+          {loadingMore ? 'Loading...' : 'Load more'}
+        </button>
+      )}
     </div>
   )
 }
 
 export default PharmDashboard
-
-
-
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useParams } from 'react-router-dom'
 import { Line } from 'react-chartjs-2'
 import {
@@ -11,7 +11,7 @@ import {
   Tooltip,
   Legend,
 } from 'chart.js'
-import api from '../api/client'
+import api, { fetchChanges, mergeRows, newestFirst, subscribe } from '../api/client'
 
 ChartJS.register(
   CategoryScale,
@@ -43,6 +43,14 @@ interface Medication {
   frequency: string
 }
 
+interface Interaction {
+  drug_ids: [string, string]
+  names: [string, string]
+  severity: 'contraindicated' | 'major' | 'moderate' | 'minor'
+  level: number
+  description: string
+}
+
 interface Symptom {
   symptom_id: number
   note: string
@@ -50,18 +58,29 @@ interface Symptom {
 }
 
 interface Access {
-  access_id: number
+  id?: number
+  event_id?: string | null
   timestamp: string
   actor: string
   role: string
+  action?: string
 }
 
+// BP chart range options (days back from today; null = all readings)
+const CHART_RANGES: { label: string; days: number | null }[] = [
+  { label: '30 days', days: 30 },
+  { label: '90 days', days: 90 },
+  { label: '1 year', days: 365 },
+  { label: 'All', days: null },
+]
+
 function PharmPatientView() {
   const { patientId } = useParams<{ patientId: string }>()
   const [data, setData] = useState<any>(null)
   const [loading, setLoading] = useState(true)
   const [carePlan, setCarePlan] = useState('')
   const [saving, setSaving] = useState(false)
+  const [chartDays, setChartDays] = useState<number | null>(null)
 
   useEffect(() => {
     fetchPatientData()
@@ -69,8 +88,11 @@ function PharmPatientView() {
 
   const fetchPatientData = async () => {
     try {
+      // the view is cached until the patient's data changes; the access log
+      // (which this very view adds to) comes from its own endpoint
       const response = await api.get(`/pharm/patient/${patientId}`)
-      setData(response.data)
+      const accessLog = await api.get(`/pharm/patient/${patientId}/accesses`)
+      setData({ ...response.data, accesses: accessLog.data.accesses || [] })
       setCarePlan(response.data.patient?.care_plan || '')
     } catch (error: any) {
       console.error('Error fetching patient data:', error)
@@ -89,6 +111,52 @@ function PharmPatientView() {
     }
   }
 
+  // Server returns an LTTB-downsampled series for the selected range
+  const fetchSeries = async (days: number | null) => {
+    setChartDays(days)
+    const params: Record<string, string> = {}
+    if (days) {
+      params.start = new Date(Date.now() - days * 24 * 60 * 60 * 1000).toISOString().slice(0, 10)
+    }
+    try {
+      const response = await api.get(`/pharm/patient/${patientId}/series`, { params })
+      const { labels, systolic, diastolic } = response.data
+      setData((prev: any) => ({ ...prev, labels, systolic, diastolic }))
+    } catch (error) {
+      console.error('Error fetching BP series:', error)
+    }
+  }
+
+  // Merge rows changed since the last load into `data` (new readings also extend
+  // the chart when it shows the latest range); MTM metrics need a full reload,
+  // and so do interactions when a medication changed.
+  const syncChanges = async () => {
+    if (!data?.cursor) return fetchPatientData()
+    try {
+      const delta = await fetchChanges(`/pharm/patient/${patientId}/changes`, data.cursor)
+      if (delta.medications.length) return fetchPatientData()
+      const added = [...delta.readings].sort((a, b) => -newestFirst(a, b))
+      setData((prev: any) => {
+        const last = prev.labels?.length ? prev.labels[prev.labels.length - 1] : ''
+        const fresh = added.filter((r) => r.timestamp > last)
+        return {
+          ...prev,
+          patient: delta.patient ?? prev.patient,
+          readings: mergeRows(prev.readings, delta.readings, (r: any) => r.id, newestFirst, prev.readings.length || 10),
+          meds: mergeRows(prev.meds, delta.medications, (m: any) => m.id, (a: any, b: any) => a.id - b.id),
+          symptoms: mergeRows(prev.symptoms, delta.symptoms, (x: any) => x.id, newestFirst, 3),
+          accesses: mergeRows(prev.accesses, delta.accesses, (a: any) => a.event_id ?? a.id, newestFirst, 5),
+          labels: [...(prev.labels || []), ...fresh.map((r) => r.timestamp)],
+          systolic: [...(prev.systolic || []), ...fresh.map((r) => r.systolic)],
+          diastolic: [...(prev.diastolic || []), ...fresh.map((r) => r.diastolic)],
+          cursor: delta.next_cursor,
+        }
+      })
+    } catch (error) {
+      fetchPatientData()
+    }
+  }
+
   const handleMarkReview = async () => {
     try {
       await api.post(`/pharm/patient/${patientId}/mark_review`)
@@ -104,7 +172,7 @@ function PharmPatientView() {
     setSaving(true)
     try {
       await api.post(`/pharm/patient/${patientId}/care_plan`, { care_plan: carePlan })
-      fetchPatientData()
+      syncChanges()
     } catch (error) {
       console.error('Error saving care plan:', error)
       alert('Failed to save care plan')
@@ -113,6 +181,17 @@ function PharmPatientView() {
     }
   }
 
+  // New home readings / notes / accesses arrive over SSE; refs so the stream
+  // (opened once per patient) always calls the latest closures
+  const syncRef = useRef(syncChanges)
+  const reloadRef = useRef(fetchPatientData)
+  syncRef.current = syncChanges
+  reloadRef.current = fetchPatientData
+  useEffect(
+    () => subscribe(`/pharm/patient/${patientId}/events`, () => syncRef.current(), () => reloadRef.current()),
+    [patientId],
+  )
+
   if (loading) {
     return <div className="text-center">Loading...</div>
   }
@@ -137,7 +216,7 @@ function PharmPatientView() {
     )
   }
 
-  const { patient, readings, meds, symptoms, accesses, labels, systolic, diastolic, avg_sys, mtm_level, mtm_score, bp_status, bp_status_class, review_due } = data
+  const { patient, readings, meds, interactions, symptoms, accesses, labels, systolic, diastolic, avg_sys, bp_stats, mtm_level, mtm_score, bp_status, bp_status_class, review_due } = data
 
   const chartData = {
     labels: labels || [],
@@ -206,9 +285,28 @@ function PharmPatientView() {
         MTM Risk: {mtm_level} (score: {mtm_score})
       </div>
 
+      <div className="mb-3">
+        Export full history:
+        <a className="btn btn-sm btn-outline-secondary ms-1" href={`/api/pharm/patient/${patientId}/export?format=csv`}>CSV</a>
+        <a className="btn btn-sm btn-outline-secondary ms-1" href={`/api/pharm/patient/${patientId}/export?format=ndjson`}>NDJSON</a>
+      </div>
+
       <div className="row my-3">
         <div className="col-md-6">
-          <h5>BP Trend</h5>
+          <div className="d-flex justify-content-between align-items-center">
+            <h5>BP Trend</h5>
+            <select
+              className="form-select form-select-sm w-auto"
+              value={chartDays ?? ''}
+              onChange={(e) => fetchSeries(e.target.value ? Number(e.target.value) : null)}
+            >
+              {CHART_RANGES.map((r) => (
+                <option key={r.label} value={r.days ?? ''}>
+                  {r.label}
+                </option>
+              ))}
+            </select>
+          </div>
           {readings.length > 0 ? (
             <Line data={chartData} />
           ) : (
@@ -224,9 +322,32 @@ function PharmPatientView() {
               </li>
             ))}
           </ul>
+          {interactions?.length > 0 && (
+            <>
+              <h6 className="mt-2">Drug interactions</h6>
+              <ul className="small">
+                {interactions.map((i: Interaction) => (
+                  <li key={i.drug_ids.join('+')}>
+                    <span
+                      className={`badge ${
+                        i.level >= 2 ? 'bg-danger' : i.level === 1 ? 'bg-warning text-dark' : 'bg-secondary'
+                      }`}
+                    >
+                      {i.severity}
+                    </span>{' '}
+                    {i.names[0]} + {i.names[1]} – {i.description}
+                  </li>
+                ))}
+              </ul>
+            </>
+          )}
           {avg_sys && (
             <p className="mt-2 text-muted small">
               Average systolic: {avg_sys.toFixed(1)} mmHg
+              {bp_stats?.count_30d > 0 &&
+                ` · 30 days: ${bp_stats.avg_sys_30d.toFixed(1)}/${bp_stats.avg_dia_30d.toFixed(1)} (${bp_stats.count_30d} readings)`}
+              {bp_stats?.count_90d > 0 &&
+                ` · 90 days: ${bp_stats.avg_sys_90d.toFixed(1)}/${bp_stats.avg_dia_90d.toFixed(1)} (${bp_stats.count_90d} readings)`}
             </p>
           )}
         </div>
@@ -251,8 +372,8 @@ function PharmPatientView() {
           {accesses.length > 0 ? (
             <ul className="small">
               {accesses.map((a: Access) => (
-                <li key={a.access_id}>
-                  {a.timestamp} – {a.actor} ({a.role}) viewed record
+                <li key={a.event_id ?? a.id}>
+                  {a.timestamp} – {a.actor} ({a.role}) {a.action === 'export' ? 'exported history' : a.action === 'search' ? 'found in search' : 'viewed record'}
                 </li>
               ))}
             </ul>
@@ -0,0 +1,330 @@
+# import_patients.py
+# Offline bulk import for onboarding a pharmacy's existing roster.
+#
+#   python import_patients.py --patients roster.csv --medications meds.csv \
+#       --readings bp.ndjson --symptoms notes.csv [--chunk 50000]
+#   python import_patients.py --status
+#
+# Files are CSV (header row) or NDJSON (.ndjson / .jsonl), one record per row:
+#   patients     patient_id, name, consent, conditions
+#   medications  patient_id, name, dose, frequency
+#   readings     patient_id, systolic, diastolic, heart_rate, timestamp, id
+#   symptoms     patient_id, note, timestamp
+#
+# - records are inserted CHUNK_ROWS at a time, one transaction per chunk, with
+#   one prepared statement per kind (executemany + the statement cache)
+# - invalid records are skipped and written to <file>.rejects.ndjson
+# - the resume point (records consumed) is committed with each chunk in
+#   import_progress, so an interrupted run picks up where it stopped; a file
+#   whose size or mtime changed is not resumed (--restart starts it over)
+# - secondary indexes of the loaded tables are dropped for the load and built
+#   once at the end (kept in import_deferred_indexes until then, so a crash
+#   cannot lose them); unique indexes stay, they make reruns idempotent
+# - bp_stats, the MTM scores and the condition masks are rebuilt once at the end,
+#   the imported symptom notes are added to the search index (search.py),
+#   medication names are matched to the drug dictionary (drugs.py) and the
+#   interaction sweep (interactions.py) runs over the whole panel
+#
+# Run it with the app stopped: imported rows bypass the change log and the
+# in-process response caches. Old readings land in the hot table; run
+# `python archive.py run` afterwards to move them into the monthly archive.
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+import bp_ingest
+import bp_stats
+import conditions
+import db
+import drugs
+import interactions
+import mtm
+import search
+import timestamps
+from migrations import migrate
+
+CHUNK_ROWS = 50_000
+REPORT_EVERY = 2.0  # seconds
+KIND_ORDER = ("patients", "medications", "readings", "symptoms")
+
+INSERT_SQL = {
+    # upsert: re-importing a roster refreshes names/conditions, keeps consent
+    # and the versions of patients that already exist
+    "patients": """
+        INSERT INTO patients (patient_id, name, consent, conditions) VALUES (?, ?, ?, ?)
+        ON CONFLICT (patient_id) DO UPDATE SET name = excluded.name, conditions = excluded.conditions
+    """,
+    "medications": "INSERT INTO medications (patient_id, name, dose, frequency) VALUES (?, ?, ?, ?)",
+    # keys already stored (bp_client_keys) are skipped, like the batch upload endpoint
+    "readings": bp_stats.INSERT_READING_SQL,
+    "symptoms": "INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES (?, ?, ?)",
+}
+TABLES = {
+    "patients": "patients",
+    "medications": "medications",
+    "readings": "bp_readings",
+    "symptoms": "symptom_logs",
+}
+# CSV cells are text; these are converted to numbers before validation
+INT_FIELDS = {"systolic", "diastolic", "heart_rate", "consent"}
+
+DEFERRABLE_SQL = """
+    SELECT name, sql FROM sqlite_master
+    WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+      AND sql NOT LIKE 'CREATE UNIQUE%'
+"""
+
+
+def _text(record, name, required=False, max_length=None):
+    value = record.get(name)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"{name} is required")
+        return None
+    value = str(value).strip()
+    if max_length and len(value) > max_length:
+        raise ValueError(f"{name} is longer than {max_length} characters")
+    return value
+
+
+def _patient(record, now):
+    consent = record.get("consent") or 0
+    if consent not in (0, 1, True, False):
+        raise ValueError("consent must be 0 or 1")
+    return (_text(record, "patient_id", True, 64), _text(record, "name"), int(consent),
+            _text(record, "conditions"))
+
+
+def _medication(record, now):
+    return (_text(record, "patient_id", True), _text(record, "name", True),
+            _text(record, "dose"), _text(record, "frequency"))
+
+
+def _reading(record, now):
+    systolic, diastolic, heart_rate, ts, key = bp_ingest.validate_reading(record, now)
+    return (_text(record, "patient_id", True), systolic, diastolic, heart_rate, ts, key)
+
+
+def _symptom(record, now):
+    return (_text(record, "patient_id", True), _text(record, "note", True),
+            bp_ingest.parse_timestamp(record.get("timestamp"), now))
+
+
+ROW = {
+    "patients": _patient,
+    "medications": _medication,
+    "readings": _reading,
+    "symptoms": _symptom,
+}
+
+
+def read_records(path):
+    """Yield (record dict, None) or (None, error) for every record in a CSV / NDJSON file."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for record in csv.DictReader(f):
+                for name in INT_FIELDS & record.keys():
+                    value = (record[name] or "").strip()
+                    try:
+                        record[name] = int(value) if value else None
+                    except ValueError:
+                        pass  # left as text; validation reports it
+                yield record, None
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield None, f"malformed JSON: {e}"
+                continue
+            yield (record, None) if isinstance(record, dict) else (None, "record must be an object")
+
+
+def defer_indexes(conn, tables):
+    """Drop the non-unique indexes of `tables`; restore_indexes() builds them again."""
+    for table in tables:
+        for idx in conn.execute(DEFERRABLE_SQL, (table,)).fetchall():
+            conn.execute("INSERT OR IGNORE INTO import_deferred_indexes (name, sql) VALUES (?, ?)",
+                         (idx["name"], idx["sql"]))
+            conn.execute(f"DROP INDEX {idx['name']}")
+    conn.commit()
+
+
+def restore_indexes(conn, report=print):
+    for idx in conn.execute("SELECT name, sql FROM import_deferred_indexes").fetchall():
+        t0 = time.perf_counter()
+        conn.execute(idx["sql"])
+        conn.execute("DELETE FROM import_deferred_indexes WHERE name = ?", (idx["name"],))
+        conn.commit()
+        report(f"  index {idx['name']} built in {time.perf_counter() - t0:.1f}s")
+
+
+def _start(conn, kind, path, restart):
+    # -> records to skip; None if this file was already imported
+    source = os.path.abspath(path)
+    st = os.stat(path)
+    row = conn.execute("SELECT * FROM import_progress WHERE source = ?", (source,)).fetchone()
+    if row is not None and not restart:
+        if row["size"] != st.st_size or row["mtime"] != st.st_mtime or row["kind"] != kind:
+            raise SystemExit(f"{path} changed since its last import; use --restart to import it again")
+        return None if row["finished_at"] else row["position"]
+    conn.execute("""
+        INSERT OR REPLACE INTO import_progress (source, kind, size, mtime, started_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (source, kind, st.st_size, st.st_mtime, timestamps.now_ms()))
+    conn.commit()
+    return 0
+
+
+def import_file(conn, kind, path, chunk=CHUNK_ROWS, restart=False, now=None, report=print):
+    """Load one file; -> {"imported", "rejected", "seconds"} for this run."""
+    skip = _start(conn, kind, path, restart)
+    if skip is None:
+        report(f"{path}: already imported, skipped")
+        return {"imported": 0, "rejected": 0, "seconds": 0.0}
+    if skip:
+        report(f"{path}: resuming after {skip:,} records")
+
+    now = now or datetime.now()
+    source = os.path.abspath(path)
+    to_row = ROW[kind]
+    sql = INSERT_SQL[kind]
+    # readings/medications/symptoms of patients that are not in the roster are rejected
+    known = None
+    if kind != "patients":
+        known = {r[0] for r in conn.execute("SELECT patient_id FROM patients")}
+
+    totals = {"imported": 0, "rejected": 0}
+    position = skip
+    batch, rejects = [], []
+    t0 = last_report = time.perf_counter()
+    rejects_file = None
+
+    def flush():
+        nonlocal rejects_file
+        conn.execute("BEGIN")
+        imported = conn.executemany(sql, batch).rowcount if batch else 0
+        if kind == "readings":
+            conn.executemany(bp_stats.INSERT_CLIENT_KEY_SQL, [(r[0], r[5]) for r in batch if r[5] is not None])
+        conn.execute("""
+            UPDATE import_progress
+            SET position = ?, imported = imported + ?, rejected = rejected + ?
+            WHERE source = ?
+        """, (position, imported, len(rejects), source))
+        conn.commit()
+        if rejects:
+            if rejects_file is None:
+                rejects_file = open(path + ".rejects.ndjson", "a", encoding="utf-8")
+            rejects_file.writelines(json.dumps(r, default=str) + "\n" for r in rejects)
+            rejects_file.flush()
+        totals["imported"] += imported
+        totals["rejected"] += len(rejects)
+        batch.clear()
+        rejects.clear()
+
+    records = read_records(path)
+    try:
+        for n, (record, error) in enumerate(records):
+            if n < skip:
+                continue
+            position = n + 1
+            if error is None:
+                try:
+                    row = to_row(record, now)
+                    if known is not None and row[0] not in known:
+                        raise ValueError(f"unknown patient_id {row[0]!r}")
+                except ValueError as e:
+                    error = str(e)
+            if error is None:
+                batch.append(row)
+            else:
+                rejects.append({"record": position, "error": error, "data": record})
+            if len(batch) + len(rejects) >= chunk:
+                flush()
+                elapsed = time.perf_counter() - last_report
+                if elapsed >= REPORT_EVERY:
+                    last_report = time.perf_counter()
+                    rate = (position - skip) / (last_report - t0)
+                    report(f"  {path}: {position:,} records ({rate:,.0f} rows/s)")
+        flush()
+        conn.execute("UPDATE import_progress SET finished_at = ? WHERE source = ?",
+                     (timestamps.now_ms(), source))
+        conn.commit()
+    finally:
+        records.close()
+        if rejects_file is not None:
+            rejects_file.close()
+
+    totals["seconds"] = time.perf_counter() - t0
+    rate = (totals["imported"] + totals["rejected"]) / max(totals["seconds"], 1e-9)
+    report(f"{path}: {totals['imported']:,} imported, {totals['rejected']:,} rejected "
+           f"in {totals['seconds']:.1f}s ({rate:,.0f} rows/s)")
+    return totals
+
+
+def finish(conn, report=print):
+    """Build deferred indexes, then recompute the aggregates from the imported rows."""
+    restore_indexes(conn, report)
+    t0 = time.perf_counter()
+    bp_stats.rebuild(conn)
+    mtm.refresh(conn)
+    conditions.rebuild(conn)
+    search.index_new_symptoms(conn)
+    drugs.backfill(conn)
+    interactions.sweep(conn)
+    # ETags / cached bodies of the patient views (cache.py) go stale
+    conn.execute("UPDATE patients SET data_version = data_version + 1")
+    conn.commit()
+    conn.execute("ANALYZE")
+    report(f"  bp_stats, MTM scores, condition masks, search index, drug ids + interactions rebuilt in {time.perf_counter() - t0:.1f}s")
+
+
+def run(conn, files, chunk=CHUNK_ROWS, defer=True, restart=False, report=print):
+    """files: {kind: [paths]}; kinds are loaded patients first so the others can be checked."""
+    if defer:
+        defer_indexes(conn, [TABLES[k] for k in KIND_ORDER if files.get(k) and k != "patients"])
+    totals = {}
+    for kind in KIND_ORDER:
+        for path in files.get(kind) or ():
+            totals[path] = import_file(conn, kind, path, chunk, restart, report=report)
+    finish(conn, report)
+    return totals
+
+
+def status(conn):
+    for row in conn.execute("SELECT * FROM import_progress ORDER BY started_at"):
+        state = "done" if row["finished_at"] else "in progress"
+        print(f"{row['kind']:<12} {row['source']}  {row['position']:,} records  "
+              f"({row['imported']:,} imported, {row['rejected']:,} rejected)  {state}")
+    pending = [r["name"] for r in conn.execute("SELECT name FROM import_deferred_indexes")]
+    if pending:
+        print(f"indexes still to build: {', '.join(pending)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-import patients, medications, BP readings and symptoms")
+    for kind in KIND_ORDER:
+        parser.add_argument(f"--{kind}", action="append", metavar="FILE", help=f"{kind} CSV/NDJSON file")
+    parser.add_argument("--chunk", type=int, default=CHUNK_ROWS, help="records per transaction")
+    parser.add_argument("--no-defer-indexes", action="store_true",
+                        help="keep secondary indexes during the load")
+    parser.add_argument("--restart", action="store_true", help="import the files again from the start")
+    parser.add_argument("--status", action="store_true", help="show import progress and exit")
+    args = parser.parse_args()
+
+    conn = db.connect()
+    migrate(conn)
+    if args.status:
+        status(conn)
+    else:
+        files = {kind: getattr(args, kind) for kind in KIND_ORDER}
+        if not any(files.values()):
+            parser.error("nothing to import")
+        run(conn, files, args.chunk, not args.no_defer_indexes, args.restart)
+    conn.close()
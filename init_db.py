@@ -1,71 +1,32 @@
 # init_db.py
-import sqlite3
-
-DB_PATH = "carelink.db"
-
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
-
-# patients table
-cur.execute("""
-CREATE TABLE IF NOT EXISTS patients (
-    patient_id TEXT PRIMARY KEY,
-    name TEXT,
-    consent INTEGER DEFAULT 0,
-    conditions TEXT,          -- "HTN,DM" 이런 식으로 저장
-    last_med_review DATETIME, -- 마지막 medication review 일시
-    care_plan TEXT            -- 약사가 남기는 care plan 메모
-);
-""")
-
-
-# blood pressure readings
-cur.execute("""
-CREATE TABLE IF NOT EXISTS bp_readings (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    patient_id TEXT,
-    systolic INTEGER,
-    diastolic INTEGER,
-    heart_rate INTEGER,
-    timestamp DATETIME
-);
-""")
-
-# medications (simple MVP version)
-cur.execute("""
-CREATE TABLE IF NOT EXISTS medications (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    patient_id TEXT,
-    name TEXT,
-    dose TEXT,
-    frequency TEXT
-);
-""")
-
-# symptom logs
-cur.execute("""
-CREATE TABLE IF NOT EXISTS symptom_logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    patient_id TEXT,
-    note TEXT,
-    timestamp DATETIME
-);
-""")
-
-# access logs
-cur.execute("""
-CREATE TABLE IF NOT EXISTS access_logs (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    patient_id TEXT,
-    actor TEXT,     -- 예: 'pharm01'
-    role TEXT,      -- 예: 'pharmacist'
-    timestamp DATETIME
-);
-""")
-
-
+# Brings carelink.db up to the latest schema (see migrations.py) and seeds the
+# demo patient. Safe to re-run after pulling new migrations.
+#
+# Data derived from data/*.csv through the live modules is filled in here, not
+# by the migrations, for the columns / tables added since the last run.
+import db
+import drugs
+import interactions
+from migrations import current_version, migrate
+
+# (migration that added it, name, fn(conn)); each also has its own CLI
+# (python drugs.py backfill, python interactions.py sweep)
+BACKFILLS = [
+    (15, "medications.drug_id", drugs.backfill),
+    (16, "patient_interactions", interactions.sweep),
+]
+
+conn = db.connect()
+start = current_version(conn)
+version = migrate(conn, verbose=True)
+for number, name, fill in BACKFILLS:
+    if start < number <= version:
+        fill(conn)
+        conn.commit()
+        print(f"backfill {number:03d}: {name}")
 
 # demo patient
+cur = conn.cursor()
 cur.execute("SELECT * FROM patients WHERE patient_id = 'P001'")
 if not cur.fetchone():
     cur.execute("""
@@ -75,4 +36,4 @@ if not cur.fetchone():
 
 conn.commit()
 conn.close()
-print("DB initialized.")
+print(f"DB initialized (schema version {version}).")
@@ -0,0 +1,189 @@
+# interactions.py
+# Drug-drug interaction checks over a patient's medication list.
+#
+# data/interactions.csv rows name two lists of drug_ids (drugs.py) plus a
+# severity and a note; loading expands them into one dict keyed by the sorted
+# (drug_id, drug_id) pair, so checking k medications is k*(k-1)/2 dict
+# lookups. Results are cached by the patient's set of drug_ids: a medication
+# list only changes when a drug is added, and patients on the same regimen
+# share an entry.
+#
+# patient_interactions materializes the pairs for every patient (sweep()),
+# refreshed per patient by the medication write routes, for the pharmacist
+# dashboard's interaction filter / badge.
+#
+#   python interactions.py sweep
+#   python interactions.py check warfarin ibuprofen lisinopril
+import argparse
+import csv
+import os
+import threading
+from collections import Counter
+from itertools import combinations, groupby
+
+import cache
+import db
+import drugs
+
+INTERACTIONS_PATH = os.environ.get(
+    "CARELINK_INTERACTIONS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "interactions.csv"))
+
+SEVERITIES = {"minor": 0, "moderate": 1, "major": 2, "contraindicated": 3}
+LABELS = {level: name for name, level in SEVERITIES.items()}
+# dashboard "high-risk": major or contraindicated
+HIGH_RISK = SEVERITIES["major"]
+MAX_CACHED = 4096
+
+INSERT_SQL = """
+    INSERT INTO patient_interactions (patient_id, drug_a, drug_b, severity) VALUES (?, ?, ?, ?)
+"""
+
+
+class InteractionTable:
+    def __init__(self, rows, index=None):
+        """rows: dicts with drugs_a / drugs_b ("a|b"), severity, description.
+
+        Every drug_id must be in the drug dictionary (ValueError naming the row
+        otherwise). A pair listed twice keeps its highest severity.
+        """
+        index = index or drugs.get_index()
+        self._pairs = {}
+        for line, row in enumerate(rows, 2):
+            severity = SEVERITIES.get((row["severity"] or "").strip().lower())
+            if severity is None:
+                raise ValueError(f"interactions line {line}: unknown severity {row['severity']!r}")
+            side_a = [d.strip() for d in row["drugs_a"].split("|") if d.strip()]
+            side_b = [d.strip() for d in row["drugs_b"].split("|") if d.strip()]
+            unknown = [d for d in side_a + side_b if index.get(d) is None]
+            if unknown:
+                raise ValueError(f"interactions line {line}: unknown drug_id(s) {', '.join(unknown)}")
+            note = (row.get("description") or "").strip()
+            for a in side_a:
+                for b in side_b:
+                    if a == b:
+                        continue
+                    key = (a, b) if a < b else (b, a)
+                    if key not in self._pairs or self._pairs[key][0] < severity:
+                        self._pairs[key] = (severity, note)
+        self._names = {e["drug_id"]: e["name"] for e in index.entries}
+        self._results = cache.ResponseCache(MAX_CACHED)
+
+    @classmethod
+    def from_csv(cls, path=INTERACTIONS_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls(csv.DictReader(f))
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def pairs(self, drug_ids):
+        """[(drug_a, drug_b, severity)] for a set of drug_ids, worst first."""
+        ids = sorted(set(d for d in drug_ids if d))
+        found = []
+        for key in combinations(ids, 2):
+            hit = self._pairs.get(key)
+            if hit is not None:
+                found.append((key[0], key[1], hit[0]))
+        found.sort(key=lambda p: (-p[2], p[0], p[1]))
+        return found
+
+    def check(self, drug_ids):
+        """Interactions among `drug_ids`, worst first; cached per distinct set of ids.
+
+        Each is {"drug_ids", "names", "severity", "level", "description"};
+        the returned list is shared between callers, do not modify it.
+        """
+        key = tuple(sorted(set(d for d in drug_ids if d)))
+        if len(key) < 2:
+            return []
+        result = self._results.get(key)
+        if result is None:
+            result = [{
+                "drug_ids": [a, b],
+                "names": [self._names[a], self._names[b]],
+                "severity": LABELS[level],
+                "level": level,
+                "description": self._pairs[(a, b)][1],
+            } for a, b, level in self.pairs(key)]
+            self._results.put(key, result)
+        return result
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_table():
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = InteractionTable.from_csv()
+    return _table
+
+
+def for_medications(meds):
+    """Interactions in a loaded medication list (snapshot rows with drug_id)."""
+    return get_table().check(m["drug_id"] for m in meds)
+
+
+def refresh(conn, patient_ids=None):
+    """Recompute patient_interactions for `patient_ids` (default: every patient). Caller commits."""
+    table = get_table()
+    if patient_ids is None:
+        return sweep(conn, table)
+    patient_ids = list(patient_ids)
+    marks = ", ".join("?" * len(patient_ids))
+    conn.execute(f"DELETE FROM patient_interactions WHERE patient_id IN ({marks})", patient_ids)
+    rows = conn.execute(f"""
+        SELECT patient_id, drug_id FROM medications
+        WHERE patient_id IN ({marks}) AND drug_id IS NOT NULL
+        ORDER BY patient_id
+    """, patient_ids)
+    return _store(conn, table, rows)
+
+
+def sweep(conn, table=None):
+    """Whole-panel batch: rebuild patient_interactions in one pass over medications."""
+    table = table or get_table()
+    conn.execute("DELETE FROM patient_interactions")
+    rows = conn.execute("""
+        SELECT patient_id, drug_id FROM medications
+        WHERE drug_id IS NOT NULL
+        ORDER BY patient_id
+    """)
+    return _store(conn, table, rows)
+
+
+def _store(conn, table, rows):
+    found = []
+    for patient_id, group in groupby(rows, key=lambda r: r[0]):
+        found.extend((patient_id, a, b, level) for a, b, level in table.pairs(r[1] for r in group))
+    conn.executemany(INSERT_SQL, found)
+    return len(found)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drug-drug interaction checks")
+    parser.add_argument("command", choices=["sweep", "check"])
+    parser.add_argument("drug_ids", nargs="*", help="check: drug_ids or names")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        ids = []
+        for text in args.drug_ids:
+            found = drugs.get_index().get(text) or drugs.get_index().match(text)
+            ids.append(found["drug_id"] if found else None)
+        for hit in get_table().check(ids):
+            print(f"{hit['severity']:<16} {' + '.join(hit['names']):<40} {hit['description']}")
+    else:
+        conn = db.connect()
+        print(f"{sweep(conn)} interacting pairs.")
+        conn.commit()
+        counts = Counter(r[0] for r in conn.execute("""
+            SELECT MAX(severity) FROM patient_interactions GROUP BY patient_id
+        """))
+        for level in sorted(counts, reverse=True):
+            print(f"  {LABELS[level]:<16} {counts[level]} patients")
+        conn.close()
@@ -0,0 +1,93 @@
+# label_parser.py
+# Turns OCR'd prescription label text into medication suggestions.
+# Patterns are compiled once at import; parse_labels() handles many labels
+# per call (bulk imports, benchmarks) without per-label setup.
+import re
+
+# Line classifiers run on line.lower(): case-sensitive matching of a lowered
+# line is about twice as fast as re.IGNORECASE.
+# 약 줄 후보 (mg / tab / cap 등 포함한 줄)
+MED_PATTERN = re.compile(r'\b(?:m(?:cg|g|l)|g|tab(?:let|l)?|caps?(?:ule)?)\b')
+# 복용 지시 줄 후보 (TAKE, BY MOUTH, ONCE DAILY 등)
+FREQ_PATTERN = re.compile(r'\b(?:take|once daily|twice daily|every \d+ hours?|by mouth)\b')
+# 용량 (숫자 + 단위): "500 MG", "0.5mg", "10 units"
+DOSE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(mg|mcg|g|ml|units?)\b', re.IGNORECASE)
+
+
+def split_lines(text):
+    return [line.strip() for line in text.split("\n") if line.strip()]
+
+
+def parse_med_line(raw):
+    """"120 METFORMIN HCL 500 MG TABL" -> ("METFORMIN HCL", "500 MG")."""
+    m = DOSE_PATTERN.search(raw)
+    if not m:
+        # 용량 패턴이 없으면 그냥 전체 줄을 이름으로
+        return raw.strip(), None
+
+    dose = m.group(0).strip()
+    # 맨 앞 수량(120 같은 숫자) 제거
+    parts = raw[:m.start()].split()
+    if parts and parts[0].isdigit():
+        parts = parts[1:]
+    return " ".join(parts) or raw.strip(), dose
+
+
+def parse_label(lines, drugs=None):
+    """Parse one label (list of lines or raw text) into candidates and medications.
+
+    Every medication-looking line that is not itself a directions line ("TAKE 1
+    TABLET ...") becomes an entry; its frequency is the first directions line
+    after it and before the next medication, falling back to the first
+    directions line on the label. "suggested" is the first medication.
+
+    With a drugs.DrugIndex each entry also gets "drug_id" (None if the line
+    matched nothing close enough); a confident match replaces the OCR'd name
+    and dose with the dictionary's name and strength.
+    """
+    if isinstance(lines, str):
+        lines = split_lines(lines)
+
+    med_search = MED_PATTERN.search
+    freq_search = FREQ_PATTERN.search
+    candidates = []
+    drug_idx = []
+    freq_idx = []
+    for i, line in enumerate(lines):
+        lowered = line.lower()
+        is_freq = freq_search(lowered) is not None
+        if is_freq:
+            freq_idx.append(i)
+        if med_search(lowered):
+            candidates.append(line)
+            if not is_freq:
+                drug_idx.append(i)
+    if not drug_idx and candidates:
+        # only directions-style lines: keep the old first-candidate behaviour
+        drug_idx = [lines.index(candidates[0])]
+
+    default_freq = lines[freq_idx[0]] if freq_idx else None
+    medications = []
+    for n, i in enumerate(drug_idx):
+        stop = drug_idx[n + 1] if n + 1 < len(drug_idx) else len(lines)
+        freq = next((lines[j] for j in freq_idx if i < j < stop), None)
+        name, dose = parse_med_line(lines[i])
+        med = {"name": name, "dose": dose, "frequency": freq or default_freq}
+        if drugs is not None:
+            name, strength, med["drug_id"] = drugs.resolve(lines[i])
+            if med["drug_id"]:
+                med["name"], med["dose"] = name, strength or dose
+        medications.append(med)
+
+    first = medications[0] if medications else {"name": None, "dose": None, "frequency": default_freq}
+    return {
+        "lines": lines,                 # 원본 전체
+        "med_candidates": candidates,   # 약처럼 보이는 줄만
+        "medications": medications,
+        "suggested": dict(first),
+    }
+
+
+def parse_labels(texts, drugs=None):
+    """Batch form of parse_label() for many OCR'd labels."""
+    return [parse_label(t, drugs) for t in texts]
@@ -0,0 +1,293 @@
+# metrics.py
+# Request / SQL instrumentation, off unless CARELINK_METRICS=1.
+#
+# When enabled:
+#   - every route's latency goes into a histogram per (method, route, status)
+#   - connections from db.connect() are ProfiledConnection: each statement's
+#     time (execute + fetching) and row count go into a histogram per
+#     normalized SQL text
+#   - statements slower than CARELINK_SLOW_QUERY_MS are logged to the
+#     "carelink.sql" logger together with their EXPLAIN QUERY PLAN
+#   - GET /metrics serves everything in the Prometheus text format, to a
+#     logged-in pharmacist session or a scraper sending
+#     "Authorization: Bearer $CARELINK_METRICS_TOKEN"; anyone else gets 401
+#     (route and query timings of a PHI application are not public)
+# When disabled nothing is wrapped or registered, so the hot path is the plain
+# sqlite3 connection and no request hooks run.
+#
+# Metrics are per process; with several workers scrape (or sum) each one.
+import hmac
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+ENABLED = os.environ.get("CARELINK_METRICS", "0") == "1"
+SLOW_QUERY_MS = float(os.environ.get("CARELINK_SLOW_QUERY_MS", "100"))
+# unset: /metrics is only served to a logged-in pharmacist session
+METRICS_TOKEN = os.environ.get("CARELINK_METRICS_TOKEN")
+
+# seconds; Prometheus' default buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+MAX_SQL_LABEL = 200
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+log = logging.getLogger("carelink.sql")
+
+
+class Histogram:
+    """Cumulative-bucket histogram family keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}   # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.snapshot().items()):
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-2]}')
+            lines.append(f"{self.name}_count{{{base}}} {series[-2]}")
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{{{_labels(self.label_names, k)}}} {v}" for k, v in items)
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+requests = Histogram("carelink_request_duration_seconds",
+                     "Time to produce the response (headers, for streamed bodies)",
+                     ("method", "route", "status"))
+queries = Histogram("carelink_sql_duration_seconds",
+                    "SQLite statement time, execute plus fetching its rows",
+                    ("query",), SQL_BUCKETS)
+query_rows = Counter("carelink_sql_rows_total", "Rows returned (SELECT) or changed (DML)", ("query",))
+slow_queries = Counter("carelink_sql_slow_total", "Statements slower than CARELINK_SLOW_QUERY_MS", ("query",))
+
+_normalized = {}
+
+
+def normalize(sql):
+    """Collapse whitespace and cap the length: one label per statement text."""
+    label = _normalized.get(sql)
+    if label is None:
+        label = re.sub(r"\s+", " ", sql).strip()[:MAX_SQL_LABEL]
+        if len(_normalized) < 10_000:
+            _normalized[sql] = label
+    return label
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Times a statement from execute() until its rows are consumed (or the next execute)."""
+
+    _sql = None
+
+    def _start(self, sql, params):
+        self._finish()
+        self._sql, self._params = sql, params
+        self._rows = 0
+        self._elapsed = 0.0
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, self._sql = self._sql, None
+        rows = self._rows if self.rowcount < 0 else self.rowcount
+        label = normalize(sql)
+        queries.observe((label,), self._elapsed)
+        if rows:
+            query_rows.inc((label,), rows)
+        if self._elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_queries.inc((label,))
+            _log_slow(self.connection, sql, self._params, self._elapsed, rows)
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self._elapsed += time.perf_counter() - t0
+            if self.description is None:
+                self._finish()   # DML / DDL: done once executed
+
+    def executemany(self, sql, seq):
+        self._start(sql, None)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq)
+        finally:
+            self._elapsed += time.perf_counter() - t0
+            self._finish()
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - t0
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._elapsed += time.perf_counter() - t0
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - t0
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - t0
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - t0
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # fetchone() of a single row never sees the end of the result
+        self._finish()
+
+
+class ProfiledConnection(sqlite3.Connection):
+    # Connection.execute() makes its cursor in C, bypassing cursor(); route it here
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+
+def _log_slow(conn, sql, params, elapsed, rows):
+    plan = ""
+    if params is not None and sql.lstrip().upper().startswith(EXPLAINABLE):
+        try:
+            # a plain cursor: the plan query itself is not profiled
+            cur = sqlite3.Cursor(conn)
+            plan = "\n".join(f"  {r[3]}" for r in cur.execute("EXPLAIN QUERY PLAN " + sql, params))
+        except sqlite3.Error as e:
+            plan = f"  (no plan: {e})"
+    log.warning("slow query %.1f ms, %d rows: %s\n%s", elapsed * 1000, rows, normalize(sql), plan)
+
+
+def init_app(app):
+    """Per-route latency + GET /metrics; does nothing unless CARELINK_METRICS=1."""
+    if not ENABLED:
+        return
+    from flask import Response, g, request, session
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_t0 = time.perf_counter()
+
+    @app.after_request
+    def _observe(response):
+        t0 = g.pop("metrics_t0", None)
+        if t0 is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            requests.observe((request.method, route, str(response.status_code)),
+                             time.perf_counter() - t0)
+        return response
+
+    @app.route("/metrics")
+    def _metrics():
+        if not (session.get("pharm_logged_in") or _token_ok(request.headers.get("Authorization"))):
+            return Response("Unauthorized\n", status=401, mimetype="text/plain",
+                            headers={"WWW-Authenticate": "Bearer"})
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def _token_ok(header):
+    if not METRICS_TOKEN or not header:
+        return False
+    return hmac.compare_digest(header.encode(), f"Bearer {METRICS_TOKEN}".encode())
+
+
+def render():
+    import cache
+    lines = []
+    for family in (requests, queries, query_rows, slow_queries):
+        lines.extend(family.render())
+    lines += [
+        "# HELP carelink_response_cache_hits_total Response cache hits (cache.py)",
+        "# TYPE carelink_response_cache_hits_total counter",
+        f"carelink_response_cache_hits_total {cache.responses.hits}",
+        "# HELP carelink_response_cache_misses_total Response cache misses (cache.py)",
+        "# TYPE carelink_response_cache_misses_total counter",
+        f"carelink_response_cache_misses_total {cache.responses.misses}",
+    ]
+    return "\n".join(lines) + "\n"
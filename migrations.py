@@ -0,0 +1,597 @@
+# migrations.py
+# Versioned schema migrations. The applied version lives in PRAGMA user_version;
+# each entry runs once, in order, inside its own transaction.
+#
+# A step must do the same thing in every release, so steps carry their own
+# (frozen) SQL and paths and import no application module: the live modules
+# follow the current schema. Data derived from the shipped dictionaries
+# (data/*.csv) through application code is not a migration; init_db.py fills
+# it in once the schema is current.
+import hashlib
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+import db
+
+
+def _baseline(conn):
+    # patients table
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS patients (
+        patient_id TEXT PRIMARY KEY,
+        name TEXT,
+        consent INTEGER DEFAULT 0,
+        conditions TEXT,          -- "HTN,DM" 이런 식으로 저장
+        last_med_review DATETIME, -- 마지막 medication review 일시
+        care_plan TEXT            -- 약사가 남기는 care plan 메모
+    )
+    """)
+
+    # blood pressure readings
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS bp_readings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT,
+        systolic INTEGER,
+        diastolic INTEGER,
+        heart_rate INTEGER,
+        timestamp DATETIME
+    )
+    """)
+
+    # medications (simple MVP version)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS medications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT,
+        name TEXT,
+        dose TEXT,
+        frequency TEXT
+    )
+    """)
+
+    # symptom logs
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS symptom_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT,
+        note TEXT,
+        timestamp DATETIME
+    )
+    """)
+
+    # access logs
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS access_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT,
+        actor TEXT,     -- 예: 'pharm01'
+        role TEXT,      -- 예: 'pharmacist'
+        timestamp DATETIME
+    )
+    """)
+
+
+def _patient_timestamp_indexes(conn):
+    # every dashboard query is WHERE patient_id = ? ORDER BY timestamp DESC LIMIT n
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bp_readings_patient_ts ON bp_readings (patient_id, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_symptom_logs_patient_ts ON symptom_logs (patient_id, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_patient_ts ON access_logs (patient_id, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medications_patient ON medications (patient_id)")
+
+
+def _bp_aggregates(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS bp_stats (
+        patient_id TEXT PRIMARY KEY,
+        reading_count INTEGER NOT NULL DEFAULT 0,
+        sum_systolic INTEGER NOT NULL DEFAULT 0,
+        sum_diastolic INTEGER NOT NULL DEFAULT 0,
+        first_timestamp DATETIME,
+        last_timestamp DATETIME
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS bp_daily (
+        patient_id TEXT NOT NULL,
+        day TEXT NOT NULL,        -- 'YYYY-MM-DD'
+        reading_count INTEGER NOT NULL DEFAULT 0,
+        sum_systolic INTEGER NOT NULL DEFAULT 0,
+        sum_diastolic INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (patient_id, day)
+    ) WITHOUT ROWID
+    """)
+    # bp_readings.timestamp is local-time text at this version
+    conn.execute("""
+    INSERT INTO bp_daily (patient_id, day, reading_count, sum_systolic, sum_diastolic)
+    SELECT patient_id, date(timestamp), COUNT(*), TOTAL(systolic), TOTAL(diastolic)
+    FROM bp_readings
+    WHERE date(timestamp) IS NOT NULL
+    GROUP BY patient_id, date(timestamp)
+    """)
+    conn.execute("""
+    INSERT INTO bp_stats (patient_id, reading_count, sum_systolic, sum_diastolic,
+                          first_timestamp, last_timestamp)
+    SELECT patient_id, COUNT(*), TOTAL(systolic), TOTAL(diastolic), MIN(timestamp), MAX(timestamp)
+    FROM bp_readings
+    GROUP BY patient_id
+    """)
+
+
+def _patient_risk(conn):
+    # materialized mtm.score_patients() for the pharmacist dashboard
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS patient_risk (
+        patient_id TEXT PRIMARY KEY,
+        med_count INTEGER NOT NULL DEFAULT 0,
+        avg_sys REAL,
+        mtm_score INTEGER NOT NULL DEFAULT 0,
+        mtm_level TEXT NOT NULL DEFAULT 'Low',
+        review_due INTEGER NOT NULL DEFAULT 0,
+        scored_on TEXT               -- 'YYYY-MM-DD'
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_risk_score ON patient_risk (mtm_score, patient_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_risk_level ON patient_risk (mtm_level)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_risk_scored_on ON patient_risk (scored_on)")
+    # dashboard keyset pagination by name
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (IFNULL(name, ''), patient_id)")
+    # rows are scored by mtm.ensure_fresh() (missing / earlier-day rows) on first use
+
+
+def _bp_client_keys(conn):
+    # idempotency key sent by home cuffs; resyncs of the same reading are ignored
+    conn.execute("ALTER TABLE bp_readings ADD COLUMN client_key TEXT")
+    conn.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_bp_readings_client_key
+    ON bp_readings (patient_id, client_key) WHERE client_key IS NOT NULL
+    """)
+
+
+def _access_log_event_ids(conn):
+    # audit.py writes access events in batches; event_id makes spool replays idempotent
+    conn.execute("ALTER TABLE access_logs ADD COLUMN event_id TEXT")
+    conn.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_access_logs_event_id
+    ON access_logs (event_id) WHERE event_id IS NOT NULL
+    """)
+
+
+def _archive_partitions(conn):
+    # catalog of monthly archive files written by archive.py
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS archive_partitions (
+        month TEXT PRIMARY KEY,   -- 'YYYY-MM'
+        path TEXT NOT NULL,       -- file name under the archive directory
+        start_ts TEXT NOT NULL,
+        end_ts TEXT NOT NULL,
+        bp_readings INTEGER NOT NULL DEFAULT 0,
+        access_logs INTEGER NOT NULL DEFAULT 0,
+        archived_at DATETIME
+    )
+    """)
+    # the archiver selects and deletes whole months by timestamp
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bp_readings_ts ON bp_readings (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_ts ON access_logs (timestamp)")
+
+
+def _patient_versions(conn):
+    # bumped by write routes (cache.touch_patient) and the audit writer; ETags are built from them
+    conn.execute("ALTER TABLE patients ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE patients ADD COLUMN access_version INTEGER NOT NULL DEFAULT 0")
+
+
+def _changes_log(conn):
+    # delta-sync log (changes.py); seq is the client's cursor
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT NOT NULL,
+        entity TEXT NOT NULL,     -- 'reading' / 'medication' / 'symptom' / 'access' / 'patient'
+        row_id INTEGER,           -- NULL for 'patient'
+        created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changes_patient_seq ON changes (patient_id, seq)")
+
+
+def _access_log_actions(conn):
+    # what the access was: 'view' (chart views) or 'export' (export.py downloads)
+    conn.execute("ALTER TABLE access_logs ADD COLUMN action TEXT NOT NULL DEFAULT 'view'")
+
+
+def _import_progress(conn):
+    # import_patients.py: how far each source file got (resume point), and the
+    # secondary indexes it dropped for the load and still has to rebuild
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS import_progress (
+        source TEXT PRIMARY KEY,  -- absolute path of the imported file
+        kind TEXT NOT NULL,       -- 'patients' / 'medications' / 'readings' / 'symptoms'
+        size INTEGER NOT NULL,    -- file size + mtime: a changed file is not resumed
+        mtime REAL NOT NULL,
+        position INTEGER NOT NULL DEFAULT 0,   -- records consumed (imported + rejected)
+        imported INTEGER NOT NULL DEFAULT 0,
+        rejected INTEGER NOT NULL DEFAULT 0,
+        started_at DATETIME,
+        finished_at DATETIME
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS import_deferred_indexes (
+        name TEXT PRIMARY KEY,
+        sql TEXT NOT NULL
+    )
+    """)
+
+
+# text -> epoch ms, as of migration 12: local time (Python datetime.now()
+# writers), and UTC for rows SQLite's datetime('now') wrote
+TEXT_TO_MS_SQL = "CAST(round((julianday({col}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+UTC_TEXT_TO_MS_SQL = "CAST(round((julianday({col}) - 2440587.5) * 86400000) AS INTEGER)"
+# datetime('now') text: exactly 'YYYY-MM-DD HH:MM:SS'. The Python writers
+# stored microseconds (datetime adapter) or a 'T' (isoformat()).
+SQLITE_NOW_GLOB = "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'"
+# bp_daily / bp_stats from epoch-ms readings, as of migration 12 (day = local calendar day)
+MS_DAILY_SQL = """
+    SELECT patient_id, date(timestamp / 1000, 'unixepoch', 'localtime') AS day,
+           COUNT(*), TOTAL(systolic), TOTAL(diastolic)
+    FROM bp_readings
+    WHERE timestamp IS NOT NULL
+    GROUP BY patient_id, day
+"""
+MS_STATS_SQL = """
+    SELECT patient_id, COUNT(*), TOTAL(systolic), TOTAL(diastolic), MIN(timestamp), MAX(timestamp)
+    FROM bp_readings
+    GROUP BY patient_id
+"""
+MS_UPSERT_DAILY_SQL = """
+    INSERT INTO bp_daily (patient_id, day, reading_count, sum_systolic, sum_diastolic)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (patient_id, day) DO UPDATE SET
+        reading_count = reading_count + excluded.reading_count,
+        sum_systolic = sum_systolic + excluded.sum_systolic,
+        sum_diastolic = sum_diastolic + excluded.sum_diastolic
+"""
+MS_UPSERT_STATS_SQL = """
+    INSERT INTO bp_stats (patient_id, reading_count, sum_systolic, sum_diastolic,
+                          first_timestamp, last_timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (patient_id) DO UPDATE SET
+        reading_count = reading_count + excluded.reading_count,
+        sum_systolic = sum_systolic + excluded.sum_systolic,
+        sum_diastolic = sum_diastolic + excluded.sum_diastolic,
+        first_timestamp = MIN(COALESCE(first_timestamp, excluded.first_timestamp), excluded.first_timestamp),
+        last_timestamp = MAX(COALESCE(last_timestamp, excluded.last_timestamp), excluded.last_timestamp)
+"""
+ARCHIVED_TABLES = ("bp_readings", "access_logs")
+
+
+def _local_ms(value):
+    # local-time text / naive datetime -> epoch ms (migration 12)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return round(value.timestamp() * 1000)
+
+
+def _archive_dir(conn):
+    # where archive.py kept the monthly files at migration 12
+    main = conn.execute("PRAGMA database_list").fetchone()["file"]
+    return os.environ.get("CARELINK_ARCHIVE_DIR") or main + ".archive"
+
+
+def _month_bounds_ms(month):
+    # "2025-03" -> epoch ms of local midnight on 2025-03-01 and on 2025-04-01
+    y, m = map(int, month.split("-"))
+    return _local_ms(datetime(y, m, 1)), _local_ms(datetime(y + (m == 12), m % 12 + 1, 1))
+
+
+# table -> columns converted from text to epoch ms by migration 12
+TIMESTAMP_COLUMNS = {
+    "bp_readings": ("timestamp",),
+    "symptom_logs": ("timestamp",),
+    "access_logs": ("timestamp",),
+    "patients": ("last_med_review",),
+    "changes": ("created_at",),
+    "import_progress": ("started_at", "finished_at"),
+}
+
+
+def _utc_rows(conn, table):
+    # rows written by the text-era routes that used datetime('now') (UTC):
+    #   bp_readings   api_add_bp (no client_key; batch / import rows always have one)
+    #   symptom_logs  api_add_symptom
+    # access logs, last_med_review etc. were always written from datetime.now()
+    if table == "symptom_logs":
+        return f"timestamp GLOB {SQLITE_NOW_GLOB}"
+    if table == "bp_readings":
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(bp_readings)")}
+        where = f"timestamp GLOB {SQLITE_NOW_GLOB}"
+        return f"client_key IS NULL AND {where}" if "client_key" in columns else where
+    return None
+
+
+def _convert_timestamps(conn, table, columns):
+    # indexes on the converted columns are dropped and rebuilt once, instead
+    # of being updated row by row
+    indexes = [(r["name"], r["sql"]) for r in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)) if any(c in r["sql"] for c in columns)]
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    utc = _utc_rows(conn, table)
+    for col in columns:
+        # unparseable text is left as it was rather than turned into NULL
+        if utc is not None:
+            conn.execute(f"""
+                UPDATE {table}
+                SET {col} = COALESCE({UTC_TEXT_TO_MS_SQL.format(col=col)}, {col})
+                WHERE typeof({col}) = 'text' AND {utc}
+            """)
+        conn.execute(f"""
+            UPDATE {table}
+            SET {col} = COALESCE({TEXT_TO_MS_SQL.format(col=col)}, {col})
+            WHERE typeof({col}) = 'text'
+        """)
+    for _, sql in indexes:
+        conn.execute(sql)
+
+
+def _epoch_ms_timestamps(conn):
+    # every timestamp becomes INTEGER epoch ms (timestamps.py); existing text is
+    # local time, except the datetime('now') rows of _utc_rows()
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        _convert_timestamps(conn, table, columns)
+
+    # changes.created_at: the column default is rebuilt as epoch ms too
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+    conn.execute(f"""
+    CREATE TABLE changes_new (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT NOT NULL,
+        entity TEXT NOT NULL,
+        row_id INTEGER,
+        created_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
+    )
+    """)
+    conn.execute("INSERT INTO changes_new SELECT seq, patient_id, entity, row_id, created_at FROM changes")
+    conn.execute("DROP TABLE changes")
+    conn.execute("ALTER TABLE changes_new RENAME TO changes")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changes_patient_seq ON changes (patient_id, seq)")
+    if seq is not None:
+        # keep the cursor sequence: seqs handed to clients are never reused
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'changes'")
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('changes', ?)", (seq["seq"],))
+
+    # archive catalog: integer bounds, and the archived months themselves
+    conn.execute("""
+    CREATE TABLE archive_partitions_new (
+        month TEXT PRIMARY KEY,   -- 'YYYY-MM'
+        path TEXT NOT NULL,       -- file name under the archive directory
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        bp_readings INTEGER NOT NULL DEFAULT 0,
+        access_logs INTEGER NOT NULL DEFAULT 0,
+        archived_at INTEGER
+    )
+    """)
+    parts = conn.execute("SELECT * FROM archive_partitions").fetchall()
+    conn.executemany("INSERT INTO archive_partitions_new VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        (p["month"], p["path"], *_month_bounds_ms(p["month"]), p["bp_readings"],
+         p["access_logs"], _local_ms(p["archived_at"]))
+        for p in parts])
+    conn.execute("DROP TABLE archive_partitions")
+    conn.execute("ALTER TABLE archive_partitions_new RENAME TO archive_partitions")
+    # bp_daily days / bp_stats bounds are recomputed from the integers, archived months included
+    conn.execute("DELETE FROM bp_daily")
+    conn.execute("DELETE FROM bp_stats")
+    conn.execute(f"INSERT INTO bp_daily (patient_id, day, reading_count, sum_systolic, sum_diastolic) {MS_DAILY_SQL}")
+    conn.execute(f"""
+        INSERT INTO bp_stats (patient_id, reading_count, sum_systolic, sum_diastolic,
+                              first_timestamp, last_timestamp) {MS_STATS_SQL}
+    """)
+    for p in parts:
+        full = os.path.join(_archive_dir(conn), p["path"])
+        if not os.path.exists(full):
+            continue
+        arc = sqlite3.connect(full)
+        arc.row_factory = sqlite3.Row
+        try:
+            with arc:
+                for table in ARCHIVED_TABLES:
+                    _convert_timestamps(arc, table, ("timestamp",))
+            arc.execute("VACUUM")
+            conn.executemany(MS_UPSERT_DAILY_SQL, arc.execute(MS_DAILY_SQL).fetchall())
+            conn.executemany(MS_UPSERT_STATS_SQL, arc.execute(MS_STATS_SQL).fetchall())
+        finally:
+            arc.close()
+
+    # the MTM "days since" rules were scored from text: re-scored by mtm.ensure_fresh()
+    conn.execute("DELETE FROM patient_risk")
+
+
+_CONDITION_CODE = re.compile(r"[A-Z][A-Z0-9_]{0,15}")
+
+
+def _condition_catalog(conn):
+    # conditions.py: catalog + per-patient bitmask + (patient_id, code) junction
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS conditions (
+        code TEXT PRIMARY KEY,        -- 'HTN'
+        bit INTEGER NOT NULL UNIQUE,  -- bit number in patients.condition_mask (0-62)
+        label TEXT                    -- 'Hypertension'
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS patient_conditions (
+        patient_id TEXT NOT NULL,
+        code TEXT NOT NULL,
+        PRIMARY KEY (patient_id, code)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_conditions_code ON patient_conditions (code, patient_id)")
+    conn.execute("ALTER TABLE patients ADD COLUMN condition_mask INTEGER NOT NULL DEFAULT 0")
+    # cohort counts: bitwise test over this covering index, not the patients table
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_condition_mask ON patients (condition_mask, patient_id)")
+    conn.executemany("INSERT OR IGNORE INTO conditions (code, bit, label) VALUES (?, ?, ?)",
+                     [("HTN", 0, "Hypertension"), ("DM", 1, "Diabetes"), ("DLD", 2, "Dyslipidemia")])
+    # mask + junction from the "HTN,DM" text; other well-formed codes take the next
+    # free bits (0-62), anything else stays in the text column only
+    bits = {r["code"]: r["bit"] for r in conn.execute("SELECT code, bit FROM conditions")}
+    links, masks = [], []
+    rows = conn.execute("SELECT patient_id, conditions FROM patients WHERE conditions IS NOT NULL").fetchall()
+    for r in rows:
+        mask = 0
+        for code in dict.fromkeys(c.strip().upper() for c in r["conditions"].split(",")):
+            if code not in bits:
+                if not _CONDITION_CODE.fullmatch(code) or len(bits) >= 63:
+                    continue
+                bits[code] = max(bits.values(), default=-1) + 1
+                conn.execute("INSERT INTO conditions (code, bit) VALUES (?, ?)", (code, bits[code]))
+            mask |= 1 << bits[code]
+            links.append((r["patient_id"], code))
+        if mask:
+            masks.append((mask, r["patient_id"]))
+    conn.executemany("INSERT OR IGNORE INTO patient_conditions (patient_id, code) VALUES (?, ?)", links)
+    conn.executemany("UPDATE patients SET condition_mask = ? WHERE patient_id = ?", masks)
+
+
+def _search_index(conn):
+    # search.py: FTS5 over symptom notes (rowid = symptom_logs.id) and care plans (rowid < 0)
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        body,
+        patient_id UNINDEXED,
+        timestamp UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """)
+    conn.execute("""
+    INSERT INTO search_index (rowid, body, patient_id, timestamp)
+    SELECT id, note, patient_id, timestamp FROM symptom_logs
+    WHERE note IS NOT NULL AND note != ''
+    """)
+    # care plans: rowid = -(56-bit blake2b of patient_id + 1), search.care_plan_rowid()
+    plans = conn.execute(
+        "SELECT patient_id, care_plan FROM patients WHERE care_plan IS NOT NULL AND care_plan != ''")
+    conn.executemany(
+        "INSERT INTO search_index (rowid, body, patient_id, timestamp) VALUES (?, ?, ?, NULL)",
+        [(-(int.from_bytes(hashlib.blake2b(pid.encode(), digest_size=7).digest(), "big") + 1), plan, pid)
+         for pid, plan in plans])
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+def _medication_drug_ids(conn):
+    # drugs.py: canonical drug_id from the local dictionary next to the free-text name
+    conn.execute("ALTER TABLE medications ADD COLUMN drug_id TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medications_drug ON medications (drug_id, patient_id)")
+    # filled in by init_db.py (drugs.backfill)
+
+
+def _patient_interactions(conn):
+    # interactions.py: interacting drug_id pairs per patient, for the dashboard filter
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS patient_interactions (
+        patient_id TEXT NOT NULL,
+        drug_a TEXT NOT NULL,         -- drug_a < drug_b
+        drug_b TEXT NOT NULL,
+        severity INTEGER NOT NULL,    -- 0 minor .. 3 contraindicated (interactions.SEVERITIES)
+        PRIMARY KEY (patient_id, drug_a, drug_b)
+    ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_interactions_severity "
+                 "ON patient_interactions (severity, patient_id)")
+    # filled in by init_db.py (interactions.sweep)
+
+
+def _auto_key_v17(ms, systolic, diastolic, heart_rate):
+    # bp_ingest.auto_key as of migration 17
+    raw = f"{ms}|{systolic}|{diastolic}|{heart_rate}"
+    return "auto:" + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _client_key_ledger(conn):
+    # every (patient_id, client_key) ever stored, in a table archive.py does not
+    # move, so a resync of an archived reading is still ignored
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS bp_client_keys (
+        patient_id TEXT NOT NULL,
+        client_key TEXT NOT NULL,
+        PRIMARY KEY (patient_id, client_key)
+    ) WITHOUT ROWID
+    """)
+    keys_sql = """
+        SELECT patient_id, systolic, diastolic, heart_rate, timestamp, client_key
+        FROM bp_readings WHERE client_key IS NOT NULL
+    """
+    sources = [conn]
+    for part in conn.execute("SELECT path FROM archive_partitions ORDER BY month").fetchall():
+        full = os.path.join(_archive_dir(conn), part["path"])
+        if os.path.exists(full):
+            sources.append(sqlite3.connect(f"file:{full}?mode=ro", uri=True))
+    try:
+        for src in sources:
+            # auto keys were a hash of the local wall-clock text; re-keyed from
+            # the stored epoch ms, as bp_ingest now derives them
+            conn.executemany("INSERT OR IGNORE INTO bp_client_keys (patient_id, client_key) VALUES (?, ?)", [
+                (pid, _auto_key_v17(ts, sys_, dia, hr) if key.startswith("auto:") else key)
+                for pid, sys_, dia, hr, ts, key in src.execute(keys_sql)])
+    finally:
+        for src in sources[1:]:
+            src.close()
+
+
+MIGRATIONS = [
+    (1, "baseline tables", _baseline),
+    (2, "patient_id/timestamp indexes", _patient_timestamp_indexes),
+    (3, "bp_stats / bp_daily aggregates", _bp_aggregates),
+    (4, "patient_risk + dashboard indexes", _patient_risk),
+    (5, "bp_readings.client_key", _bp_client_keys),
+    (6, "access_logs.event_id", _access_log_event_ids),
+    (7, "archive_partitions + timestamp indexes", _archive_partitions),
+    (8, "patients.data_version / access_version", _patient_versions),
+    (9, "changes (delta sync)", _changes_log),
+    (10, "access_logs.action", _access_log_actions),
+    (11, "import_progress", _import_progress),
+    (12, "epoch-ms timestamps", _epoch_ms_timestamps),
+    (13, "condition catalog / bitmask", _condition_catalog),
+    (14, "search_index (FTS5)", _search_index),
+    (15, "medications.drug_id", _medication_drug_ids),
+    (16, "patient_interactions", _patient_interactions),
+    (17, "bp_client_keys (idempotency across archiving)", _client_key_ledger),
+]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=None, verbose=False):
+    """Apply pending migrations up to `target` (default: latest). Returns the new version."""
+    version = current_version(conn)
+    for number, name, step in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+        if verbose:
+            print(f"migration {number:03d}: {name}")
+    return version
+
+
+if __name__ == "__main__":
+    conn = db.connect()
+    print("schema version:", migrate(conn, verbose=True))
+    conn.close()
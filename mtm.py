@@ -0,0 +1,151 @@
+# mtm.py
+# MTM risk score, BP control status and medication-review flag.
+#
+# Scoring happens in one SQL pass over patients + bp_stats + medication counts,
+# so the same code scores a single patient (pharmacist view) or the whole
+# panel (worklists, dashboard) and the two can never disagree.
+#
+#   score  +2  >= 5 medications
+#          +2  mean systolic > 140
+#          +1  last BP reading >= 90 days ago
+#   level  High >= 4, Moderate >= 2, else Low
+#   review due: >= 5 medications and no review, or last review >= 180 days ago
+#
+# patient_risk holds the same scores materialized for panel queries (dashboard
+# filters / sorting). Write routes refresh their patient; rows scored on an
+# earlier day are re-scored lazily by ensure_fresh(), since the "days since"
+# rules move with the calendar.
+import argparse
+import json
+from collections import Counter
+from datetime import datetime
+
+import db
+import timestamps
+
+# timestamps are epoch ms (timestamps.py); 86400000 ms = 1 day
+SCORE_SQL = """
+    SELECT patient_id, med_count, avg_sys, last_bp, mtm_score,
+           CASE WHEN mtm_score >= 4 THEN 'High'
+                WHEN mtm_score >= 2 THEN 'Moderate'
+                ELSE 'Low' END AS mtm_level,
+           review_due
+    FROM (
+        SELECT patient_id, med_count, avg_sys, last_bp,
+               (CASE WHEN med_count >= 5 THEN 2 ELSE 0 END)
+             + (CASE WHEN avg_sys > 140 THEN 2 ELSE 0 END)
+             + (CASE WHEN :now - last_bp >= 90 * 86400000 THEN 1 ELSE 0 END) AS mtm_score,
+               (med_count >= 5 AND (last_med_review IS NULL
+                                    OR :now - last_med_review >= 180 * 86400000)) AS review_due
+        FROM (
+            SELECT p.patient_id,
+                   p.last_med_review,
+                   (SELECT COUNT(*) FROM medications m WHERE m.patient_id = p.patient_id) AS med_count,
+                   s.sum_systolic * 1.0 / NULLIF(s.reading_count, 0) AS avg_sys,
+                   s.last_timestamp AS last_bp
+            FROM patients p
+            LEFT JOIN bp_stats s ON s.patient_id = p.patient_id
+            {where}
+        )
+    )
+"""
+
+
+REFRESH_SQL = """
+    INSERT OR REPLACE INTO patient_risk
+        (patient_id, med_count, avg_sys, mtm_score, mtm_level, review_due, scored_on)
+    SELECT patient_id, med_count, avg_sys, mtm_score, mtm_level, review_due, :today
+    FROM ({score_sql})
+"""
+
+
+def bp_status(avg_sys):
+    # BP control status -> (label, bootstrap alert class)
+    if not avg_sys:
+        return None, None
+    if avg_sys < 130:
+        return "At goal (<130 mmHg)", "success"
+    if avg_sys <= 140:
+        return "Borderline control (130–140 mmHg)", "warning"
+    return "Above target (>140 mmHg)", "danger"
+
+
+def _row_to_score(row):
+    status, status_class = bp_status(row["avg_sys"])
+    return {
+        "patient_id": row["patient_id"],
+        "med_count": row["med_count"],
+        "avg_sys": row["avg_sys"],
+        "mtm_score": row["mtm_score"],
+        "mtm_level": row["mtm_level"],
+        "bp_status": status,
+        "bp_status_class": status_class,
+        "review_due": bool(row["review_due"]),
+    }
+
+
+def score_patients(conn, patient_ids=None, now=None):
+    """Score every patient (or just `patient_ids`) in one query."""
+    params = {"now": timestamps.encode(now or datetime.now())}
+    where = ""
+    if patient_ids is not None:
+        patient_ids = list(patient_ids)
+        if not patient_ids:
+            return []
+        where = "WHERE p.patient_id IN (SELECT value FROM json_each(:ids))"
+        params["ids"] = json.dumps(patient_ids)
+    rows = conn.execute(SCORE_SQL.format(where=where), params)
+    return [_row_to_score(r) for r in rows]
+
+
+def score_patient(conn, patient_id, now=None):
+    params = {"now": timestamps.encode(now or datetime.now()), "pid": patient_id}
+    row = conn.execute(SCORE_SQL.format(where="WHERE p.patient_id = :pid"), params).fetchone()
+    return _row_to_score(row) if row else None
+
+
+def refresh(conn, patient_ids=None, now=None):
+    """Re-score `patient_ids` (default: every patient) into patient_risk. Caller commits."""
+    now = now or datetime.now()
+    params = {"now": timestamps.encode(now), "today": now.date().isoformat()}
+    where = ""
+    if patient_ids is not None:
+        where = "WHERE p.patient_id IN (SELECT value FROM json_each(:ids))"
+        params["ids"] = json.dumps(list(patient_ids))
+    conn.execute(REFRESH_SQL.format(score_sql=SCORE_SQL.format(where=where)), params)
+
+
+def ensure_fresh(conn, now=None):
+    """Re-score patients whose patient_risk row is missing or from an earlier day."""
+    now = now or datetime.now()
+    today = now.date().isoformat()
+    stale = conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM patient_risk WHERE scored_on < ?)", (today,)).fetchone()[0]
+    if not stale:
+        counts = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM patients), (SELECT COUNT(*) FROM patient_risk)").fetchone()
+        stale = counts[0] != counts[1]
+    if stale:
+        params = {"now": timestamps.encode(now), "today": today}
+        where = "WHERE p.patient_id NOT IN (SELECT patient_id FROM patient_risk WHERE scored_on = :today)"
+        conn.execute(REFRESH_SQL.format(score_sql=SCORE_SQL.format(where=where)), params)
+        conn.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the whole patient panel")
+    parser.add_argument("--list", choices=["High", "Moderate", "Low"],
+                        help="print patient ids at this MTM level")
+    args = parser.parse_args()
+
+    conn = db.connect()
+    scores = score_patients(conn)
+    conn.close()
+    if args.list:
+        for s in scores:
+            if s["mtm_level"] == args.list:
+                print(s["patient_id"], s["mtm_score"], "review due" if s["review_due"] else "")
+    else:
+        levels = Counter(s["mtm_level"] for s in scores)
+        print(f"{len(scores)} patients: " + ", ".join(f"{k} {levels[k]}" for k in ("High", "Moderate", "Low")))
+        print(f"medication review due: {sum(s['review_due'] for s in scores)}")
@@ -0,0 +1,182 @@
+# ocr.py
+# Label OCR behind a small job pipeline:
+#   - one OCR backend object (and one Vision client) per process, rebuilt
+#     after a fork (the executor's threads and gRPC channels don't survive it)
+#   - a bounded worker pool; submit() refuses work instead of queueing forever
+#   - results cached by SHA-256 of the image, so re-scanning a label is instant
+#
+# Backends are pluggable: CARELINK_OCR_BACKEND=vision (default) uses Google
+# Cloud Vision; CARELINK_OCR_BACKEND=fake reads the "image" as UTF-8 label text,
+# for offline development, tests and benchmarks.
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from label_parser import split_lines
+
+
+class OcrError(Exception):
+    pass
+
+
+class OcrBusy(OcrError):
+    """The pipeline already has max_pending jobs queued or running."""
+
+
+class VisionBackend:
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        # ImageAnnotatorClient is thread-safe and expensive to build; make one
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google.cloud import vision
+                    self._vision = vision
+                    self._client = vision.ImageAnnotatorClient()
+        return self._client
+
+    def detect_text(self, content):
+        client = self._get_client()
+        # 줄 단위로 잘 뽑히는 document_text_detection 사용
+        response = client.document_text_detection(image=self._vision.Image(content=content))
+        if response.error.message:
+            raise OcrError(response.error.message)
+        return response.full_text_annotation.text
+
+
+class FakeBackend:
+    """Treats the uploaded bytes as the label's text; optional fixed latency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def detect_text(self, content):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            return content.decode("utf-8")
+        except UnicodeDecodeError:
+            raise OcrError("fake OCR backend expects UTF-8 text")
+
+
+def make_backend(name=None):
+    name = name or os.environ.get("CARELINK_OCR_BACKEND", "vision")
+    if name == "vision":
+        return VisionBackend()
+    if name == "fake":
+        return FakeBackend(float(os.environ.get("CARELINK_OCR_FAKE_LATENCY", "0")))
+    raise ValueError(f"unknown OCR backend: {name}")
+
+
+class OcrPipeline:
+    def __init__(self, backend, workers=4, max_pending=32, cache_size=512, max_jobs=1024):
+        self.backend = backend
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()     # sha256 -> lines
+        self._inflight = {}             # sha256 -> Future (identical uploads share one call)
+        self._jobs = OrderedDict()      # job_id -> Future
+        self.pid = os.getpid()
+
+    def _run(self, digest, content):
+        try:
+            lines = split_lines(self.backend.detect_text(content))
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(digest, None)
+            if isinstance(e, OcrError):
+                raise
+            # network / auth / client library errors: callers only handle OcrError
+            raise OcrError(f"OCR failed: {e}") from e
+        with self._lock:
+            # cache first, then leave _inflight: an identical upload always
+            # finds one or the other, never neither
+            self._cache[digest] = lines
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._inflight.pop(digest, None)
+        return lines
+
+    def _track(self, job_id, future):
+        self._jobs[job_id] = future
+        excess = len(self._jobs) - self.max_jobs
+        if excess > 0:
+            # oldest finished jobs only: a pending job must stay pollable
+            for old in [j for j, f in self._jobs.items() if f.done()][:excess]:
+                del self._jobs[old]
+
+    def _submit(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                future = Future()
+                future.set_result(self._cache[digest])
+            else:
+                future = self._inflight.get(digest)
+                if future is None:
+                    if len(self._inflight) >= self.max_pending:
+                        raise OcrBusy("OCR queue is full, try again shortly")
+                    future = self._executor.submit(self._run, digest, content)
+                    self._inflight[digest] = future
+            self._track(job_id, future)
+        return job_id, future
+
+    def submit(self, content):
+        """Queue an image; returns a job id. Raises OcrBusy when the pool is saturated."""
+        return self._submit(content)[0]
+
+    def status(self, job_id):
+        """{"status": "pending" | "done" | "error", "lines"?, "error"?} or None if unknown."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None:
+            return None
+        if not future.done():
+            return {"status": "pending"}
+        if future.exception() is not None:
+            return {"status": "error", "error": str(future.exception())}
+        return {"status": "done", "lines": future.result()}
+
+    def scan(self, content, timeout=30):
+        """Synchronous helper: submit and wait for the lines (raises OcrError)."""
+        try:
+            return self._submit(content)[1].result(timeout=timeout)
+        except FutureTimeout:
+            # the job keeps running and caches its lines for a retry
+            raise OcrError(f"OCR timed out after {timeout}s") from None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    global _pipeline
+    if _pipeline is None or _pipeline.pid != os.getpid():
+        with _pipeline_lock:
+            if _pipeline is None or _pipeline.pid != os.getpid():
+                _pipeline = OcrPipeline(
+                    make_backend(),
+                    workers=int(os.environ.get("CARELINK_OCR_WORKERS", "4")),
+                    max_pending=int(os.environ.get("CARELINK_OCR_MAX_PENDING", "32")),
+                )
+    return _pipeline
@@ -0,0 +1,131 @@
+# panel.py
+# Pharmacist dashboard listing: filtered, sorted, keyset-paginated pages of
+# patients with their materialized MTM risk (patient_risk), projected down to
+# the columns the dashboard actually shows.
+import cursors
+import serialize
+from conditions import condition_mask
+from interactions import LABELS, SEVERITIES
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# sort key -> (SQL expression, patient_id tiebreak, driving table). Each
+# pair matches an index from migrations.py and CROSS JOIN pins the join
+# order, so a page is an index range scan instead of a full sort.
+PATIENTS_FIRST = "patients p CROSS JOIN patient_risk r ON r.patient_id = p.patient_id"
+RISK_FIRST = "patient_risk r CROSS JOIN patients p ON p.patient_id = r.patient_id"
+SORTS = {
+    "name": ("IFNULL(p.name, '')", "p.patient_id", PATIENTS_FIRST),
+    "patient_id": ("p.patient_id", None, PATIENTS_FIRST),
+    "mtm_score": ("r.mtm_score", "r.patient_id", RISK_FIRST),
+}
+MTM_LEVELS = ("High", "Moderate", "Low")
+
+WORST_INTERACTION_SQL = "(SELECT MAX(i.severity) FROM patient_interactions i WHERE i.patient_id = p.patient_id)"
+ROW_COLUMNS = f"""
+    p.patient_id, p.name, p.consent, p.conditions,
+    r.mtm_score, r.mtm_level, r.review_due,
+    {WORST_INTERACTION_SQL} AS interaction
+"""
+# as_json=True: the dashboard row rendered by SQLite (serialize.JsonRows), with
+# review_due as true/false and the interaction as its label, like the dicts
+JSON_COLUMNS = serialize.json_object_sql({
+    "patient_id": "p.patient_id",
+    "name": "p.name",
+    "consent": "p.consent",
+    "conditions": "p.conditions",
+    "mtm_score": "r.mtm_score",
+    "mtm_level": "r.mtm_level",
+    "review_due": "json(CASE WHEN r.review_due THEN 'true' ELSE 'false' END)",
+    "interaction": f"CASE {WORST_INTERACTION_SQL} "
+                   + " ".join(f"WHEN {level} THEN '{name}'" for level, name in LABELS.items()) + " END",
+}) + " AS json, p.patient_id"
+PANEL_SQL = """
+    SELECT {columns},
+           {key} AS sort_key
+    FROM {tables}
+    {where}
+    ORDER BY {order_by}
+    LIMIT ?
+"""
+
+
+def query_panel(conn, consent=None, conditions=(), review_due=None, mtm_levels=(),
+                interaction=None, sort="name", order="asc", limit=DEFAULT_LIMIT, cursor=None,
+                as_json=False):
+    """One page of the panel: {"patients": [...], "next_cursor": str | None}.
+
+    `as_json=True` returns the patients as serialize.JsonRows (JSON API).
+
+    `conditions` are catalog codes a patient must all have. `interaction` is a
+    minimum severity ("major" = major or contraindicated, interactions.py);
+    each row carries its patient's worst interaction, or None.
+    Raises ValueError for an unknown sort/order/level/condition or a malformed cursor.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"unknown sort: {sort}")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"unknown order: {order}")
+    for level in mtm_levels:
+        if level not in MTM_LEVELS:
+            raise ValueError(f"unknown MTM level: {level}")
+    if interaction is not None and interaction not in SEVERITIES:
+        raise ValueError(f"unknown interaction severity: {interaction}")
+    limit = max(1, min(limit, MAX_LIMIT))
+    key, tiebreak, tables = SORTS[sort]
+
+    clauses, params = [], []
+    if consent is not None:
+        clauses.append("p.consent = ?")
+        params.append(1 if consent else 0)
+    if conditions:
+        # all of them: one bitwise test per row (conditions.py)
+        mask = condition_mask(conn, [c.strip().upper() for c in conditions])
+        clauses.append("(p.condition_mask & ?) = ?")
+        params.extend([mask, mask])
+    if review_due is not None:
+        clauses.append("r.review_due = ?")
+        params.append(1 if review_due else 0)
+    if mtm_levels:
+        clauses.append(f"r.mtm_level IN ({', '.join('?' * len(mtm_levels))})")
+        params.extend(mtm_levels)
+    if interaction is not None:
+        # per row: a primary-key range probe of that patient's few pairs, so the
+        # page stops as soon as it has `limit` flagged patients
+        clauses.append("EXISTS (SELECT 1 FROM patient_interactions i "
+                       "WHERE i.patient_id = p.patient_id AND i.severity >= ?)")
+        params.append(SEVERITIES[interaction])
+    if cursor:
+        last_key, last_id = cursors.decode(cursor, 2)
+        cmp = ">" if order == "asc" else "<"
+        if tiebreak:
+            clauses.append(f"({key} {cmp} ? OR ({key} = ? AND {tiebreak} {cmp} ?))")
+            params.extend([last_key, last_key, last_id])
+        else:
+            clauses.append(f"{key} {cmp} ?")
+            params.append(last_key)
+
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    direction = order.upper()
+    order_by = f"{key} {direction}" + (f", {tiebreak} {direction}" if tiebreak else "")
+    sql = PANEL_SQL.format(columns=JSON_COLUMNS if as_json else ROW_COLUMNS,
+                           key=key, tables=tables, where=where, order_by=order_by)
+    rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = cursors.encode(rows[-1]["sort_key"], rows[-1]["patient_id"]) if more else None
+    if as_json:
+        return {"patients": serialize.JsonRows(rows), "next_cursor": next_cursor}
+    patients = []
+    for r in rows:
+        p = dict(r)
+        p.pop("sort_key")
+        p["review_due"] = bool(p["review_due"])
+        p["interaction"] = LABELS.get(p["interaction"])
+        patients.append(p)
+    return {
+        "patients": patients,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,179 @@
+# search.py
+# Full-text search over symptom notes and care plans (SQLite FTS5) for the
+# pharmacist search (GET /api/pharm/search?q=dizzy).
+#
+# One FTS5 table, search_index, holds both kinds of text:
+#   rowid > 0  symptom_logs.id          (the note)
+#   rowid < 0  care_plan_rowid(patient_id)  (the patient's care plan)
+# so a write route updates its own entry by rowid, never by scanning.
+# (patients.rowid is not used: VACUUM may renumber it.)
+# The porter tokenizer folds word forms ("dizziness" finds "dizzy").
+# add_symptom / api_add_symptom / the care plan routes keep it in sync;
+# migration 14 and `python search.py rebuild` (re)build it from the tables.
+#
+#   python search.py "dizzy morning" [--limit 20]
+#   python search.py rebuild
+import argparse
+import hashlib
+import re
+
+import cursors
+import db
+import timestamps
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_TERMS = 16
+KINDS = ("symptom", "care_plan")
+
+INDEX_SQL = "INSERT INTO search_index (rowid, body, patient_id, timestamp) VALUES (?, ?, ?, ?)"
+
+# Ranking reads only the index (rowid + bm25); patient_id / consent / the
+# snippet come from the content table for the ranked candidates alone, so a
+# word in 60k notes costs one bm25 pass, not 60k row lookups. bm25: lower is
+# better; (score, rowid) is the page key.
+RANK_SQL = """
+    SELECT rowid AS id, bm25(search_index) AS score FROM search_index
+    WHERE search_index MATCH ? {kind} {after}
+    ORDER BY score, id
+    LIMIT ?
+"""
+AFTER_SQL = "AND (score > ? OR (score = ? AND rowid > ?))"
+ROWS_SQL = """
+    SELECT search_index.rowid AS id, search_index.patient_id, p.name, search_index.timestamp,
+           snippet(search_index, 0, '[', ']', '…', 12) AS snippet
+    FROM search_index JOIN patients p ON p.patient_id = search_index.patient_id AND p.consent = 1
+    WHERE search_index MATCH ? AND search_index.rowid IN ({marks})
+"""
+# candidates ranked per pass, as a multiple of the page size (non-consented
+# patients' matches are dropped after ranking)
+CANDIDATES = 4
+MAX_CANDIDATES = 4000
+KIND_FILTER = {"symptom": "AND rowid > 0", "care_plan": "AND rowid < 0"}
+
+
+def care_plan_rowid(patient_id):
+    """Stable negative rowid for a patient's care plan entry (56-bit hash)."""
+    digest = hashlib.blake2b(patient_id.encode(), digest_size=7).digest()
+    return -(int.from_bytes(digest, "big") + 1)
+
+
+def index_symptom(conn, symptom_id, patient_id, note, timestamp):
+    """Index a newly inserted symptom_logs row (caller's transaction)."""
+    if note:
+        conn.execute(INDEX_SQL, (symptom_id, note, patient_id, timestamp))
+
+
+def index_care_plan(conn, patient_id, care_plan):
+    """Replace the patient's care plan entry (caller's transaction)."""
+    rowid = care_plan_rowid(patient_id)
+    conn.execute("DELETE FROM search_index WHERE rowid = ?", (rowid,))
+    if care_plan:
+        conn.execute(INDEX_SQL, (rowid, care_plan, patient_id, None))
+
+
+def index_new_symptoms(conn):
+    """Index symptom rows added in bulk (import_patients.py) since the last indexed one."""
+    last = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM search_index").fetchone()[0]
+    return conn.execute("""
+        INSERT INTO search_index (rowid, body, patient_id, timestamp)
+        SELECT id, note, patient_id, timestamp FROM symptom_logs
+        WHERE id > ? AND note IS NOT NULL AND note != ''
+    """, (last,)).rowcount
+
+
+def rebuild(conn):
+    """Re-create the whole index from symptom_logs + patients.care_plan. Caller commits."""
+    conn.execute("DELETE FROM search_index")
+    conn.execute("""
+        INSERT INTO search_index (rowid, body, patient_id, timestamp)
+        SELECT id, note, patient_id, timestamp FROM symptom_logs
+        WHERE note IS NOT NULL AND note != ''
+    """)
+    plans = conn.execute(
+        "SELECT patient_id, care_plan FROM patients WHERE care_plan IS NOT NULL AND care_plan != ''")
+    conn.executemany(INDEX_SQL, [(care_plan_rowid(pid), plan, pid, None) for pid, plan in plans])
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+def to_match(q):
+    """User text -> FTS5 query: every word must match; "word*" is a prefix search.
+
+    Words are quoted, so FTS5 operators and punctuation in the input are
+    plain text. ValueError if nothing searchable is left.
+    """
+    terms = []
+    for word in re.findall(r"\w+\*?", q or ""):
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        terms.append(f'"{word}"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError("q is required")
+    if len(terms) > MAX_TERMS:
+        raise ValueError(f"too many search terms (max {MAX_TERMS})")
+    return " ".join(terms)
+
+
+def search(conn, q, kind=None, limit=DEFAULT_LIMIT, cursor=None):
+    """Ranked matches among consented patients: {"results": [...], "next_cursor"}.
+
+    Each result is {"kind", "patient_id", "name", "symptom_id", "timestamp",
+    "snippet"}; the snippet marks matched words with [ ]. Raises ValueError
+    for an empty query, an unknown kind or a malformed cursor.
+    """
+    if kind is not None and kind not in KINDS:
+        raise ValueError(f"unknown kind: {kind}")
+    limit = max(1, min(limit, MAX_LIMIT))
+    match = to_match(q)
+    after = cursors.decode(cursor, 2) if cursor else None
+    kind_sql = KIND_FILTER.get(kind, "")
+    batch = (limit + 1) * CANDIDATES
+    rows = []
+    while len(rows) <= limit:
+        params = [match]
+        if after:
+            params.extend([after[0], after[0], after[1]])
+        ranked = conn.execute(RANK_SQL.format(kind=kind_sql, after=AFTER_SQL if after else ""),
+                              (*params, batch)).fetchall()
+        if not ranked:
+            break
+        found = {r["id"]: r for r in conn.execute(
+            ROWS_SQL.format(marks=", ".join("?" * len(ranked))), (match, *(r["id"] for r in ranked)))}
+        rows.extend((r["score"], found[r["id"]]) for r in ranked if r["id"] in found)
+        if len(ranked) < batch:
+            break
+        after = (ranked[-1]["score"], ranked[-1]["id"])
+        batch = min(batch * 2, MAX_CANDIDATES)
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    results = [{
+        "kind": "symptom" if r["id"] > 0 else "care_plan",
+        "patient_id": r["patient_id"],
+        "name": r["name"],
+        "symptom_id": r["id"] if r["id"] > 0 else None,
+        "timestamp": timestamps.to_iso(r["timestamp"]),
+        "snippet": r["snippet"],
+    } for _, r in rows]
+    return {
+        "results": results,
+        "next_cursor": cursors.encode(rows[-1][0], rows[-1][1]["id"]) if more else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search symptom notes and care plans")
+    parser.add_argument("query", help='search text, or "rebuild" to re-create the index')
+    parser.add_argument("--kind", choices=KINDS)
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    conn = db.connect()
+    if args.query == "rebuild":
+        rebuild(conn)
+        conn.commit()
+        print(f"search index rebuilt ({conn.execute('SELECT COUNT(*) FROM search_index').fetchone()[0]} entries).")
+    else:
+        for r in search(conn, args.query, args.kind, args.limit)["results"]:
+            print(f"{r['patient_id']}  {r['kind']:<9} {r['timestamp'] or '':<19}  {r['snippet']}")
+    conn.close()
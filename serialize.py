@@ -0,0 +1,122 @@
+# serialize.py
+# JSON output for the API views:
+#   - dumps() / JSONProvider: orjson when it is installed, stdlib json otherwise
+#     (app.json = JSONProvider(app) makes every jsonify() use it)
+#   - columnar(): {"ts": [...], "sys": [...], "dia": [...]} for chart series,
+#     one list per column instead of one object per reading
+#   - JsonRows: row lists that SQLite already rendered as JSON objects
+#     (json_object_sql(), timestamps decoded in SQL); dumps() splices the text
+#     in as it is, so no dict is built per row
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+import timestamps
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+# short keys for time series (?format=columnar)
+SERIES_COLUMNS = {"ts": "timestamp", "sys": "systolic", "dia": "diastolic"}
+
+# stands in for a JsonRows value until the encoder is done (NUL is always escaped)
+_PLACEHOLDER = "\0carelink-json-rows-{}\0"
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _encode(obj, default, sort_keys, indent):
+        option = _OPTIONS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+else:
+    def _encode(obj, default, sort_keys, indent):
+        return json.dumps(obj, default=default, sort_keys=sort_keys, indent=2 if indent else None,
+                          separators=None if indent else (",", ":"), ensure_ascii=False).encode()
+
+
+class JsonRows:
+    """Rows whose first column is a JSON object text from json_object_sql().
+
+    dumps() writes them as one JSON array. len() is the row count and `last`
+    the last row, for its cursor columns.
+    """
+
+    def __init__(self, rows):
+        self.text = "[" + ",".join(r[0] for r in rows) + "]"
+        self.last = rows[-1] if rows else None
+        self._count = len(rows)
+
+    def __len__(self):
+        return self._count
+
+
+def dumps(obj, default=None, sort_keys=False, indent=False):
+    """obj -> UTF-8 JSON bytes."""
+    fragments = []
+
+    def fallback(o):
+        if isinstance(o, JsonRows):
+            fragments.append(o.text)
+            return _PLACEHOLDER.format(len(fragments) - 1)
+        if default is None:
+            raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+        return default(o)
+
+    out = _encode(obj, fallback, sort_keys, indent)
+    for i, text in enumerate(fragments):
+        quoted = _encode(_PLACEHOLDER.format(i), None, False, False)
+        out = out.replace(quoted, text.encode(), 1)
+    return out
+
+
+def json_object_sql(columns, iso=()):
+    """Column names (or {key: SQL expression}) -> a json_object() expression.
+
+    Keys come out sorted, as dumps(sort_keys=True) writes them; `iso` columns
+    are epoch ms written as timestamps.to_iso() text.
+    """
+    if not isinstance(columns, dict):
+        columns = {c: c for c in columns}
+    exprs = {k: timestamps.ISO_SQL.format(col=v) if k in iso else v for k, v in columns.items()}
+    return "json_object(" + ", ".join(f"'{k}', {exprs[k]}" for k in sorted(exprs)) + ")"
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask's default provider (same key order, same date handling) on top of dumps()."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, default=self.default, sort_keys=self.sort_keys).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = dumps(obj, default=self.default, sort_keys=self.sort_keys, indent=indent)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def parse_fields(value, allowed):
+    """"timestamp,systolic" -> ["timestamp", "systolic"]; None/"" -> None (all columns)."""
+    if not value:
+        return None
+    fields = [f for f in value.split(",") if f]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def columnar(rows, columns=SERIES_COLUMNS, iso=("timestamp",)):
+    """Rows (sqlite3.Row or dicts) -> {short_name: [values...]} per column.
+
+    Columns named in `iso` hold epoch ms and come back as to_iso() text.
+    """
+    return {short: [timestamps.to_iso(r[name]) for r in rows] if name in iso else [r[name] for r in rows]
+            for short, name in columns.items()}
@@ -0,0 +1,197 @@
+# series.py
+# BP chart series for the pharmacist views: time-range filtering, LTTB
+# downsampling to a fixed number of points, and keyset (cursor) pagination of
+# the raw readings. Both read through archive.history(), so ranges and pages
+# that reach back past the hot months continue into the monthly archives.
+#
+# Ranges with more than PREBUCKET_FACTOR x points readings are not loaded raw:
+# SQL groups them into time buckets and returns only each bucket's lowest and
+# highest systolic reading plus the first and last reading of the range, and
+# LTTB picks from those. Peaks and both ends survive; Python never sees the
+# full history.
+import archive
+import cursors
+import serialize
+import timestamps
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+MAX_PAGE = 500
+PREBUCKET_FACTOR = 20
+# time buckets per requested point (each keeps up to 2 readings)
+BUCKETS_PER_POINT = 2
+
+SERIES_SQL = """
+    SELECT id, timestamp, systolic, diastolic
+    FROM bp_readings
+    WHERE patient_id = ? AND timestamp >= ? AND timestamp < ?
+    ORDER BY timestamp ASC, id ASC
+"""
+
+PLOTTABLE_SQL = """
+    FROM bp_readings
+    WHERE patient_id = :pid AND timestamp >= :start AND timestamp < :end
+      AND systolic IS NOT NULL AND diastolic IS NOT NULL
+"""
+COUNT_SQL = "SELECT COUNT(*) " + PLOTTABLE_SQL
+# one pass: MIN/MAX of (systolic << 40 | id) finds each bucket's lowest and
+# highest reading together with its id (ids stay below 2^40)
+ID_MASK = (1 << 40) - 1
+BUCKETED_SQL = f"""
+    WITH buckets AS (
+        SELECT MIN((systolic << 40) | id) AS low, MAX((systolic << 40) | id) AS high
+        {PLOTTABLE_SQL}
+        GROUP BY (timestamp - :start) / :width
+    )
+    SELECT id, timestamp, systolic, diastolic FROM bp_readings
+    WHERE id IN (SELECT low & {ID_MASK} FROM buckets UNION ALL SELECT high & {ID_MASK} FROM buckets)
+       OR id = (SELECT id {PLOTTABLE_SQL} ORDER BY timestamp ASC, id ASC LIMIT 1)
+       OR id = (SELECT id {PLOTTABLE_SQL} ORDER BY timestamp DESC, id DESC LIMIT 1)
+    ORDER BY timestamp ASC, id ASC
+"""
+SPAN_SQL = "SELECT first_timestamp, last_timestamp FROM bp_stats WHERE patient_id = ?"
+
+# {columns}: "*", or a json_object_sql() text plus the cursor columns
+PAGE_SQL = """
+    SELECT {columns} FROM bp_readings
+    WHERE patient_id = ?
+      AND (timestamp < ? OR (timestamp = ? AND id < ?))
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+FIRST_PAGE_SQL = """
+    SELECT {columns} FROM bp_readings
+    WHERE patient_id = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
+# open-ended range bounds (epoch ms)
+MIN_TS = 0
+MAX_TS = timestamps.MAX_MS
+
+
+def _key(row):
+    return (row["timestamp"], row["id"])
+
+
+def lttb(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the shape of ys."""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    selected = [0]
+    bucket = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # average of the next bucket is the third triangle vertex
+        nxt_start = int((i + 1) * bucket) + 1
+        nxt_end = min(int((i + 2) * bucket) + 1, n)
+        span = nxt_end - nxt_start
+        avg_x = sum(xs[nxt_start:nxt_end]) / span
+        avg_y = sum(ys[nxt_start:nxt_end]) / span
+
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def load_series(conn, patient_id, start=None, end=None, max_points=DEFAULT_POINTS):
+    """`start` / `end`: anything timestamps.encode() takes; labels come back as to_iso() text."""
+    start = MIN_TS if start is None else timestamps.encode(start)
+    end = MAX_TS if end is None else timestamps.encode(end)
+    params = {"pid": patient_id, "start": start, "end": end}
+    total = archive.count(conn, COUNT_SQL, params, start, end)
+    if total > PREBUCKET_FACTOR * max_points:
+        rows = _bucketed(conn, params, max_points)
+    else:
+        rows = archive.history(conn, SERIES_SQL, (patient_id, start, end), start, end, key=_key)
+        # readings with a missing value can't be plotted
+        rows = [r for r in rows if r["timestamp"] is not None and r["systolic"] is not None
+                and r["diastolic"] is not None]
+    keep = lttb([r["timestamp"] for r in rows], [r["systolic"] for r in rows], max_points)
+    cols = serialize.columnar([rows[i] for i in keep])
+    return {
+        "labels": cols["ts"],
+        "systolic": cols["sys"],
+        "diastolic": cols["dia"],
+        "total": total,
+        "downsampled": len(keep) < total,
+    }
+
+
+def _bucketed(conn, params, max_points):
+    # open-ended ranges are narrowed to the patient's readings, so the buckets
+    # span real data
+    span = conn.execute(SPAN_SQL, (params["pid"],)).fetchone()
+    lo, hi = params["start"], params["end"]
+    if span is not None and span["first_timestamp"] is not None:
+        lo, hi = max(lo, span["first_timestamp"]), min(hi, span["last_timestamp"] + 1)
+    width = max(1, -(-(hi - lo) // (max_points * BUCKETS_PER_POINT)))
+    params = dict(params, width=width)
+    return archive.history(conn, BUCKETED_SQL, params, params["start"], params["end"], key=_key)
+
+
+def as_columnar(chart):
+    """load_series() result with the compact {"ts", "sys", "dia"} keys."""
+    return {
+        "ts": chart["labels"],
+        "sys": chart["systolic"],
+        "dia": chart["diastolic"],
+        "total": chart["total"],
+        "downsampled": chart["downsampled"],
+    }
+
+
+def encode_cursor(row):
+    # rows straight from SQL (epoch ms) or already decoded (to_iso text)
+    return cursors.encode(timestamps.encode(row["timestamp"]), row["id"])
+
+
+READING_FIELDS = ("id", "patient_id", "systolic", "diastolic", "heart_rate", "timestamp", "client_key")
+
+
+def page_readings(conn, patient_id, cursor=None, limit=50, fields=None, columnar=False):
+    """Newest-first page of raw readings; pass back `next_cursor` for the next page.
+
+    `fields` limits the columns returned; `columnar` returns them as one list
+    per column ({"timestamp": [...], "systolic": [...]}). Otherwise the
+    readings are serialize.JsonRows, rendered by SQLite.
+    """
+    limit = max(1, min(limit, MAX_PAGE))
+    if columnar:
+        columns = "*"
+    else:
+        columns = serialize.json_object_sql(fields or READING_FIELDS, iso=("timestamp",)) + " AS json, timestamp, id"
+    if cursor:
+        timestamp, row_id = cursors.decode(cursor, 2)
+        # end: only months that start at or before the cursor can hold older rows
+        if not isinstance(timestamp, int):
+            raise ValueError("invalid cursor")
+        rows = archive.history(conn, PAGE_SQL.format(columns=columns),
+                               (patient_id, timestamp, timestamp, row_id, limit + 1),
+                               end=timestamp + 1, key=_key, reverse=True, limit=limit + 1)
+    else:
+        rows = archive.history(conn, FIRST_PAGE_SQL.format(columns=columns), (patient_id, limit + 1),
+                               key=_key, reverse=True, limit=limit + 1)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]) if more else None
+    if columnar:
+        readings = serialize.columnar(rows, {f: f for f in fields or READING_FIELDS})
+    else:
+        readings = serialize.JsonRows(rows)
+    return {
+        "readings": readings,
+        "next_cursor": next_cursor,
+    }
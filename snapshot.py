@@ -0,0 +1,73 @@
+# snapshot.py
+# One loader for the patient view that the dashboard templates and the JSON
+# API all share. Every query runs inside a single read transaction, so under
+# WAL they all see the same snapshot of the database.
+import audit
+import serialize
+import timestamps
+
+
+PATIENT_SQL = "SELECT * FROM patients WHERE patient_id = ?"
+# {columns}: "*", or JSON_COLUMNS
+READINGS_SQL = {
+    "desc": "SELECT {columns} FROM bp_readings WHERE patient_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+    "asc": "SELECT {columns} FROM bp_readings WHERE patient_id = ? ORDER BY timestamp ASC, id ASC LIMIT ?",
+}
+# json_rows=True: the same rows as one json_object() text each (serialize.JsonRows),
+# plus the columns the page cursor needs
+READING_COLUMNS = ("id", "patient_id", "systolic", "diastolic", "heart_rate", "timestamp", "client_key")
+SYMPTOM_COLUMNS = ("id", "patient_id", "note", "timestamp")
+JSON_COLUMNS = {
+    "bp_readings": serialize.json_object_sql(READING_COLUMNS, iso=("timestamp",)) + " AS json, timestamp, id",
+    "symptom_logs": serialize.json_object_sql(SYMPTOM_COLUMNS, iso=("timestamp",)) + " AS json",
+}
+MEDS_SQL = "SELECT * FROM medications WHERE patient_id = ?"
+SYMPTOMS_SQL = "SELECT {columns} FROM symptom_logs WHERE patient_id = ? ORDER BY timestamp DESC LIMIT ?"
+ACCESSES_SQL = "SELECT * FROM access_logs WHERE patient_id = ? ORDER BY timestamp DESC LIMIT ?"
+
+
+def load_patient_snapshot(conn, patient_id, readings_limit=10, readings_order="desc",
+                          symptoms_limit=3, accesses_limit=5, pending_accesses=True, json_rows=False):
+    """Return {"patient", "readings", "medications", "symptoms", "accesses"} or None.
+
+    `readings_limit=None` loads the whole BP history (chart views).
+    `pending_accesses=False` leaves out access events audit.py has not written yet.
+    `json_rows=True` returns readings and symptoms as serialize.JsonRows for the
+    JSON API (readings' `last` row has the timestamp / id for a page cursor).
+    Timestamps come back as timestamps.to_iso() text.
+    """
+    own_txn = not conn.in_transaction
+    if own_txn:
+        conn.execute("BEGIN")
+    try:
+        patient = conn.execute(PATIENT_SQL, (patient_id,)).fetchone()
+        if patient is None:
+            return None
+        limit = -1 if readings_limit is None else readings_limit
+        columns = JSON_COLUMNS if json_rows else {"bp_readings": "*", "symptom_logs": "*"}
+        readings = conn.execute(READINGS_SQL[readings_order].format(columns=columns["bp_readings"]),
+                                (patient_id, limit)).fetchall()
+        meds = conn.execute(MEDS_SQL, (patient_id,)).fetchall()
+        symptoms = conn.execute(SYMPTOMS_SQL.format(columns=columns["symptom_logs"]),
+                                (patient_id, symptoms_limit)).fetchall()
+        accesses = conn.execute(ACCESSES_SQL, (patient_id, accesses_limit)).fetchall()
+    finally:
+        if own_txn:
+            conn.commit()
+
+    accesses = timestamps.decode_rows(accesses)
+    if pending_accesses:
+        # access events still queued in audit.py are shown as if already written
+        accesses = audit.merge_pending(patient_id, accesses, accesses_limit)
+    if json_rows:
+        readings, symptoms = serialize.JsonRows(readings), serialize.JsonRows(symptoms)
+    else:
+        readings, symptoms = timestamps.decode_rows(readings), timestamps.decode_rows(symptoms)
+    return {
+        "patient": timestamps.decode_row(patient),
+        "readings": readings,
+        "medications": [dict(m) for m in meds],
+        "symptoms": symptoms,
+        "accesses": accesses,
+    }
+
@@ -0,0 +1,44 @@
+# tests/conftest.py
+#   pip install pytest && python -m pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import migrations  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A database at the latest schema with the demo patient P001."""
+    path = str(tmp_path / "carelink.db")
+    conn = db.connect(path)
+    migrations.migrate(conn)
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('P001', 'Demo Patient', 1)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def client(db_path, tmp_path, monkeypatch):
+    """Flask test client on `db_path`, logged in as the pharmacist."""
+    import audit
+    import cache
+    from app import app
+
+    monkeypatch.setenv("CARELINK_AUDIT_SPOOL", str(tmp_path / "audit"))
+    db.configure(db_path)
+    cache.responses.clear()
+    audit._audit = None
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["pharm_logged_in"] = True
+    yield client
+    if audit._audit is not None:
+        audit._audit.close()
+        audit._audit = None
+    db.pool.close_all()
@@ -0,0 +1,84 @@
+import os
+from datetime import date, datetime
+
+import pytest
+
+import archive
+import bp_stats
+import db
+import timestamps
+
+HISTORY_SQL = """
+    SELECT id, systolic, timestamp FROM bp_readings
+    WHERE patient_id = ? AND timestamp >= ? AND timestamp < ?
+    ORDER BY timestamp, id
+"""
+TODAY = date(2025, 7, 15)
+
+
+def _key(r):
+    return (r["timestamp"], r["id"])
+
+
+@pytest.fixture
+def conn(db_path, tmp_path, monkeypatch):
+    monkeypatch.setenv("CARELINK_ARCHIVE_DIR", str(tmp_path / "archive"))
+    conn = db.connect(db_path)
+    # one reading and one access on the 10th of every month, Jan..Jul 2025
+    bp_stats.add_readings(conn, "P001", [
+        (110 + m, 80, 70, datetime(2025, m, 10, 9, 0), f"cuff-{m}") for m in range(1, 8)])
+    conn.executemany("""
+        INSERT INTO access_logs (event_id, patient_id, actor, role, timestamp)
+        VALUES (?, 'P001', 'pharm01', 'pharmacist', ?)
+    """, [(f"e{m}", timestamps.encode(datetime(2025, m, 10, 9, 0))) for m in range(1, 8)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _history(conn, start=0, end=timestamps.MAX_MS):
+    return [(r["systolic"], r["timestamp"]) for r in
+            archive.history(conn, HISTORY_SQL, ("P001", start, end), start, end, key=_key)]
+
+
+def test_archived_months_round_trip_through_history(conn):
+    before = _history(conn)
+    archived = archive.run(conn, keep_months=3, today=TODAY)
+
+    assert sorted(archived) == ["2025-01", "2025-02", "2025-03", "2025-04"]
+    assert archived["2025-02"] == {"bp_readings": 1, "access_logs": 1}
+    # hot tables keep May..Jul: the recent lookups never open an archive file
+    hot = [r[0] for r in conn.execute("SELECT systolic FROM bp_readings ORDER BY timestamp")]
+    assert hot == [115, 116, 117]
+    assert conn.execute("SELECT COUNT(*) FROM access_logs").fetchone()[0] == 3
+    assert sorted(os.listdir(archive.archive_dir(conn))) == [f"2025-0{m}.db" for m in range(1, 5)]
+
+    assert _history(conn) == before
+    start, end = archive.month_bounds("2025-02")[0], archive.month_bounds("2025-05")[1]
+    assert [s for s, _ in _history(conn, start, end)] == [112, 113, 114, 115]
+    newest = archive.history(conn, HISTORY_SQL.replace("ORDER BY timestamp, id", "ORDER BY timestamp DESC, id DESC"),
+                             ("P001", 0, timestamps.MAX_MS), key=_key, reverse=True, limit=5)
+    assert [r["systolic"] for r in newest] == [117, 116, 115, 114, 113]
+    streamed = archive.iter_history(conn, HISTORY_SQL, ("P001", 0, timestamps.MAX_MS), key=_key)
+    assert [(r["systolic"], r["timestamp"]) for r in streamed] == before
+
+
+def test_archiving_a_month_again_is_a_no_op(conn):
+    assert archive.archive_month(conn, "2025-01") == {"bp_readings": 1, "access_logs": 1}
+    assert archive.archive_month(conn, "2025-01") == {"bp_readings": 1, "access_logs": 1}
+    assert archive.run(conn, keep_months=7, today=TODAY) == {}
+    assert len(_history(conn)) == 7
+    assert [r[0] for r in conn.execute("SELECT bp_readings FROM archive_partitions")] == [1]
+
+
+def test_purge_drops_months_past_retention(conn):
+    archive.run(conn, keep_months=3, today=TODAY)
+    folder = archive.archive_dir(conn)
+
+    assert archive.purge(conn, keep_months=4, today=TODAY) == ["2025-01", "2025-02"]
+    assert [r[0] for r in conn.execute("SELECT month FROM archive_partitions ORDER BY month")] == ["2025-03", "2025-04"]
+    assert sorted(os.listdir(folder)) == ["2025-03.db", "2025-04.db"]
+    assert [s for s, _ in _history(conn)] == [113, 114, 115, 116, 117]
+    assert archive.purge(conn, keep_months=4, today=TODAY) == []
+    # a cuff resyncing a purged reading does not bring it back
+    assert bp_stats.add_readings(conn, "P001", [(111, 80, 70, datetime(2025, 1, 10, 9, 0), "cuff-1")]) == 0
@@ -0,0 +1,70 @@
+import logging
+import sqlite3
+import time
+
+import audit
+import changes
+import db
+
+
+def _logged(db_path):
+    conn = db.connect(db_path)
+    try:
+        return [tuple(r) for r in conn.execute("SELECT event_id, actor FROM access_logs ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def _fail_once(monkeypatch):
+    record_accesses = changes.record_accesses
+    calls = []
+
+    def flaky(conn, event_ids):
+        calls.append(event_ids)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return record_accesses(conn, event_ids)
+
+    monkeypatch.setattr(changes, "record_accesses", flaky)
+    return calls
+
+
+def test_writer_retries_after_failed_flush(db_path, tmp_path, monkeypatch, caplog):
+    calls = _fail_once(monkeypatch)
+    log = audit.AuditLog(str(tmp_path / "spool"), db_path, flush_interval=0.05)
+    try:
+        with caplog.at_level(logging.ERROR, logger="audit"):
+            events = [log.record("P001", "pharm01", "pharmacist") for _ in range(3)]
+            deadline = time.monotonic() + 5
+            while log.pending("P001") and time.monotonic() < deadline:
+                time.sleep(0.02)
+    finally:
+        log.close()
+
+    assert len(calls) >= 2
+    assert "audit flush failed" in caplog.text
+    assert _logged(db_path) == [(e["event_id"], "pharm01") for e in events]
+
+
+def test_spool_replayed_after_failed_flush(db_path, tmp_path, monkeypatch):
+    spool = str(tmp_path / "spool")
+    _fail_once(monkeypatch)
+    # no background flushes: the test drives them
+    crashed = audit.AuditLog(spool, db_path, flush_interval=3600)
+    events = [crashed.record("P001", "pharm01", "pharmacist") for _ in range(2)]
+    try:
+        crashed.flush()
+    except sqlite3.OperationalError:
+        pass
+    assert _logged(db_path) == []
+    assert len(crashed.pending("P001")) == 2
+
+    # the process dies without close(); the next writer replays its spool
+    restarted = audit.AuditLog(spool, db_path, flush_interval=3600)
+    try:
+        assert [e["event_id"] for e in restarted.pending("P001")] == [e["event_id"] for e in events]
+        assert restarted.flush() == 2
+        assert restarted.pending("P001") == []
+    finally:
+        restarted.close()
+    assert _logged(db_path) == [(e["event_id"], "pharm01") for e in events]
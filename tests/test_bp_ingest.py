@@ -0,0 +1,139 @@
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+import archive
+import bp_ingest
+import bp_stats
+import db
+import timestamps
+
+NOW = datetime(2025, 12, 1)
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _upload(conn, items):
+    inserted = bp_stats.add_readings(conn, "P001", bp_ingest.validate(items, now=NOW))
+    conn.commit()
+    return inserted
+
+
+def test_retry_across_the_dst_fall_back_is_a_no_op(db_path, new_york):
+    # 01:30 local happens twice on 2025-11-02: EDT (-04:00), then EST (-05:00)
+    batch = [
+        {"systolic": 130, "diastolic": 85, "timestamp": "2025-11-02T01:30:00-04:00"},
+        {"systolic": 130, "diastolic": 85, "timestamp": "2025-11-02T01:30:00-05:00"},
+    ]
+    conn = db.connect(db_path)
+    assert _upload(conn, batch) == 2
+    assert _upload(conn, batch) == 0
+    stored = [r[0] for r in conn.execute("SELECT timestamp FROM bp_readings ORDER BY timestamp")]
+    assert stored[1] - stored[0] == 3600 * 1000
+    assert stored[0] == timestamps.encode("2025-11-02T05:30:00+00:00")
+    conn.close()
+
+
+def test_auto_key_does_not_depend_on_the_server_time_zone(monkeypatch):
+    item = {"systolic": 120, "diastolic": 80, "timestamp": "2025-03-01T07:45:00+09:00"}
+    keys = []
+    for tz in ("Asia/Seoul", "America/New_York"):
+        monkeypatch.setenv("TZ", tz)
+        time.tzset()
+        keys.append(bp_ingest.validate_reading(item, NOW))
+    monkeypatch.undo()
+    time.tzset()
+    assert keys[0] == keys[1]
+
+
+def test_resync_of_archived_readings_is_a_no_op(db_path, tmp_path, monkeypatch):
+    monkeypatch.setenv("CARELINK_ARCHIVE_DIR", str(tmp_path / "archive"))
+    batch = [
+        {"systolic": 128, "diastolic": 82, "timestamp": "2025-01-10T08:00:00"},
+        {"systolic": 131, "diastolic": 84, "timestamp": "2025-01-11T08:00:00", "id": "cuff-7"},
+    ]
+    conn = db.connect(db_path)
+    assert _upload(conn, batch) == 2
+    assert archive.archive_month(conn, "2025-01")["bp_readings"] == 2
+    assert conn.execute("SELECT COUNT(*) FROM bp_readings").fetchone()[0] == 0
+
+    assert _upload(conn, batch) == 0
+    assert conn.execute("SELECT COUNT(*) FROM bp_readings").fetchone()[0] == 0
+    assert conn.execute("SELECT reading_count FROM bp_stats").fetchone()[0] == 2
+    conn.close()
+
+
+def test_migration_17_keys_readings_archived_before_it(tmp_path, monkeypatch):
+    import hashlib
+
+    import migrations
+
+    monkeypatch.setenv("CARELINK_ARCHIVE_DIR", str(tmp_path / "archive"))
+    conn = db.connect(str(tmp_path / "old.db"))
+    migrations.migrate(conn, target=16)
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('P001', 'Demo Patient', 1)")
+    # written by the batch endpoint before 17: key hashed from the local wall-clock text
+    ts = datetime(2025, 1, 10, 8, 0)
+    old_key = "auto:" + hashlib.sha1(f"{ts.isoformat()}|128|82|None".encode()).hexdigest()
+    conn.execute("""
+        INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp, client_key)
+        VALUES ('P001', 128, 82, NULL, ?, ?)
+    """, (timestamps.encode(ts), old_key))
+    conn.commit()
+    archive.archive_month(conn, "2025-01")
+
+    migrations.migrate(conn)
+    assert _upload(conn, [{"systolic": 128, "diastolic": 82, "timestamp": "2025-01-10T08:00:00"}]) == 0
+    assert conn.execute("SELECT COUNT(*) FROM bp_readings").fetchone()[0] == 0
+    conn.close()
+
+
+BATCH = [
+    {"systolic": 132, "diastolic": 84, "heart_rate": 71, "timestamp": "2025-03-01T07:45:00+09:00",
+     "id": "cuff-000123"},
+    {"systolic": 128, "diastolic": 80, "timestamp": "2025-03-01T19:10:00+09:00"},
+    {"systolic": 141, "diastolic": 90, "heart_rate": 66, "timestamp": "2025-03-02T07:40:00+09:00",
+     "idempotency_key": "cuff-000124"},
+]
+
+
+def _readings(db_path):
+    conn = db.connect(db_path)
+    try:
+        return tuple(conn.execute("""
+            SELECT (SELECT COUNT(*) FROM bp_readings),
+                   (SELECT reading_count FROM bp_stats WHERE patient_id = 'P001')
+        """).fetchone())
+    finally:
+        conn.close()
+
+
+def test_batch_endpoint_resend_is_a_no_op(client, db_path):
+    res = client.post("/api/patient/P001/bp/batch", json=BATCH)
+    assert res.get_json() == {"ok": True, "received": 3, "inserted": 3, "duplicates": 0}
+    # the same readings again, as NDJSON, plus a new one and a repeat inside the batch
+    new = {"systolic": 150, "diastolic": 95, "timestamp": "2025-03-03T08:00:00+09:00", "id": "cuff-000125"}
+    body = "\n".join(json.dumps(r) for r in BATCH + [new, new])
+    res = client.post("/api/patient/P001/bp/batch", data=body, content_type="application/x-ndjson")
+    assert res.get_json() == {"ok": True, "received": 5, "inserted": 1, "duplicates": 4}
+    assert _readings(db_path) == (4, 4)
+
+
+def test_batch_endpoint_rejects_the_whole_batch(client, db_path):
+    bad = BATCH + [{"systolic": 80, "diastolic": 90, "timestamp": "2025-03-01T08:00:00"},
+                   {"systolic": 120, "diastolic": 80, "timestamp": "2999-01-01T00:00:00"}]
+    res = client.post("/api/patient/P001/bp/batch", json=bad)
+    assert res.status_code == 400
+    assert [e["index"] for e in res.get_json()["errors"]] == [3, 4]
+    assert client.post("/api/patient/P001/bp/batch", data="{", content_type="application/json").status_code == 400
+    assert client.post("/api/patient/P404/bp/batch", json=BATCH).status_code == 404
+    assert _readings(db_path) == (0, None)
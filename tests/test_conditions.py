@@ -0,0 +1,85 @@
+import pytest
+
+import conditions
+import db
+import mtm
+import panel
+
+PATIENTS = {
+    "P001": "HTN",
+    "P002": "HTN,DM",
+    "P003": "DM,DLD,HTN",
+    "P004": "",
+    "P005": "dm, ckd",
+}
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = db.connect(db_path)
+    conn.executemany("INSERT OR REPLACE INTO patients (patient_id, name, consent, conditions) VALUES (?, ?, 1, ?)",
+                     [(pid, f"Patient {pid}", text) for pid, text in PATIENTS.items()])
+    conditions.rebuild(conn)
+    mtm.refresh(conn)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _panel_ids(conn, codes):
+    return [p["patient_id"] for p in panel.query_panel(conn, conditions=codes, sort="patient_id")["patients"]]
+
+
+def test_mask_filters_need_every_condition(conn):
+    assert _panel_ids(conn, []) == list(PATIENTS)
+    assert _panel_ids(conn, ["HTN"]) == ["P001", "P002", "P003"]
+    assert _panel_ids(conn, ["htn", " DM"]) == ["P002", "P003"]
+    assert _panel_ids(conn, ["DM", "DLD", "HTN"]) == ["P003"]
+    # registered by rebuild() from the text column
+    assert _panel_ids(conn, ["CKD"]) == ["P005"]
+    with pytest.raises(ValueError, match="XYZ"):
+        _panel_ids(conn, ["HTN", "XYZ"])
+
+
+def test_rebuild_keeps_text_mask_and_junction_in_step(conn):
+    bits = conditions.load_catalog(conn)
+    assert bits == {"HTN": 0, "DM": 1, "DLD": 2, "CKD": 3}
+    for r in conn.execute("SELECT patient_id, conditions, condition_mask FROM patients"):
+        codes = conditions.parse(r["conditions"])
+        assert r["condition_mask"] == conditions.condition_mask(conn, codes, bits)
+        linked = {c[0] for c in conn.execute("SELECT code FROM patient_conditions WHERE patient_id = ?",
+                                             (r["patient_id"],))}
+        assert linked == set(codes)
+    counts = {r["code"]: r["patients"] for r in conn.execute(conditions.COUNTS_SQL)}
+    assert counts == {"HTN": 3, "DM": 3, "DLD": 1, "CKD": 1}
+
+
+def test_set_conditions(conn):
+    assert conditions.set_conditions(conn, "P004", "dm,htn,DM")
+    row = conn.execute("SELECT conditions, condition_mask FROM patients WHERE patient_id = 'P004'").fetchone()
+    assert tuple(row) == ("HTN,DM", 0b11)
+    assert _panel_ids(conn, ["HTN", "DM"]) == ["P002", "P003", "P004"]
+    assert conditions.set_conditions(conn, "P404", ["HTN"]) is False
+    with pytest.raises(ValueError):
+        conditions.set_conditions(conn, "P004", ["NOPE"])
+
+
+def test_register(conn):
+    assert conditions.register(conn, "CKD") == 3
+    assert conditions.register(conn, "COPD", "Chronic obstructive pulmonary disease") == 4
+    with pytest.raises(ValueError):
+        conditions.register(conn, "bad code")
+
+
+def test_api_filters_and_updates(client):
+    res = client.post("/api/patient/P001/conditions", json={"conditions": ["DM", "HTN"]})
+    assert res.status_code == 200
+    assert client.post("/api/patient/P001/conditions", json={"conditions": ["XYZ"]}).status_code == 400
+    assert client.post("/api/patient/P404/conditions", json={"conditions": ["HTN"]}).status_code == 404
+
+    rows = client.get("/api/pharm/dashboard?condition=HTN&condition=DM").get_json()["patients"]
+    assert [(p["patient_id"], p["conditions"]) for p in rows] == [("P001", "HTN,DM")]
+    assert client.get("/api/pharm/dashboard?condition=DLD").get_json()["patients"] == []
+    assert client.get("/api/pharm/dashboard?condition=XYZ").status_code == 400
+    catalog = client.get("/api/pharm/conditions").get_json()["conditions"]
+    assert [c["code"] for c in catalog] == ["HTN", "DM", "DLD"]
@@ -0,0 +1,92 @@
+import pytest
+
+import db
+import drugs
+
+ROWS = [
+    {"drug_id": "metformin", "name": "Metformin", "synonyms": "Glucophage|metformin hcl",
+     "strengths": "500 mg|850 mg|1000 mg"},
+    {"drug_id": "sitagliptin_metformin", "name": "Sitagliptin / Metformin", "synonyms": "Janumet",
+     "strengths": "50-500 mg"},
+    {"drug_id": "methotrexate", "name": "Methotrexate", "synonyms": "", "strengths": "2.5 mg"},
+    {"drug_id": "prednisone", "name": "Prednisone", "synonyms": "Deltasone", "strengths": "5 mg|10 mg"},
+    {"drug_id": "metformin", "name": "Duplicate id", "synonyms": "", "strengths": ""},
+]
+
+
+@pytest.fixture
+def index():
+    return drugs.DrugIndex(ROWS)
+
+
+def _ids(results):
+    return [r["drug_id"] for r in results]
+
+
+def test_prefix_completion_ranks_names_then_aliases_then_inner_words(index):
+    assert len(index) == 4
+    assert _ids(index.complete("met")) == ["metformin", "methotrexate", "sitagliptin_metformin"]
+    assert _ids(index.complete("METF")) == ["metformin", "sitagliptin_metformin"]
+    assert _ids(index.complete("gluco")) == ["metformin"]
+    assert _ids(index.complete("met", limit=1)) == ["metformin"]
+    assert index.complete("") == [] and index.complete("zz") == []
+    # no prefix: close spellings, below 1.0
+    [typo] = index.complete("predinsone")
+    assert typo["drug_id"] == "prednisone" and drugs.MIN_SIMILARITY <= typo["score"] < 1
+    assert index.complete("metformin 850 MG")[0]["strength"] == "850 mg"
+
+
+@pytest.mark.parametrize("text,drug_id,strength,exact", [
+    ("120 METFORMIN HCL 500 MG TABL", "metformin", "500 mg", True),
+    ("METF0RMIN HCI 500 MG TABL", "metformin", "500 mg", False),    # OCR'd 0 and I
+    ("glucophage", "metformin", None, True),
+    ("JANUMET", "sitagliptin_metformin", None, True),
+    ("metformin 700 mg", "metformin", None, True),                 # not a strength it comes in
+    ("Prednisone 10MG tablet", "prednisone", "10 mg", True),
+])
+def test_match(index, text, drug_id, strength, exact):
+    found = index.match(text)
+    assert (found["drug_id"], found["strength"]) == (drug_id, strength)
+    assert (found["score"] == 1.0) == exact
+
+
+def test_no_match(index):
+    assert index.match("xyzzy 10 mg") is None
+    assert index.match("") is None and index.match(None) is None
+    assert index.match("tablet") is None
+
+
+def test_resolve(index):
+    assert index.resolve("METFORMIN HCL 500 MG", None) == ("Metformin", "500 mg", "metformin")
+    assert index.resolve("anything", "5 mg", "prednisone") == ("Prednisone", "5 mg", "prednisone")
+    # below AUTO_MATCH: kept as typed
+    assert index.resolve("prednisolone", "5 mg") == ("prednisolone", "5 mg", None)
+    assert index.resolve("Vitamin D", "1000 units") == ("Vitamin D", "1000 units", None)
+
+
+def test_bundled_dictionary():
+    index = drugs.DrugIndex.from_csv()
+    assert index.match("CLOPIDOGRE1 75 MG TAB")["drug_id"] == "clopidogrel"
+    assert index.match("Norvasc 5mg")["strength"] == "5 mg"
+    # a combination is not just its first ingredient
+    assert index.match("amlodipine benazepril 5 mg")["score"] < drugs.AUTO_MATCH
+    assert index.resolve("prednisolone", "5 mg")[2] is None
+
+
+def test_backfill_and_api(client, db_path):
+    conn = db.connect(db_path)
+    conn.executemany("INSERT INTO medications (patient_id, name) VALUES ('P001', ?)",
+                     [("METFORMIN HCL",), ("METFORMIN HCL",), ("Norvasc",), ("Herbal tea",)])
+    assert drugs.backfill(conn) == 2
+    rows = conn.execute("SELECT name, drug_id FROM medications ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [("METFORMIN HCL", "metformin"), ("METFORMIN HCL", "metformin"),
+                                        ("Norvasc", "amlodipine"), ("Herbal tea", None)]
+    conn.commit()
+    conn.close()
+
+    assert _ids(client.get("/api/drugs/complete?q=metf&limit=1").get_json()["results"]) == ["metformin"]
+    client.post("/api/patient/P001/med", json={"name": "glucophage", "dose": "850 mg", "frequency": "bid"})
+    conn = db.connect(db_path)
+    row = conn.execute("SELECT name, dose, drug_id FROM medications ORDER BY id DESC LIMIT 1").fetchone()
+    conn.close()
+    assert tuple(row) == ("Metformin", "850 mg", "metformin")
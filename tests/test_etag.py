@@ -0,0 +1,33 @@
+import audit
+import cache
+
+URL = "/api/pharm/patient/P001"
+
+
+def test_pharm_view_cached_across_its_own_access_flush(client):
+    first = client.get(URL)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "accesses" not in first.get_json()
+
+    # the view queued an access event; writing it bumps access_version
+    assert audit.get_audit().flush() == 1
+
+    assert client.get(URL, headers={"If-None-Match": etag}).status_code == 304
+    hits = cache.responses.hits
+    again = client.get(URL)
+    assert again.headers["ETag"] == etag
+    assert cache.responses.hits == hits + 1
+
+    # the access log is served on its own, flushed and queued views included
+    accesses = client.get(URL + "/accesses").get_json()["accesses"]
+    assert [a["actor"] for a in accesses] == ["pharm01"] * 3
+
+
+def test_pharm_view_etag_changes_with_patient_data(client):
+    etag = client.get(URL).headers["ETag"]
+    assert client.post("/api/patient/P001/bp", json={"systolic": 150, "diastolic": 95}).status_code == 200
+    fresh = client.get(URL, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert fresh.get_json()["readings"][0]["systolic"] == 150
@@ -0,0 +1,39 @@
+import changes
+import db
+import events
+
+
+def _write(conn):
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('P002', 'No Consent', 0)")
+    changes.record(conn, "P001", "symptom")
+    changes.record(conn, "P002", "symptom")
+    conn.commit()
+
+
+def test_panel_hints_skip_patients_without_consent(db_path):
+    broker = events.Broker(db_path)
+    panel, own = events.Subscriber(), events.Subscriber("P002")
+    broker._subs.update((panel, own))
+    conn = db.connect(db_path)
+    try:
+        broker._poll(conn)  # starts from "now"
+        _write(conn)
+        broker._poll(conn)
+    finally:
+        conn.close()
+
+    kind, hints = panel.next_events(0)
+    assert kind == "change"
+    assert [h["patient_id"] for h in hints] == ["P001"]
+    # the patient's own stream is not a sharing decision
+    assert [h["patient_id"] for h in own.next_events(0)[1]] == ["P002"]
+
+
+def test_panel_catch_up_skips_patients_without_consent(db_path):
+    conn = db.connect(db_path)
+    try:
+        _write(conn)
+        assert [h["patient_id"] for h in events.missed(conn, 0)[1]] == ["P001"]
+        assert [h["patient_id"] for h in events.missed(conn, 0, "P002")[1]] == ["P002"]
+    finally:
+        conn.close()
@@ -0,0 +1,37 @@
+import csv
+import io
+import json
+from urllib.parse import quote
+
+import db
+import timestamps
+
+ODD_ID = 'P"9; x=y'
+
+
+def test_export_filename_is_sanitized(client, db_path):
+    conn = db.connect(db_path)
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES (?, 'Odd Id', 1)", (ODD_ID,))
+    conn.commit()
+    conn.close()
+
+    r = client.get(f"/api/pharm/patient/{quote(ODD_ID)}/export?format=ndjson")
+    assert r.status_code == 200
+    disposition = r.headers["Content-Disposition"]
+    assert disposition.startswith("attachment; filename=P_9__x_y-history-")
+    assert disposition.endswith(".ndjson")
+    assert json.loads(r.get_data(as_text=True).splitlines()[0])["patient_id"] == ODD_ID
+
+
+def test_csv_export_starts_with_patient_row(client):
+    client.post("/api/patient/P001/bp", json={"systolic": 128, "diastolic": 82})
+    before = timestamps.now_ms()
+    rows = list(csv.DictReader(io.StringIO(client.get("/api/pharm/patient/P001/export").get_data(as_text=True))))
+    assert rows[0]["record_type"] == "patient"
+    assert rows[0]["patient_id"] == "P001"
+    assert rows[0]["name"] == "Demo Patient"
+    # same to_iso() text as every other timestamp in the export
+    exported = timestamps.encode(rows[0]["exported_at"])
+    assert before <= exported <= timestamps.now_ms()
+    assert timestamps.to_iso(exported) == rows[0]["exported_at"]
+    assert [(r["record_type"], r["systolic"], r["patient_id"]) for r in rows[1:]] == [("reading", "128", "")]
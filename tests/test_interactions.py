@@ -0,0 +1,98 @@
+import pytest
+
+import db
+import drugs
+import interactions
+
+INDEX = drugs.DrugIndex([{"drug_id": d, "name": d.title(), "synonyms": "", "strengths": ""}
+                         for d in ("warfarin", "apixaban", "ibuprofen", "naproxen", "aspirin",
+                                   "lisinopril", "spironolactone")])
+ROWS = [
+    {"drugs_a": "warfarin|apixaban", "drugs_b": "ibuprofen|naproxen|aspirin", "severity": "major",
+     "description": "Bleeding risk"},
+    {"drugs_a": "ibuprofen|naproxen", "drugs_b": "aspirin|naproxen", "severity": "Moderate",
+     "description": "NSAIDs together"},
+    # listed again, worse: the higher severity wins either way round
+    {"drugs_a": "aspirin", "drugs_b": "warfarin", "severity": "contraindicated",
+     "description": "Do not combine"},
+    {"drugs_a": "lisinopril", "drugs_b": "spironolactone", "severity": "minor", "description": ""},
+]
+
+
+@pytest.fixture
+def table():
+    return interactions.InteractionTable(ROWS, INDEX)
+
+
+def test_rows_expand_into_sorted_pairs(table):
+    # 2x3 + 2x2 minus naproxen/naproxen + lisinopril/spironolactone; aspirin/warfarin counted once
+    assert len(table) == 6 + 3 + 1
+    assert table.pairs(["warfarin", "aspirin"]) == [("aspirin", "warfarin", 3)]
+    assert table.pairs(["naproxen", "ibuprofen", "naproxen"]) == [("ibuprofen", "naproxen", 1)]
+
+
+def test_pairs_worst_first(table):
+    meds = ["lisinopril", "ibuprofen", "warfarin", None, "spironolactone", "aspirin"]
+    assert table.pairs(meds) == [
+        ("aspirin", "warfarin", 3),
+        ("ibuprofen", "warfarin", 2),
+        ("aspirin", "ibuprofen", 1),
+        ("lisinopril", "spironolactone", 0),
+    ]
+    assert table.pairs(["warfarin"]) == [] and table.pairs([]) == []
+    assert table.pairs(["apixaban", "warfarin", "lisinopril"]) == []
+
+
+def test_check_is_cached_per_set_of_drugs(table):
+    hits = table.check(["ibuprofen", "warfarin"])
+    assert hits == [{"drug_ids": ["ibuprofen", "warfarin"], "names": ["Ibuprofen", "Warfarin"],
+                     "severity": "major", "level": 2, "description": "Bleeding risk"}]
+    assert table.check(["warfarin", "ibuprofen", "warfarin", None]) is hits
+    assert table.check(["warfarin", None]) == []
+
+
+@pytest.mark.parametrize("row,message", [
+    ({"drugs_a": "warfarin", "drugs_b": "nope", "severity": "major"}, "nope"),
+    ({"drugs_a": "warfarin", "drugs_b": "aspirin", "severity": "severe"}, "severe"),
+])
+def test_bad_rows_name_their_line(row, message):
+    with pytest.raises(ValueError, match=f"line 3: .*{message}"):
+        interactions.InteractionTable([ROWS[0], row], INDEX)
+
+
+def test_sweep_and_refresh_agree(db_path, table, monkeypatch):
+    monkeypatch.setattr(interactions, "_table", table)
+    conn = db.connect(db_path)
+    conn.executemany("INSERT INTO patients (patient_id, name, consent) VALUES (?, ?, 1)",
+                     [("P002", "B"), ("P003", "C")])
+    conn.executemany("INSERT INTO medications (patient_id, name, drug_id) VALUES (?, ?, ?)", [
+        ("P001", "Warfarin", "warfarin"), ("P001", "Advil", "ibuprofen"), ("P001", "Tea", None),
+        ("P002", "Aspirin", "aspirin"), ("P002", "Naproxen", "naproxen"), ("P002", "Warfarin", "warfarin"),
+        ("P003", "Lisinopril", "lisinopril"),
+    ])
+    assert interactions.sweep(conn) == 1 + 3
+    swept = conn.execute("SELECT * FROM patient_interactions ORDER BY 1, 2, 3").fetchall()
+    assert [tuple(r) for r in swept] == [
+        ("P001", "ibuprofen", "warfarin", 2),
+        ("P002", "aspirin", "naproxen", 1), ("P002", "aspirin", "warfarin", 3),
+        ("P002", "naproxen", "warfarin", 2),
+    ]
+    conn.execute("INSERT INTO medications (patient_id, name, drug_id) "
+                 "VALUES ('P003', 'Aldactone', 'spironolactone')")
+    conn.execute("DELETE FROM medications WHERE patient_id = 'P001' AND drug_id = 'ibuprofen'")
+    assert interactions.refresh(conn, ["P001", "P003"]) == 1
+    refreshed = [tuple(r) for r in conn.execute("SELECT * FROM patient_interactions ORDER BY 1, 2, 3")]
+    interactions.sweep(conn)
+    assert refreshed == [tuple(r) for r in conn.execute("SELECT * FROM patient_interactions ORDER BY 1, 2, 3")]
+    assert ("P003", "lisinopril", "spironolactone", 0) in refreshed
+    conn.close()
+
+
+def test_adding_a_medication_flags_the_patient(client):
+    client.post("/api/patient/P001/med", json={"name": "Warfarin", "dose": "5 mg", "frequency": "daily"})
+    assert client.get("/api/pharm/dashboard?interaction=major").get_json()["patients"] == []
+    client.post("/api/patient/P001/med", json={"name": "Ibuprofen", "dose": "400 mg", "frequency": "prn"})
+    [row] = client.get("/api/pharm/dashboard?interaction=major").get_json()["patients"]
+    assert (row["patient_id"], row["interaction"]) == ("P001", "major")
+    hits = client.get("/api/pharm/patient/P001").get_json()["interactions"]
+    assert [h["drug_ids"] for h in hits] == [["ibuprofen", "warfarin"]]
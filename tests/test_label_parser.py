@@ -0,0 +1,65 @@
+import label_parser
+
+LABEL = """
+CARELINK PHARMACY  (555) 010-2000
+RX# 0012345   DR. PARK
+120 METFORMIN HCL 500 MG TABL
+TAKE 1 TABLET BY MOUTH TWICE DAILY WITH MEALS
+30 AMLODIPINE 2.5MG TAB
+TAKE 1 TABLET BY MOUTH ONCE DAILY
+LEVOTHYROXINE 0.075 MG TABLET
+REFILLS: 2
+"""
+
+
+def test_every_medication_on_a_label_with_its_own_directions():
+    label = label_parser.parse_label(LABEL)
+    assert label["medications"] == [
+        {"name": "METFORMIN HCL", "dose": "500 MG",
+         "frequency": "TAKE 1 TABLET BY MOUTH TWICE DAILY WITH MEALS"},
+        {"name": "AMLODIPINE", "dose": "2.5MG", "frequency": "TAKE 1 TABLET BY MOUTH ONCE DAILY"},
+        # no directions of its own: the label's first
+        {"name": "LEVOTHYROXINE", "dose": "0.075 MG",
+         "frequency": "TAKE 1 TABLET BY MOUTH TWICE DAILY WITH MEALS"},
+    ]
+    assert label["suggested"] == label["medications"][0]
+    assert len(label["med_candidates"]) == 5
+    assert label["lines"][0] == "CARELINK PHARMACY  (555) 010-2000"
+
+
+def test_parse_med_line():
+    assert label_parser.parse_med_line("120 METFORMIN HCL 500 MG TABL") == ("METFORMIN HCL", "500 MG")
+    assert label_parser.parse_med_line("Insulin glargine 10 units") == ("Insulin glargine", "10 units")
+    assert label_parser.parse_med_line("amoxicillin 0.25g cap") == ("amoxicillin", "0.25g")
+    # a dose only: the whole line stays the name
+    assert label_parser.parse_med_line("500 mg") == ("500 mg", "500 mg")
+    assert label_parser.parse_med_line(" ASPIRIN EC ") == ("ASPIRIN EC", None)
+
+
+def test_directions_only_and_empty_labels():
+    # only directions look like medications: the first one stands in
+    label = label_parser.parse_label(["Take 1 tablet by mouth", "every 6 hours"])
+    assert label["medications"] == [{"name": "Take 1 tablet by mouth", "dose": None,
+                                     "frequency": "every 6 hours"}]
+    empty = label_parser.parse_label("RX# 1\n\n   \nREFILLS: 0")
+    assert empty["medications"] == [] and empty["med_candidates"] == []
+    assert empty["suggested"] == {"name": None, "dose": None, "frequency": None}
+
+
+class Drugs:
+    def resolve(self, line):
+        if "METFORMIN" in line:
+            return "Metformin Hydrochloride", "500 mg", "metformin"
+        return None, None, None
+
+
+def test_drug_index_names_and_batch():
+    labels = label_parser.parse_labels([LABEL, "LISINOPRIL 10 MG\nTAKE ONCE DAILY"], Drugs())
+    assert [(m["name"], m["dose"], m["drug_id"]) for m in labels[0]["medications"]] == [
+        ("Metformin Hydrochloride", "500 mg", "metformin"),
+        ("AMLODIPINE", "2.5MG", None),
+        ("LEVOTHYROXINE", "0.075 MG", None),
+    ]
+    assert labels[1]["suggested"] == {"name": "LISINOPRIL", "dose": "10 MG",
+                                      "frequency": "TAKE ONCE DAILY", "drug_id": None}
+    assert label_parser.parse_labels([LABEL]) == [label_parser.parse_label(LABEL)]
@@ -0,0 +1,33 @@
+import pytest
+from flask import Flask
+
+import metrics
+
+
+@pytest.fixture
+def scrape(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "s3cret")
+    app = Flask(__name__)
+    app.secret_key = "test"
+    metrics.init_app(app)
+    return app.test_client()
+
+
+def test_metrics_need_a_pharmacist_session_or_the_scrape_token(scrape):
+    assert scrape.get("/metrics").status_code == 401
+    assert scrape.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    r = scrape.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200
+    assert r.mimetype == "text/plain"
+
+    with scrape.session_transaction() as s:
+        s["pharm_logged_in"] = True
+    assert scrape.get("/metrics").status_code == 200
+
+
+def test_no_token_configured_means_session_only(scrape, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", None)
+    assert scrape.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 401
+    assert scrape.get("/metrics", headers={"Authorization": "Bearer None"}).status_code == 401
@@ -0,0 +1,105 @@
+import time
+from datetime import datetime
+
+import pytest
+
+import db
+import migrations
+import timestamps
+
+# a zone far from UTC, so a reading converted with the wrong offset is 9 h off
+TZ = "Asia/Seoul"
+
+
+@pytest.fixture
+def seoul(monkeypatch):
+    monkeypatch.setenv("TZ", TZ)
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_text_timestamps_from_both_writers_convert_to_the_same_instant(tmp_path, seoul):
+    conn = db.connect(str(tmp_path / "old.db"))
+    migrations.migrate(conn, target=11)
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('P001', 'Demo Patient', 1)")
+    before = timestamps.now_ms()
+    # the text-era writers: SQLite datetime('now') is UTC, Python datetime.now() is local
+    conn.execute("""
+        INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp)
+        VALUES ('P001', 120, 80, 70, datetime('now'))
+    """)  # api_add_bp
+    conn.execute("""
+        INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp)
+        VALUES ('P001', 121, 81, 70, ?)
+    """, (str(datetime.now()),))  # add_bp (sqlite3 datetime adapter)
+    conn.execute("""
+        INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp, client_key)
+        VALUES ('P001', 122, 82, 70, ?, 'cuff-1')
+    """, (datetime.now().replace(microsecond=0).isoformat(sep=" "),))  # batch upload / import
+    conn.execute("""
+        INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES ('P001', 'api', datetime('now'))
+    """)  # api_add_symptom
+    conn.execute("""
+        INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES ('P001', 'form', ?)
+    """, (datetime.now().isoformat(),))  # add_symptom
+    conn.execute("""
+        INSERT INTO access_logs (event_id, patient_id, actor, role, timestamp)
+        VALUES ('e1', 'P001', 'pharm01', 'pharmacist', ?)
+    """, (datetime.now().isoformat(sep=" "),))  # audit writer
+    conn.commit()
+    after = timestamps.now_ms()
+
+    migrations.migrate(conn)
+
+    converted = [r[0] for r in conn.execute("""
+        SELECT timestamp FROM bp_readings UNION ALL
+        SELECT timestamp FROM symptom_logs UNION ALL
+        SELECT timestamp FROM access_logs
+    """)]
+    assert len(converted) == 6
+    for ms in converted:
+        assert isinstance(ms, int)
+        # whole-second writers truncate by up to a second; microseconds round to the nearest ms
+        assert before - 1000 <= ms <= after + 1
+    stats = conn.execute("SELECT first_timestamp, last_timestamp FROM bp_stats").fetchone()
+    assert before - 1000 <= stats[0] <= stats[1] <= after + 1
+    conn.close()
+
+
+READING_AT = datetime(2025, 1, 10, 8, 0)
+
+
+def _schema(conn):
+    tables = {r[0]: [(c[1], c[2], c[3], c[4], c[5]) for c in conn.execute(f"PRAGMA table_info('{r[0]}')")]
+              for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")}
+    indexes = {r[0]: r[1] for r in conn.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+    return tables, indexes
+
+
+@pytest.mark.parametrize("start", range(len(migrations.MIGRATIONS)))
+def test_upgrade_from_every_prior_version_reaches_the_fresh_schema(tmp_path, start):
+    fresh = db.connect(str(tmp_path / "fresh.db"))
+    latest = migrations.migrate(fresh)
+
+    conn = db.connect(str(tmp_path / "old.db"))
+    assert migrations.migrate(conn, target=start) == start
+    if start:
+        conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('P001', 'Demo Patient', 1)")
+        conn.execute("""
+            INSERT INTO bp_readings (patient_id, systolic, diastolic, heart_rate, timestamp)
+            VALUES ('P001', 120, 80, 70, ?)
+        """, (READING_AT.isoformat(sep=" ") if start < 12 else timestamps.encode(READING_AT),))
+        conn.commit()
+
+    assert migrations.migrate(conn) == latest == migrations.current_version(conn)
+    assert _schema(conn) == _schema(fresh)
+    if start:
+        assert [r[0] for r in conn.execute("SELECT timestamp FROM bp_readings")] == [
+            timestamps.encode(READING_AT)]
+    # a second run is a no-op
+    assert migrations.migrate(conn) == latest
+    fresh.close()
+    conn.close()
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+import bp_stats
+import db
+import mtm
+
+
+def test_score_uses_the_lifetime_mean_systolic(db_path):
+    conn = db.connect(db_path)
+    now = datetime.now()
+    # high readings last year, at goal this month: lifetime mean 140.0
+    bp_stats.add_readings(conn, "P001", [
+        (160, 95, 70, now - timedelta(days=400), None),
+        (160, 95, 70, now - timedelta(days=399), None),
+        (120, 80, 70, now - timedelta(days=5), None),
+        (120, 80, 70, now - timedelta(days=4), None),
+    ])
+    conn.commit()
+
+    score = mtm.score_patient(conn, "P001", now=now)
+    stats = bp_stats.get_stats(conn, "P001", now=now)
+    assert score["avg_sys"] == stats["avg_sys"] == 140.0
+    assert stats["avg_sys_30d"] == 120.0
+    assert score["bp_status"] == "Borderline control (130–140 mmHg)"
+    assert [s["avg_sys"] for s in mtm.score_patients(conn, ["P001"], now=now)] == [140.0]
+    conn.close()
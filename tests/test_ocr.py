@@ -0,0 +1,53 @@
+import threading
+
+import ocr
+
+
+class GatedBackend(ocr.FakeBackend):
+    """FakeBackend that holds b"slow" uploads until `gate` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def detect_text(self, content):
+        if content == b"slow":
+            self.gate.wait(5)
+        return super().detect_text(content)
+
+
+def test_result_is_cached_before_the_inflight_entry_goes():
+    pipeline = ocr.OcrPipeline(ocr.FakeBackend())
+    cached_at_pop = []
+
+    class Inflight(dict):
+        def pop(self, key, *default):
+            cached_at_pop.append(key in pipeline._cache)
+            return super().pop(key, *default)
+
+    pipeline._inflight = Inflight()
+    try:
+        assert pipeline.scan(b"Lisinopril 10mg") == ["Lisinopril 10mg"]
+        assert pipeline.scan(b"Lisinopril 10mg") == ["Lisinopril 10mg"]
+    finally:
+        pipeline.shutdown()
+    assert cached_at_pop == [True]
+    assert pipeline.backend.calls == 1
+
+
+def test_pending_job_is_not_evicted():
+    backend = GatedBackend()
+    pipeline = ocr.OcrPipeline(backend, max_jobs=2)
+    try:
+        slow = pipeline.submit(b"slow")
+        for i in range(4):
+            pipeline.scan(f"label {i}".encode())
+            pipeline.submit(f"label {i}".encode())
+        assert pipeline.status(slow) == {"status": "pending"}
+        assert len(pipeline._jobs) <= 3
+        backend.gate.set()
+        pipeline._jobs[slow].result(5)
+        assert pipeline.status(slow) == {"status": "done", "lines": ["slow"]}
+    finally:
+        backend.gate.set()
+        pipeline.shutdown()
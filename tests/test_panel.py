@@ -0,0 +1,79 @@
+import pytest
+
+import db
+import panel
+
+NAMES = ("Kim", "Lee", "Park", None, "")
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = db.connect(db_path)
+    conn.execute("DELETE FROM patients")
+    # repeated names and scores, so every page boundary needs the patient_id tiebreak
+    for i in range(137):
+        pid = f"P{i:04d}"
+        conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES (?, ?, ?)",
+                     (pid, NAMES[i % len(NAMES)], i % 3 != 0))
+        conn.execute("INSERT INTO patient_risk (patient_id, mtm_score, mtm_level, review_due) "
+                     "VALUES (?, ?, ?, ?)", (pid, i % 4, panel.MTM_LEVELS[i % 3], i % 2))
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _walk(conn, limit, **filters):
+    ids, cursor = [], None
+    while True:
+        page = panel.query_panel(conn, limit=limit, cursor=cursor, **filters)
+        assert len(page["patients"]) <= limit
+        ids += [p["patient_id"] for p in page["patients"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def _expected(conn, sort, order, where="1"):
+    rows = conn.execute(f"""
+        SELECT p.patient_id, IFNULL(p.name, '') AS name, r.mtm_score FROM patients p
+        JOIN patient_risk r ON r.patient_id = p.patient_id WHERE {where}
+    """).fetchall()
+    key = {"name": lambda r: (r["name"], r["patient_id"]),
+           "patient_id": lambda r: r["patient_id"],
+           "mtm_score": lambda r: (r["mtm_score"], r["patient_id"])}[sort]
+    return [r["patient_id"] for r in sorted(rows, key=key, reverse=order == "desc")]
+
+
+@pytest.mark.parametrize("sort", sorted(panel.SORTS))
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("limit", [1, 7, 50, 137])
+def test_pages_have_no_gaps_or_duplicates(conn, sort, order, limit):
+    assert _walk(conn, limit, sort=sort, order=order) == _expected(conn, sort, order)
+
+
+def test_filtered_pages(conn):
+    ids = _walk(conn, 9, sort="mtm_score", order="desc", consent=True, review_due=False)
+    assert ids == _expected(conn, "mtm_score", "desc", "p.consent = 1 AND r.review_due = 0")
+
+
+def test_rows_added_between_pages_do_not_shift_the_cursor(conn):
+    first = panel.query_panel(conn, sort="name", limit=20)
+    seen = [p["patient_id"] for p in first["patients"]]
+    # sorts before the cursor: must not show up later or push a row onto the next page twice
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('A0000', '', 1)")
+    conn.execute("INSERT INTO patient_risk (patient_id) VALUES ('A0000')")
+    conn.commit()
+    cursor = first["next_cursor"]
+    while cursor:
+        page = panel.query_panel(conn, sort="name", limit=20, cursor=cursor)
+        seen += [p["patient_id"] for p in page["patients"]]
+        cursor = page["next_cursor"]
+    assert "A0000" not in seen
+    assert len(seen) == len(set(seen)) == 137
+
+
+def test_bad_arguments(conn):
+    for kwargs in ({"sort": "age"}, {"order": "up"}, {"mtm_levels": ["Severe"]},
+                   {"interaction": "bad"}, {"cursor": "not-a-cursor"}):
+        with pytest.raises(ValueError):
+            panel.query_panel(conn, **kwargs)
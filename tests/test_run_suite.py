@@ -0,0 +1,64 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import run_suite  # noqa: E402
+from seed import patient_ids, seed  # noqa: E402
+
+
+def test_summarize_percentiles():
+    latencies = [i / 1000 for i in range(100, 0, -1)]     # 1..100 ms, unsorted
+    r = run_suite.summarize("pharm_view", "client", latencies, 3, 2.0)
+    assert r == {"scenario": "pharm_view", "mode": "client", "requests": 100, "errors": 3,
+                 "seconds": 2.0, "rps": 50.0, "p50_ms": 50.5, "p95_ms": 95.05, "p99_ms": 99.01}
+    one = run_suite.summarize("bp_entry", "http", [0.004], 0, 1.0)
+    assert one["p50_ms"] == one["p95_ms"] == one["p99_ms"] == 4.0
+    assert run_suite.summarize("bp_entry", "http", [], 0, 1.0)["p99_ms"] == 0.0
+
+
+def _result(scenario, rps, p95, mode="client"):
+    return {"scenario": scenario, "mode": mode, "rps": rps, "p95_ms": p95}
+
+
+@pytest.mark.parametrize("rps,p95,regressed", [
+    (1000, 10.0, False),
+    (850, 11.5, False),     # within 20%
+    (790, 10.0, True),      # throughput dropped
+    (1200, 12.5, True),     # tail latency grew
+])
+def test_compare_against_a_baseline(tmp_path, rps, p95, regressed):
+    baseline = tmp_path / "before.json"
+    baseline.write_text(json.dumps({"results": [_result("mixed", 1000, 10.0),
+                                                _result("mixed", 400, 20.0, "http")]}))
+    results = [_result("mixed", rps, p95), _result("pharm_dashboard", 1, 999.0)]
+    assert run_suite.compare(results, str(baseline), 0.2) == (["mixed/client"] if regressed else [])
+
+
+def test_mixed_scenario_follows_the_weights():
+    rng = random.Random(7)
+    picks = [run_suite.pick("mixed", rng) for _ in range(4000)]
+    share = {s: picks.count(s) / len(picks) for s in run_suite.MIX}
+    for scenario, weight in run_suite.MIX.items():
+        assert share[scenario] == pytest.approx(weight / 100, abs=0.03)
+    assert run_suite.pick("bp_entry", rng) == "bp_entry"
+
+
+def test_seed_and_a_short_client_run(client, db_path):
+    from app import app
+    ids = seed(db_path, patients=5, readings=20, meds=2)
+    assert ids == patient_ids(5)
+    conn = run_suite.db.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM bp_readings").fetchone()[0] == 100
+        assert conn.execute("SELECT SUM(reading_count) FROM bp_stats").fetchone()[0] == 100
+    finally:
+        conn.close()
+    for scenario in ("pharm_view", "mixed"):
+        r = run_suite.run_client(app, scenario, ids, threads=2, seconds=0.2)
+        assert r["requests"] > 0 and r["errors"] == 0
+        assert r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+import search
+import timestamps
+
+T0 = datetime(2025, 5, 1, 9, 0)
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = db.connect(db_path)
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('P900', 'No Consent', 0)")
+    notes = [("P900", "dizzy")] * 200 + \
+        [("P001", f"felt dizzy again after the long walk home, day {i}") for i in range(15)] + \
+        [("P001", "mild headache"), ("P900", "dizziness at night")]
+    conn.executemany("INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES (?, ?, ?)",
+                     [(pid, note, timestamps.encode(T0 + timedelta(hours=i)))
+                      for i, (pid, note) in enumerate(notes)])
+    conn.execute("UPDATE patients SET care_plan = 'Recheck dizziness and BP in 2 weeks' "
+                 "WHERE patient_id IN ('P001', 'P900')")
+    search.rebuild(conn)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _walk(conn, q, limit, **kwargs):
+    results, cursor = [], None
+    while True:
+        page = search.search(conn, q, limit=limit, cursor=cursor, **kwargs)
+        assert len(page["results"]) <= limit
+        results += page["results"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return results
+
+
+@pytest.mark.parametrize("limit", [1, 5, 100])
+def test_only_consented_patients_across_pages(conn, limit):
+    # the 200 better-ranked short notes of P900 all come first in bm25 order
+    results = _walk(conn, "dizzy", limit)
+    assert {r["patient_id"] for r in results} == {"P001"}
+    ids = [(r["kind"], r["symptom_id"]) for r in results]
+    # porter stemming: the care plan's "dizziness" matches too
+    assert len(ids) == len(set(ids)) == 15 + 1
+    assert ("care_plan", None) in ids
+
+
+def test_consent_is_read_at_query_time(conn):
+    conn.execute("UPDATE patients SET consent = 0 WHERE patient_id = 'P001'")
+    assert search.search(conn, "dizzy")["results"] == []
+    conn.execute("UPDATE patients SET consent = 1 WHERE patient_id = 'P900'")
+    assert {r["patient_id"] for r in _walk(conn, "dizzy", 50)} == {"P900"}
+
+
+def test_kinds_snippets_and_prefixes(conn):
+    [plan] = search.search(conn, "dizzy", kind="care_plan")["results"]
+    assert plan == {"kind": "care_plan", "patient_id": "P001", "name": "Demo Patient",
+                    "symptom_id": None, "timestamp": None,
+                    "snippet": "Recheck [dizziness] and BP in 2 weeks"}
+    symptoms = _walk(conn, "head*", 10, kind="symptom")
+    assert [(r["snippet"], r["timestamp"]) for r in symptoms] == [("mild [headache]", "2025-05-10 08:00:00")]
+    # operators and punctuation are plain words
+    assert search.search(conn, 'walk "home" (again*')["results"][0]["snippet"].count("[") == 3
+    assert search.search(conn, "walk OR headache")["results"] == []
+
+
+def test_new_symptoms_are_indexed(conn):
+    cur = conn.execute("INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES ('P001', 'swollen ankles', 0)")
+    search.index_symptom(conn, cur.lastrowid, "P001", "swollen ankles", 0)
+    assert [r["symptom_id"] for r in search.search(conn, "ankle")["results"]] == [cur.lastrowid]
+
+
+def test_bad_queries(conn):
+    for q, kwargs in (("", {}), ("!!", {}), (" ".join(["w"] * 17), {}), ("dizzy", {"kind": "x"}),
+                      ("dizzy", {"cursor": "nope"})):
+        with pytest.raises(ValueError):
+            search.search(conn, q, **kwargs)
+
+
+def test_api_search_hides_and_audits(client, db_path):
+    conn = db.connect(db_path)
+    conn.executemany("INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES (?, ?, 0)",
+                     [("P001", "dizzy"), ("P002", "dizzy")])
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('P002', 'Other', 0)")
+    search.rebuild(conn)
+    conn.commit()
+    conn.close()
+    page = client.get("/api/pharm/search?q=dizzy").get_json()
+    assert [r["patient_id"] for r in page["results"]] == ["P001"]
+    assert client.get("/api/pharm/search?q=").status_code == 400
+    with client.session_transaction() as s:
+        s.clear()
+    assert client.get("/api/pharm/search?q=dizzy").status_code == 401
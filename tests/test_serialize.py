@@ -0,0 +1,88 @@
+import time
+from datetime import datetime
+
+import pytest
+
+import bp_stats
+import changes
+import db
+import mtm
+import panel
+import serialize
+import series
+import snapshot
+import timestamps
+
+NOTE = 'dizzy "after" lunch\n\tcafé \\ 두통 \x01\x7f'
+
+
+@pytest.fixture(params=["UTC", "America/New_York"])
+def conn(request, db_path, monkeypatch):
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    conn = db.connect(db_path)
+    conn.execute("INSERT INTO patients (patient_id, name, consent) VALUES ('P002', ?, 0)", (NOTE,))
+    bp_stats.add_readings(conn, "P001", [
+        (120, 80, 70, 1730525400000, "cuff \"1\""),        # 01:30 EDT, whole second
+        (121, 81, None, 1730529000123, None),              # 01:30 EST, with ms
+        (122, 82, 71, datetime(2025, 3, 9, 3, 0, 0, 5000), NOTE),
+    ])
+    conn.execute("INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES ('P001', ?, ?)",
+                 (NOTE, 1730529000999))
+    conn.execute("INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES ('P001', NULL, NULL)")
+    conn.execute("""
+        INSERT INTO medications (patient_id, name, drug_id) VALUES ('P001', 'Warfarin', 'warfarin'),
+                                                                  ('P001', 'Ibuprofen', 'ibuprofen')
+    """)
+    conn.execute("INSERT INTO patient_interactions VALUES ('P001', 'ibuprofen', 'warfarin', 2)")
+    changes.record(conn, "P001", "patient")
+    mtm.refresh(conn)
+    conn.commit()
+    yield conn
+    conn.close()
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _json(obj):
+    return serialize.dumps(obj, sort_keys=True)
+
+
+def test_snapshot_json_rows_match_the_dict_rows(conn):
+    for order in ("desc", "asc"):
+        rows = snapshot.load_patient_snapshot(conn, "P001", readings_order=order)
+        raw = snapshot.load_patient_snapshot(conn, "P001", readings_order=order, json_rows=True)
+        assert _json(raw) == _json(rows)
+        assert len(raw["readings"]) == 3
+        assert series.encode_cursor(raw["readings"].last) == series.encode_cursor(rows["readings"][-1])
+
+
+@pytest.mark.parametrize("fields", [None, ["timestamp", "systolic"], ["client_key"]])
+def test_reading_pages_match_the_dict_rows(conn, fields):
+    rows = conn.execute("SELECT * FROM bp_readings ORDER BY timestamp DESC, id DESC").fetchall()
+    expected = [{f: r[f] for f in fields or series.READING_FIELDS}
+                for r in timestamps.decode_rows(rows, ("timestamp",))]
+    page = series.page_readings(conn, "P001", limit=2, fields=fields)
+    rest = series.page_readings(conn, "P001", page["next_cursor"], limit=2, fields=fields)
+    assert _json(page["readings"]) == _json(expected[:2])
+    assert _json(rest["readings"]) == _json(expected[2:])
+    assert rest["next_cursor"] is None
+
+
+def test_panel_json_rows_match_the_dict_rows(conn):
+    for sort in panel.SORTS:
+        rows = panel.query_panel(conn, sort=sort, limit=1)
+        raw = panel.query_panel(conn, sort=sort, limit=1, as_json=True)
+        assert _json(raw) == _json(rows)
+        rows = panel.query_panel(conn, sort=sort, cursor=rows["next_cursor"])
+        raw = panel.query_panel(conn, sort=sort, cursor=raw["next_cursor"], as_json=True)
+        assert _json(raw) == _json(rows)
+    assert b'"interaction":"major"' in _json(panel.query_panel(conn, as_json=True))
+
+
+def test_json_rows_nest_anywhere_and_keep_their_text(conn):
+    raw = snapshot.load_patient_snapshot(conn, "P001", json_rows=True)
+    body = serialize.dumps({"a": [raw["symptoms"], {"b": raw["readings"]}], "empty": serialize.JsonRows([])},
+                           indent=True)
+    assert body.count(b'"timestamp":') == 5
+    assert b'"empty": []' in body
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive
+import bp_stats
+import db
+import series
+
+T0 = datetime(2025, 1, 1)
+
+
+def _seed(conn, n):
+    # a sawtooth between 110 and 149, one spike
+    readings = [(110 + i % 40, 80, 70, T0 + timedelta(minutes=10 * i), None) for i in range(n)]
+    readings[n // 3] = (260, 80, 70, readings[n // 3][3], None)
+    bp_stats.add_readings(conn, "P001", readings)
+    conn.commit()
+    return readings
+
+
+def test_long_ranges_are_bucketed_in_sql(db_path, tmp_path, monkeypatch):
+    monkeypatch.setenv("CARELINK_ARCHIVE_DIR", str(tmp_path / "archive"))
+    conn = db.connect(db_path)
+    readings = _seed(conn, 20000)
+    archive.archive_month(conn, "2025-01")
+    lttb, loaded = series.lttb, []
+
+    def recording(xs, ys, threshold):
+        loaded.append(len(xs))
+        return lttb(xs, ys, threshold)
+
+    monkeypatch.setattr(series, "lttb", recording)
+    chart = series.load_series(conn, "P001", max_points=100)
+    # low + high per bucket, plus the ends of the hot table and the archived month
+    assert loaded == [pytest.approx(100 * series.BUCKETS_PER_POINT * 2, abs=8)]
+    assert chart["total"] == 20000 and chart["downsampled"]
+    assert len(chart["labels"]) == 100
+    assert chart["labels"][0] == "2025-01-01 00:00:00"
+    assert chart["labels"][-1] == str(readings[-1][3])
+    assert max(chart["systolic"]) == 260
+    conn.close()
+
+
+def test_bucketed_range_keeps_its_bounds(db_path, monkeypatch):
+    conn = db.connect(db_path)
+    _seed(conn, 20000)
+    monkeypatch.setattr(series, "PREBUCKET_FACTOR", 1)
+    chart = series.load_series(conn, "P001", "2025-02-01", "2025-03-01", max_points=50)
+    assert chart["total"] == 28 * 144
+    assert chart["labels"][0] == "2025-02-01 00:00:00"
+    assert chart["labels"][-1] == "2025-02-28 23:50:00"
+    assert len(chart["labels"]) == 50
+    conn.close()
+
+
+@pytest.mark.parametrize("n,threshold", [(10, 3), (1000, 100), (1001, 7), (5000, 499)])
+def test_lttb_keeps_both_endpoints_and_the_threshold(n, threshold):
+    xs = list(range(n))
+    ys = [(i * 37) % 101 for i in range(n)]
+    keep = series.lttb(xs, ys, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert keep == sorted(set(keep))
+
+
+def test_lttb_below_threshold_keeps_everything():
+    assert series.lttb([1, 2, 3], [5, 6, 7], 10) == [0, 1, 2]
+    assert series.lttb([1, 2, 3, 4], [5, 6, 7, 8], 2) == [0, 1, 2, 3]
+
+
+def test_series_endpoint_downsamples_the_raw_path(client, db_path):
+    conn = db.connect(db_path)
+    readings = _seed(conn, 1500)
+    conn.close()
+    res = client.get("/api/pharm/patient/P001/series?points=300")
+    assert res.status_code == 200
+    chart = res.get_json()
+    assert chart["total"] == 1500 and chart["downsampled"]
+    assert len(chart["labels"]) == len(chart["systolic"]) == len(chart["diastolic"]) == 300
+    assert chart["labels"][0] == str(readings[0][3])
+    assert chart["labels"][-1] == str(readings[-1][3])
+    assert chart["labels"] == sorted(chart["labels"])
+    assert 260 in chart["systolic"]
+
+    chart = client.get("/api/pharm/patient/P001/series?points=5000").get_json()
+    assert len(chart["labels"]) == 1500 and not chart["downsampled"]
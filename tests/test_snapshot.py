@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import bp_stats
+import db
+import snapshot
+import timestamps
+
+START = datetime(2025, 3, 1, 8, 0)
+
+
+class WriteBetweenQueries:
+    """Connection that lets another connection commit a reading and a medication
+    right after the snapshot's first (patients) query."""
+
+    def __init__(self, conn, writer):
+        self.conn = conn
+        self.writer = writer
+
+    @property
+    def in_transaction(self):
+        return self.conn.in_transaction
+
+    def execute(self, sql, params=()):
+        cur = self.conn.execute(sql, params)
+        if sql == snapshot.PATIENT_SQL:
+            cur = list(cur)
+            bp_stats.add_readings(self.writer, "P001", [(170, 100, 80, START + timedelta(days=30), None)])
+            self.writer.execute("INSERT INTO medications (patient_id, name, dose, frequency) "
+                                "VALUES ('P001', 'Amlodipine', '5 mg', 'daily')")
+            self.writer.commit()
+            return _Rows(cur)
+        return cur
+
+    def commit(self):
+        self.conn.commit()
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+def _seed(path, n):
+    conn = db.connect(path)
+    bp_stats.add_readings(conn, "P001", [(120 + i, 80, 70, START + timedelta(hours=i), None)
+                                         for i in range(n)])
+    conn.executemany("INSERT INTO symptom_logs (patient_id, note, timestamp) VALUES ('P001', ?, ?)",
+                     [(f"note {i}", timestamps.encode(START + timedelta(hours=i)))
+                      for i in range(n)])
+    conn.commit()
+    return conn
+
+
+def test_concurrent_write_is_not_seen_mid_snapshot(db_path):
+    conn = _seed(db_path, 3)
+    writer = db.connect(db_path)
+    try:
+        snap = snapshot.load_patient_snapshot(WriteBetweenQueries(conn, writer), "P001",
+                                              pending_accesses=False)
+        assert [r["systolic"] for r in snap["readings"]] == [122, 121, 120]
+        assert snap["medications"] == []
+        # the write did land; the next snapshot sees it
+        snap = snapshot.load_patient_snapshot(conn, "P001", pending_accesses=False)
+        assert snap["readings"][0]["systolic"] == 170
+        assert [m["name"] for m in snap["medications"]] == ["Amlodipine"]
+    finally:
+        writer.close()
+        conn.close()
+
+
+def test_limits_order_and_shape(db_path):
+    conn = _seed(db_path, 15)
+    try:
+        snap = snapshot.load_patient_snapshot(conn, "P001", pending_accesses=False)
+        assert set(snap) == {"patient", "readings", "medications", "symptoms", "accesses"}
+        assert [r["systolic"] for r in snap["readings"]] == list(range(134, 124, -1))
+        assert [s["note"] for s in snap["symptoms"]] == ["note 14", "note 13", "note 12"]
+        assert snap["readings"][0]["timestamp"] == "2025-03-01 22:00:00"
+
+        full = snapshot.load_patient_snapshot(conn, "P001", readings_limit=None, readings_order="asc",
+                                              pending_accesses=False)
+        assert [r["systolic"] for r in full["readings"]] == list(range(120, 135))
+        assert not conn.in_transaction
+        assert snapshot.load_patient_snapshot(conn, "P404") is None
+    finally:
+        conn.close()
@@ -0,0 +1,84 @@
+# timestamps.py
+# Every timestamp column (bp_readings, symptom_logs, access_logs, changes,
+# patients.last_med_review, bp_stats, archive / import bookkeeping) stores an
+# INTEGER: milliseconds since the Unix epoch (UTC). Integers sort and compare
+# as numbers, index in 8 bytes or less, and mean the same instant whoever wrote
+# them (route, batch upload, bulk import, SQL default).
+#
+# Writes go through encode() / now_ms(); reads come back out through decode()
+# (datetime) or to_iso() (the "YYYY-MM-DD HH:MM:SS" local-time text the
+# templates, exports and the JSON API show).
+import time
+from datetime import date, datetime, timezone
+
+# columns holding epoch ms, for decode_row()
+FIELDS = ("timestamp", "last_med_review", "first_timestamp", "last_timestamp",
+          "created_at", "archived_at", "started_at", "finished_at")
+
+# open-ended upper bound: 9999-12-31 23:59:59.999 UTC
+MAX_MS = 253402300799999
+
+# SQL: the current time as epoch ms
+NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+# SQL: local calendar day 'YYYY-MM-DD' / month 'YYYY-MM' of an epoch-ms column
+LOCAL_DATE_SQL = "date({col} / 1000, 'unixepoch', 'localtime')"
+LOCAL_MONTH_SQL = "strftime('%Y-%m', {col} / 1000, 'unixepoch', 'localtime')"
+# to_iso() in SQL, for rows rendered to JSON by SQLite (serialize.json_object_sql)
+ISO_SQL = ("CASE WHEN {col} IS NULL THEN NULL "
+           "ELSE strftime('%Y-%m-%d %H:%M:%S', {col} / 1000, 'unixepoch', 'localtime')"
+           " || CASE WHEN {col} % 1000 THEN printf('.%03d', {col} % 1000) ELSE '' END END")
+
+
+def now_ms():
+    return time.time_ns() // 1_000_000
+
+
+def encode(value):
+    """datetime / date / ISO 8601 text / epoch ms -> epoch ms (None stays None).
+
+    Naive datetimes and text without an offset are local time.
+    """
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    elif not isinstance(value, datetime):
+        if not isinstance(value, date):
+            raise TypeError(f"not a timestamp: {value!r}")
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.astimezone()
+    delta = value - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86_400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
+def decode(ms):
+    """epoch ms -> naive local datetime (None stays None)."""
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms // 1000).replace(microsecond=ms % 1000 * 1000)
+
+
+def to_iso(ms):
+    """epoch ms -> 'YYYY-MM-DD HH:MM:SS[.mmm]' local time (None stays None).
+
+    Milliseconds are only written when non-zero; the text still sorts in time
+    order and encode() turns it back into the same integer.
+    """
+    if ms is None:
+        return None
+    text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ms // 1000))
+    return f"{text}.{ms % 1000:03d}" if ms % 1000 else text
+
+
+def decode_row(row, fields=FIELDS):
+    """sqlite3.Row / dict -> dict with its epoch-ms columns as to_iso() text."""
+    out = dict(row)
+    for f in fields:
+        if f in out:
+            out[f] = to_iso(out[f])
+    return out
+
+
+def decode_rows(rows, fields=FIELDS):
+    return [decode_row(r, fields) for r in rows]